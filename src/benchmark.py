@@ -0,0 +1,211 @@
+import argparse
+import datetime as dt
+import json
+import os
+import platform
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import numpy as np
+
+from game import Game
+from generate import create_game_combos, get_combo_codes, get_n_decks, iter_deck_chunks
+from score import run_full_sim_and_score, run_cached_sim_and_score
+from exact import solve_exact
+from results import new_result_tensor, pivot_result_tensor
+from visualize import visualize_all_games_output
+from cache import ENGINE_VERSION
+
+# the benchmark matrix run by default
+DECK_SIZES = (52, 520, 5200)
+SEQ_LENS = (2, 3, 4, 5, 6)
+NUM_DECKS = (100, 1000, 10000)
+CASES = ("generate", "play_game", "full_sim", "exact", "cached", "visualize")
+
+# cases whose cards * games would take longer than this many card steps are skipped
+# (the automaton engine and single games get a hundredth of it, being pure Python)
+MAX_CARD_STEPS = 2 * 10**9
+
+def run_benchmarks(deck_sizes: list = DECK_SIZES,
+                   seq_lens: list = SEQ_LENS,
+                   num_decks_list: list = NUM_DECKS,
+                   cases: list = CASES,
+                   max_card_steps: int = MAX_CARD_STEPS,
+                   repeat: int = 1
+                   ) -> dict:
+    '''
+    Time every benchmark case over the matrix of deck sizes, sequence lengths and deck counts,
+    each case being timed untraced (best of repeat runs) and then run once more under
+    tracemalloc for its peak memory
+
+    Arguments:
+        deck_sizes (list): the deck sizes to benchmark
+        seq_lens (list): the sequence lengths to benchmark
+        num_decks_list (list): the numbers of decks to benchmark
+        cases (list): which of CASES to run: "generate" (generate.get_n_decks and
+                      generate.iter_deck_chunks), "play_game" (Game.play_this_game_deck),
+                      "full_sim" (run_full_sim_and_score with both engines), "exact"
+                      (exact.solve_exact, 52-card decks only), "cached" (a result cache hit,
+                      see run_cached_sim_and_score) and "visualize" (one heatmap)
+        max_card_steps (int): the largest number of cards * games a case may play
+        repeat (int): the number of timed runs of each case
+
+    Output:
+        report (dict): "meta", the environment of the run, and "results", one dict per case
+                       with its "case" and parameters, the number of "items" processed and
+                       their "unit", "seconds", "items_per_sec" and "peak_mb"
+    '''
+    results = []
+
+    def measure(case: str, params: dict, items: int, unit: str, func) -> None:
+        seconds = min(_timed(func) for _ in range(repeat))
+        tracemalloc.start()
+        func()
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+
+        results.append({"case": case, **params, "items": items, "unit": unit,
+                        "seconds": seconds, "items_per_sec": items / seconds,
+                        "peak_mb": peak / 2**20})
+        print(f"{_case_name(results[-1]):<72} {items / seconds:>14,.0f} {unit}/s "
+              f"{peak / 2**20:>10.1f} MB")
+        return
+
+    # everything a case writes (cache entries, heatmaps) goes to a temporary directory
+    with tempfile.TemporaryDirectory(prefix="penney_benchmark_") as work_dir:
+        for deck_size in deck_sizes:
+            for num_decks in num_decks_list:
+                if "generate" in cases:
+                    measure("generate", {"generator": "get_n_decks", "deck_size": deck_size,
+                                         "num_decks": num_decks}, num_decks, "decks",
+                            lambda: get_n_decks(num_decks, deck_size // 2, save_csv = False))
+                    measure("generate", {"generator": "iter_deck_chunks", "deck_size": deck_size,
+                                         "num_decks": num_decks}, num_decks, "decks",
+                            lambda: list(iter_deck_chunks(num_decks, deck_size // 2)))
+
+                decks = np.concatenate(list(iter_deck_chunks(num_decks, deck_size // 2)))
+                for seq_len in seq_lens:
+                    all_combos = create_game_combos(seq_len)
+                    games = num_decks * len(all_combos)
+                    params = {"deck_size": deck_size, "seq_len": seq_len, "num_decks": num_decks}
+
+                    if("play_game" in cases and games * deck_size <= max_card_steps // 100):
+                        measure("play_game", params, games, "games",
+                                lambda: [Game(combo, deck.tolist(), deck_size, seq_len).play_this_game_deck()
+                                         for deck in decks for combo in all_combos])
+
+                    if "full_sim" in cases:
+                        for engine, budget in (("vectorized", max_card_steps),
+                                               ("automaton", max_card_steps // 100)):
+                            if(games * deck_size <= budget):
+                                measure("full_sim", {"engine": engine, **params}, games, "games",
+                                        lambda: run_full_sim_and_score(decks, deck_size, seq_len,
+                                                                       num_decks, all_combos,
+                                                                       engine = engine))
+
+                    if("cached" in cases and games * deck_size <= max_card_steps):
+                        cache_dir = os.path.join(work_dir, "cache")
+                        run_cached_sim_and_score(deck_size, seq_len, num_decks, all_combos,
+                                                 cache_dir = cache_dir)
+                        measure("cached", params, games, "games",
+                                lambda: run_cached_sim_and_score(deck_size, seq_len, num_decks,
+                                                                 all_combos, cache_dir = cache_dir))
+
+            # the exact solver doesn't sample decks, so it is timed once per deck size
+            if("exact" in cases and deck_size <= 52):
+                for seq_len in seq_lens:
+                    all_combos = create_game_combos(seq_len)
+                    measure("exact", {"deck_size": deck_size, "seq_len": seq_len},
+                            len(all_combos), "matchups",
+                            lambda: solve_exact(deck_size, all_combos))
+
+        if "visualize" in cases:
+            for seq_len in seq_lens:
+                tensor = new_result_tensor(seq_len, get_combo_codes(seq_len))
+                tensor["counts"][:, 0] = np.random.default_rng(0).integers(1, 100, len(tensor["counts"]))
+                heatmap = pivot_result_tensor(tensor)
+                measure("visualize", {"seq_len": seq_len}, 1, "figures",
+                        lambda: visualize_all_games_output(heatmap, os.path.join(work_dir, "heatmaps"),
+                                                           title = "benchmark"))
+
+    meta = {"time": dt.datetime.now().isoformat(timespec="seconds"),
+            "python": platform.python_version(), "numpy": np.__version__,
+            "platform": platform.platform(), "cpus": os.cpu_count(),
+            "engine_version": ENGINE_VERSION}
+    return {"meta": meta, "results": results}
+
+def compare_to_baseline(report: dict, baseline: dict, threshold: float = 0.1) -> list:
+    '''
+    Find the cases that got slower than a stored baseline report
+
+    Arguments:
+        report (dict): the benchmark report (see run_benchmarks)
+        baseline (dict): the baseline benchmark report
+        threshold (float): the fraction of the baseline's throughput a case may lose
+                           before it counts as a regression
+
+    Output:
+        regressions (list): (case name, baseline items/sec, items/sec) of each regressed case
+                            present in both reports
+    '''
+    baseline_rates = {_case_name(result): result["items_per_sec"] for result in baseline["results"]}
+    regressions = []
+    for result in report["results"]:
+        name = _case_name(result)
+        if(name in baseline_rates and result["items_per_sec"] < baseline_rates[name] * (1 - threshold)):
+            regressions.append((name, baseline_rates[name], result["items_per_sec"]))
+    return regressions
+
+def _timed(func) -> float:
+    '''
+    Wall time in seconds of one call of func
+    '''
+    start = time.perf_counter()
+    func()
+    return time.perf_counter() - start
+
+def _case_name(result: dict) -> str:
+    '''
+    Identifier of a benchmark case, its name and parameters, matched up between reports
+    '''
+    params = [f"{key}={value}" for key, value in result.items()
+              if key not in ("case", "items", "unit", "seconds", "items_per_sec", "peak_mb")]
+    return f"{result['case']}[{','.join(params)}]"
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the Penney's Game simulation")
+    parser.add_argument("--deck-sizes", nargs="+", type=int, default=list(DECK_SIZES))
+    parser.add_argument("--seq-lens", nargs="+", type=int, default=list(SEQ_LENS))
+    parser.add_argument("--num-decks", nargs="+", type=int, default=list(NUM_DECKS))
+    parser.add_argument("--cases", nargs="+", choices=CASES, default=list(CASES))
+    parser.add_argument("--max-card-steps", type=int, default=MAX_CARD_STEPS,
+                        help="skip cases playing more cards * games than this")
+    parser.add_argument("--repeat", type=int, default=1, help="timed runs of each case")
+    parser.add_argument("--output", help="file path of the JSON report, "
+                                         "defaults to data/benchmarks/<time>.json")
+    parser.add_argument("--baseline", help="JSON report to compare against")
+    parser.add_argument("--threshold", type=float, default=0.1,
+                        help="fraction of the baseline's throughput a case may lose")
+    args = parser.parse_args()
+
+    report = run_benchmarks(deck_sizes = args.deck_sizes, seq_lens = args.seq_lens,
+                            num_decks_list = args.num_decks, cases = args.cases,
+                            max_card_steps = args.max_card_steps, repeat = args.repeat)
+
+    output = args.output or os.path.join("data/benchmarks",
+                                         f"{dt.datetime.now().strftime('%Y-%m-%d_%H-%M-%S')}.json")
+    os.makedirs(os.path.dirname(output) or ".", exist_ok=True)
+    with open(output, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"Saved benchmark results to {output}")
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            regressions = compare_to_baseline(report, json.load(f), args.threshold)
+        for name, baseline_rate, rate in regressions:
+            print(f"REGRESSION {name}: {baseline_rate:,.0f} -> {rate:,.0f} per second")
+        if regressions:
+            sys.exit(1)
+        print(f"No regressions beyond {args.threshold:.0%} of {args.baseline}")
@@ -0,0 +1,155 @@
+import hashlib
+import json
+import os
+import tempfile
+
+import numpy as np
+
+from deckstore import SEED_SCHEME_SPAWN
+
+# bump whenever a change to the engines, deck generation or scoring changes the results,
+# so results cached by an older version are never served
+ENGINE_VERSION = 1
+
+DEFAULT_CACHE_DIR = "data/cache"
+DEFAULT_MAX_BYTES = 256 * 2**20
+
+def result_key(deck_size: int,
+               seq_len: int,
+               scoring: str,
+               seed: int,
+               chunk_size: int,
+               p1_codes: np.ndarray,
+               p2_codes: np.ndarray,
+               seed_scheme: int = SEED_SCHEME_SPAWN
+               ) -> str:
+    '''
+    Content address of a simulation's results: everything the per-chunk outcome counts depend
+    on except the number of decks, so runs of any length under the same parameters and seed
+    share one cache entry
+
+    Arguments:
+        deck_size (int): the number of cards in each deck
+        seq_len (int): the number of elements in each player's chosen sequence
+        scoring (str): the desired method to score the players (see scoring methods)
+        seed (int): master seed of the decks
+        chunk_size (int): the number of decks per seeded chunk
+        p1_codes (np.ndarray): player one's sequence code of each combination (see engine.encode_combos)
+        p2_codes (np.ndarray): player two's sequence code of each combination
+        seed_scheme (int): how the decks are seeded (one of the deckstore.SEED_SCHEME_* constants)
+
+    Output:
+        key (str): hex digest identifying the results
+    '''
+    params = {"engine_version": ENGINE_VERSION, "seed_scheme": seed_scheme,
+              "deck_size": deck_size, "seq_len": seq_len, "scoring": scoring,
+              "seed": seed, "chunk_size": chunk_size,
+              "p1_codes": np.asarray(p1_codes).tolist(), "p2_codes": np.asarray(p2_codes).tolist()}
+    return hashlib.sha256(json.dumps(params, sort_keys=True).encode()).hexdigest()
+
+def prefix_counts(entry: dict, num_decks: int) -> np.ndarray:
+    '''
+    Outcome counts of the first num_decks decks of a cached run, if they end on one of its
+    chunk boundaries (the decks of a chunk depend only on the seed and the chunk's index, so
+    a longer run's first chunks are exactly a shorter run's chunks)
+
+    Arguments:
+        entry (dict): the cached results (see ResultCache.get)
+        num_decks (int): the number of decks requested
+
+    Output:
+        counts (np.ndarray): 2D int64 array of shape (n_combos, 3), each combination's
+                             outcome counts (see results.OUTCOMES), or None if num_decks
+                             isn't a chunk boundary of the cached run
+    '''
+    boundaries = np.concatenate([[0], np.cumsum(entry["chunk_sizes"])])
+    n_chunks = np.searchsorted(boundaries, num_decks)
+    if(n_chunks >= len(boundaries) or boundaries[n_chunks] != num_decks):
+        return None
+    return entry["chunk_counts"][:n_chunks].sum(axis=0, dtype=np.int64)
+
+class ResultCache:
+    '''
+    A ResultCache object is a directory of simulation results addressed by result_key, each
+    entry holding the outcome counts of every chunk of decks played, so a cached run also
+    answers any shorter run ending on a chunk boundary. Entries are evicted least recently
+    used first once the directory grows past max_bytes.
+    '''
+    def __init__(self,
+                 cache_dir: str = DEFAULT_CACHE_DIR,
+                 max_bytes: int = DEFAULT_MAX_BYTES
+                 ) -> None:
+        os.makedirs(cache_dir, exist_ok=True)
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        return
+
+    def __repr__(self) -> str:
+        return f"Result cache in {self.cache_dir} of at most {self.max_bytes} bytes"
+
+    def get(self, key: str) -> dict:
+        '''
+        Read a cached entry, marking it as the most recently used
+
+        Arguments:
+            key (str): the entry's content address (see result_key)
+
+        Output:
+            entry (dict): "chunk_counts", 3D int64 array of shape (n_chunks, n_combos, 3) of each
+                          chunk's outcome counts, and "chunk_sizes", the number of decks in each
+                          chunk, or None if the entry isn't cached
+        '''
+        path = self._path(key)
+        try:
+            with np.load(path) as data:
+                entry = {name: data[name] for name in data.files}
+        except (FileNotFoundError, ValueError, OSError):
+            return None
+
+        # the file's modification time is its last use
+        os.utime(path)
+        return entry
+
+    def put(self, key: str, entry: dict) -> None:
+        '''
+        Cache an entry, replacing any previous one only once it is completely written,
+        then evict the least recently used entries over the size bound
+
+        Arguments:
+            key (str): the entry's content address (see result_key)
+            entry (dict): the results (see get)
+        '''
+        path = self._path(key)
+        # a uniquely named temporary file, so concurrent writers of one key don't clobber each other
+        with tempfile.NamedTemporaryFile(dir = self.cache_dir, prefix = f"{key}.", suffix = ".tmp", 
+                                         delete = False) as f:
+            np.savez(f, **entry)
+        os.replace(f.name, path)
+        self._evict(keep = path)
+        return
+
+    def _path(self, key: str) -> str:
+        '''
+        File path of the entry with the given key
+        '''
+        return os.path.join(self.cache_dir, f"{key}.npz")
+
+    def _evict(self, keep: str = None) -> None:
+        '''
+        Remove the least recently used entries until the cache fits in max_bytes,
+        never removing the entry at keep
+        '''
+        entries = []
+        for name in os.listdir(self.cache_dir):
+            if name.endswith(".npz"):
+                stat = os.stat(os.path.join(self.cache_dir, name))
+                entries.append((stat.st_mtime, stat.st_size, os.path.join(self.cache_dir, name)))
+
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries):
+            if(total <= self.max_bytes):
+                break
+            if(path != keep):
+                os.remove(path)
+                total -= size
+        return
@@ -0,0 +1,139 @@
+import numpy as np
+import pandas as pd
+import os
+import tempfile
+
+# configuration a checkpoint must share with the run resuming it or the results merged with it
+CONFIG_KEYS = ("deck_size", "seq_len", "scoring", "chunk_size")
+
+def new_checkpoint(p1_combos: list,
+                   p2_combos: list,
+                   deck_size: int,
+                   seq_len: int,
+                   scoring: str,
+                   seed: int,
+                   chunk_size: int,
+                   first_chunk: int = 0
+                   ) -> dict:
+    '''
+    Create the empty accumulators of a simulation that will be checkpointed
+
+    Arguments:
+        p1_combos (list): player one's sequence of each combination, as strings of 0s and 1s
+        p2_combos (list): player two's sequence of each combination, as strings of 0s and 1s
+        deck_size (int): the number of cards in each deck
+        seq_len (int): the number of elements in each player's chosen sequence
+        scoring (str): the desired method to score the players (see scoring methods)
+        seed (int): master seed of the decks (see generate.iter_deck_chunks)
+        chunk_size (int): the number of decks per seeded chunk
+        first_chunk (int): index of the first chunk of decks the simulation plays
+
+    Output:
+        checkpoint (dict): the simulation's accumulators; per-combination "winner_ones",
+                           "winner_twos" and "ties", the "num_decks" processed, the
+                           configuration, and "seed_ranges", one (seed, first chunk, next chunk)
+                           row per run the results come from
+    '''
+    return {"p1_combos": np.array(p1_combos), "p2_combos": np.array(p2_combos),
+            "winner_ones": np.zeros(len(p1_combos), dtype=np.int64),
+            "winner_twos": np.zeros(len(p1_combos), dtype=np.int64),
+            "ties": np.zeros(len(p1_combos), dtype=np.int64),
+            "num_decks": 0, "deck_size": deck_size, "seq_len": seq_len, "scoring": scoring,
+            "chunk_size": chunk_size,
+            "seed_ranges": np.array([[seed, first_chunk, first_chunk]], dtype=np.int64)}
+
+def save_checkpoint(path: str, checkpoint: dict) -> None:
+    '''
+    Write a simulation's accumulators to disk, replacing the previous checkpoint only once
+    the new one is completely written
+
+    Arguments:
+        path (str): file path of the checkpoint (.npz)
+        checkpoint (dict): the simulation's accumulators (see new_checkpoint)
+    '''
+    checkpoint_dir = os.path.dirname(path) or "."
+    os.makedirs(checkpoint_dir, exist_ok=True)
+    # a uniquely named temporary file next to the checkpoint, so os.replace stays on one file system
+    with tempfile.NamedTemporaryFile(dir = checkpoint_dir, prefix = f"{os.path.basename(path)}.", 
+                                     suffix = ".tmp", delete = False) as f:
+        np.savez(f, **checkpoint)
+    os.replace(f.name, path)
+    return
+
+def load_checkpoint(path: str) -> dict:
+    '''
+    Read a simulation's accumulators from disk
+
+    Arguments:
+        path (str): file path of the checkpoint (.npz)
+
+    Output:
+        checkpoint (dict): the simulation's accumulators (see new_checkpoint)
+    '''
+    with np.load(path) as data:
+        checkpoint = {key: data[key] for key in data.files}
+
+    # scalars come back as 0-d arrays
+    for key in ("num_decks", "deck_size", "seq_len", "chunk_size"):
+        checkpoint[key] = int(checkpoint[key])
+    checkpoint["scoring"] = str(checkpoint["scoring"])
+    return checkpoint
+
+def merge_checkpoints(paths: list) -> dict:
+    '''
+    Combine the partial results of runs with the same configuration over disjoint decks,
+    e.g. fanned out across machines with different seeds or chunk ranges
+
+    Arguments:
+        paths (list): file paths of the partial results (see save_checkpoint)
+
+    Output:
+        checkpoint (dict): the combined accumulators (see new_checkpoint)
+    '''
+    merged = None
+    for path in paths:
+        checkpoint = load_checkpoint(path)
+        if merged is None:
+            merged = checkpoint
+            continue
+
+        if(any(checkpoint[key] != merged[key] for key in CONFIG_KEYS)
+           or not np.array_equal(checkpoint["p1_combos"], merged["p1_combos"])
+           or not np.array_equal(checkpoint["p2_combos"], merged["p2_combos"])):
+            raise Exception("Mismatched Simulation Configurations")
+
+        # the same decks must not be counted twice
+        for seed, first_chunk, next_chunk in checkpoint["seed_ranges"]:
+            for merged_seed, merged_first, merged_next in merged["seed_ranges"]:
+                if(seed == merged_seed and first_chunk < merged_next and merged_first < next_chunk):
+                    raise Exception("Overlapping Seed Ranges")
+
+        for key in ("winner_ones", "winner_twos", "ties", "num_decks"):
+            merged[key] = merged[key] + checkpoint[key]
+        merged["seed_ranges"] = np.concatenate([merged["seed_ranges"], checkpoint["seed_ranges"]])
+
+    if merged is None:
+        raise Exception("No Results To Merge")
+    return merged
+
+def checkpoint_to_output(checkpoint: dict) -> pd.DataFrame:
+    '''
+    Turn a simulation's accumulators into the raw output of a simulation, which
+    split_simulation_output consumes
+
+    Arguments:
+        checkpoint (dict): the simulation's accumulators (see new_checkpoint)
+
+    Output:
+        all_games_output (pd.DataFrame): same as run_full_sim_and_score, plus each combination's
+                                         frequency of ties ("tie freq")
+    '''
+    all_games_output = pd.DataFrame(columns = ["p1 combo", "p2 combo",
+                                               "p1 winner freq", "p2 winner freq", "tie freq"])
+    all_games_output["p1 combo"]=checkpoint["p1_combos"].tolist()
+    all_games_output["p2 combo"]=checkpoint["p2_combos"].tolist()
+    all_games_output["p1 winner freq"]=checkpoint["winner_ones"] / checkpoint["num_decks"]
+    all_games_output["p2 winner freq"]=checkpoint["winner_twos"] / checkpoint["num_decks"]
+    all_games_output["tie freq"]=checkpoint["ties"] / checkpoint["num_decks"]
+
+    return all_games_output
@@ -0,0 +1,171 @@
+import numpy as np
+import struct
+import os
+from typing import Iterator
+
+# header of a deck store: magic, seed scheme, deck size, deck count, master seed, chunk size,
+# zero-padded to HEADER_SIZE bytes, followed by one row of packed bits per deck
+MAGIC = b"PENNEYD1"
+HEADER_FORMAT = "<8sBIQqI"
+HEADER_SIZE = 64
+
+# how the stored decks were seeded, so a store records where its decks came from
+SEED_SCHEME_PER_DECK = 0 # deck i shuffled after np.random.seed(i) (see generate.get_n_decks)
+SEED_SCHEME_SPAWN = 1    # chunk i drawn from SeedSequence(seed, spawn_key=(i,)) (see generate.iter_deck_chunks)
+SEED_SCHEME_UNKNOWN = 255
+
+class DeckStore:
+    '''
+    A DeckStore object is an opened binary deck file, the decks being 0/1 cards packed 8 per
+    byte (7 bytes for a 52-card deck) and memory-mapped, so any slice of decks is read
+    straight from disk without loading the whole file.
+    '''
+    def __init__(self, path: str) -> None:
+        with open(path, "rb") as f:
+            header = f.read(HEADER_SIZE)
+        if len(header) < HEADER_SIZE or header[:len(MAGIC)] != MAGIC:
+            raise Exception("Invalid Deck Store")
+
+        (_, self.seed_scheme, self.deck_size, self.count,
+         self.seed, self.chunk_size) = struct.unpack_from(HEADER_FORMAT, header)
+        self.path = path
+        self.bytes_per_deck = _bytes_per_deck(self.deck_size)
+
+        # np.memmap can't map an empty array, so an empty store gets an in-memory one instead
+        if self.count:
+            self.packed = np.memmap(path, dtype=np.uint8, mode="r", offset=HEADER_SIZE,
+                                    shape=(self.count, self.bytes_per_deck))
+        else:
+            self.packed = np.zeros((0, self.bytes_per_deck), dtype=np.uint8)
+        return
+
+    def __repr__(self) -> str:
+        return f"Deck store {self.path} of {self.count} {self.deck_size}-card decks"
+
+    def __len__(self) -> int:
+        return self.count
+
+    def read(self, start: int = 0, stop: int = None) -> np.ndarray:
+        '''
+        Unpack the decks start to stop (exclusive) of this store
+
+        Arguments:
+            start (int): index of the first deck to read
+            stop (int): index after the last deck to read, defaults to the end of the store
+
+        Output:
+            decks (np.ndarray): 2D int8 array of shape (stop - start, deck_size), each row is a deck
+        '''
+        packed = self.packed[start:stop]
+        return np.unpackbits(packed, axis=1, count=self.deck_size).astype(np.int8)
+
+    def iter_chunks(self,
+                    chunk_size: int = 10000,
+                    start: int = 0,
+                    stop: int = None
+                    ) -> Iterator[np.ndarray]:
+        '''
+        Replay the decks start to stop (exclusive) of this store in chunks of chunk_size,
+        in the same form as generate.iter_deck_chunks
+
+        Arguments:
+            chunk_size (int): number of decks per chunk (the last chunk may be smaller)
+            start (int): index of the first deck to replay
+            stop (int): index after the last deck to replay, defaults to the end of the store
+
+        Output:
+            decks (np.ndarray): yields 2D int8 arrays of shape (chunk_size, deck_size),
+                                each row is a deck
+        '''
+        stop = self.count if stop is None else min(stop, self.count)
+        for chunk_start in range(start, stop, chunk_size):
+            yield self.read(chunk_start, min(chunk_start + chunk_size, stop))
+
+def _bytes_per_deck(deck_size: int) -> int:
+    '''
+    Number of bytes one packed deck of deck_size cards takes up in a store
+    '''
+    return (deck_size + 7) // 8
+
+def write_deck_store(path: str,
+                     deck_chunks,
+                     deck_size: int,
+                     seed_scheme: int = SEED_SCHEME_UNKNOWN,
+                     seed: int = -1,
+                     chunk_size: int = 0
+                     ) -> int:
+    '''
+    Write decks to a binary deck store, packing each deck's 0/1 cards into bits
+    (e.g. write_deck_store(path, iter_deck_chunks(n, 26, seed=s), 52, SEED_SCHEME_SPAWN, s, 10000))
+
+    Arguments:
+        path (str): file path of the deck store to create (overwritten if it exists)
+        deck_chunks: a 2D array of decks, one per row, or an iterable of such 2D chunks
+        deck_size (int): the number of cards in each deck
+        seed_scheme (int): how the decks were seeded (one of the SEED_SCHEME_* constants)
+        seed (int): master seed of the decks, -1 if there isn't one
+        chunk_size (int): number of decks per seeded chunk, 0 if the decks weren't chunked
+
+    Output:
+        count (int): number of decks written
+    '''
+    count = 0
+    for decks in tee_deck_store(path, deck_chunks, deck_size, seed_scheme, seed, chunk_size):
+        count += len(decks)
+    return count
+
+def tee_deck_store(path: str,
+                   deck_chunks,
+                   deck_size: int,
+                   seed_scheme: int = SEED_SCHEME_UNKNOWN,
+                   seed: int = -1,
+                   chunk_size: int = 0
+                   ) -> Iterator[np.ndarray]:
+    '''
+    Pass through a stream of decks, writing each chunk to a binary deck store as it goes by,
+    so a run can keep the decks it actually played; the header's deck count is filled in once
+    the stream ends (or is closed early)
+
+    Arguments:
+        path (str): file path of the deck store to create (overwritten if it exists)
+        deck_chunks: a 2D array of decks, one per row, or an iterable of such 2D chunks
+        deck_size (int): the number of cards in each deck
+        seed_scheme (int): how the decks were seeded (one of the SEED_SCHEME_* constants)
+        seed (int): master seed of the decks, -1 if there isn't one
+        chunk_size (int): number of decks per seeded chunk, 0 if the decks weren't chunked
+
+    Output:
+        decks (np.ndarray): yields the stream's chunks
+    '''
+    if isinstance(deck_chunks, np.ndarray):
+        deck_chunks = [deck_chunks]
+
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    count = 0
+    with open(path, "wb") as f:
+        f.write(bytes(HEADER_SIZE))
+        try:
+            for decks in deck_chunks:
+                if(decks.shape[1] != deck_size):
+                    raise Exception("Invalid Deck Size")
+                f.write(np.packbits(np.asarray(decks, dtype=np.uint8), axis=1).tobytes())
+                count += len(decks)
+                yield decks
+        finally:
+            # now that the decks are written, fill in the header with their count
+            f.seek(0)
+            f.write(struct.pack(HEADER_FORMAT, MAGIC, seed_scheme, deck_size,
+                                count, seed, chunk_size).ljust(HEADER_SIZE, b"\0"))
+    return
+
+def open_deck_store(path: str) -> DeckStore:
+    '''
+    Open a binary deck store for reading (see DeckStore)
+
+    Arguments:
+        path (str): file path of the deck store
+
+    Output:
+        store (DeckStore): the memory-mapped deck store
+    '''
+    return DeckStore(path)
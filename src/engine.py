@@ -0,0 +1,134 @@
+import numpy as np
+from typing import Iterator
+
+# the most (deck, combination) games scored at once by iter_score_batches, bounding the
+# engine's working memory (about 40 bytes per game) however many combinations there are
+MAX_BATCH_GAMES = 2**22
+
+def encode_sequence(seq: tuple) -> int:
+    '''
+    Encode a player's sequence of 0s and 1s as an integer, reading the first card
+    of the sequence as the most significant bit (e.g. (1, 0, 0) becomes 4)
+
+    Arguments:
+        seq (tuple): a player's chosen sequence of 0s and 1s
+
+    Output:
+        code (int): the integer whose seq_len-bit binary form is the sequence
+    '''
+    code = 0
+    for card in seq:
+        code = (code << 1) | int(card)
+    return code
+
+def encode_combos(all_combos: list) -> tuple[np.ndarray, np.ndarray]:
+    '''
+    Encode every sequence combination as a pair of integer codes (see encode_sequence)
+
+    Arguments:
+        all_combos (list): all possible ways for players to match sequences
+                           while playing the game (pregenerated), or generate.ComboCodes
+
+    Output:
+        p1_codes (np.ndarray): 1D array of player one's sequence codes, one per combination
+        p2_codes (np.ndarray): 1D array of player two's sequence codes, one per combination
+    '''
+    # integer-coded combinations (see generate.ComboCodes) already hold their codes
+    if hasattr(all_combos, "p1_codes"):
+        return all_combos.p1_codes, all_combos.p2_codes
+
+    p1_codes = np.array([encode_sequence(combo[0]) for combo in all_combos], dtype=np.int64)
+    p2_codes = np.array([encode_sequence(combo[1]) for combo in all_combos], dtype=np.int64)
+    return p1_codes, p2_codes
+
+def score_deck_batch(decks: np.ndarray,
+                     all_combos: list,
+                     seq_len: int
+                     ) -> tuple[np.ndarray, np.ndarray]:
+    '''
+    Play every deck in the batch against every sequence combination at once, advancing the
+    state of all (deck, combination) games together one deck column (card) at a time. The
+    last seq_len cards on the table are kept as a sliding-window integer code, so checking
+    for a trick is a single integer comparison against each player's sequence code.
+    The counts match Game.play_this_game_deck exactly.
+
+    Arguments:
+        decks (np.ndarray): 2D array of shape (n_decks, deck_size), each row is a shuffled deck
+        all_combos (list): all possible ways for players to match sequences
+                           while playing the game (pregenerated)
+        seq_len (int): the number of elements in each player's chosen sequence
+
+    Output:
+        tricks (np.ndarray): 3D array of shape (n_decks, n_combos, 2) with the number of tricks
+                             won by Players 1 and 2 in each game
+        cards (np.ndarray): 3D array of shape (n_decks, n_combos, 2) with the number of cards
+                            won by Players 1 and 2 in each game (extra cards are
+                            deck_size minus their sum)
+    '''
+    decks = np.asarray(decks)
+    n_decks, deck_size = decks.shape
+    p1_codes, p2_codes = encode_combos(all_combos)
+    mask = (1 << seq_len) - 1
+
+    # smallest unsigned type that holds a seq_len-bit window
+    window_dtype = np.uint16 if seq_len <= 16 else np.uint64
+    p1_codes = p1_codes.astype(window_dtype)
+    p2_codes = p2_codes.astype(window_dtype)
+
+    # per-game state: the window code of the cards on the table and the number of cards in
+    # play since the last trick (the window is only complete once seq_len cards are in play)
+    window = np.zeros((n_decks, len(all_combos)), dtype=window_dtype)
+    num_cards = np.zeros((n_decks, len(all_combos)), dtype=np.int32)
+    tricks = np.zeros((n_decks, len(all_combos), 2), dtype=np.int32)
+    cards = np.zeros((n_decks, len(all_combos), 2), dtype=np.int32)
+
+    for elem_idx in range(deck_size):
+        card = decks[:, elem_idx].astype(window_dtype)[:, None]
+
+        # add one card to the table, dropping the oldest card out of the window
+        window = ((window << 1) | card) & window_dtype(mask)
+        num_cards += 1
+
+        full = num_cards >= seq_len
+        p1_trick = full & (window == p1_codes)
+        p2_trick = full & (window == p2_codes) & ~p1_trick
+
+        tricks[..., 0] += p1_trick
+        tricks[..., 1] += p2_trick
+        cards[..., 0] += num_cards * p1_trick
+        cards[..., 1] += num_cards * p2_trick
+
+        # clear the table for every game where a trick was just taken
+        in_play = ~(p1_trick | p2_trick)
+        window *= in_play
+        num_cards *= in_play
+
+    return tricks, cards
+
+def iter_score_batches(decks: np.ndarray,
+                       all_combos: list,
+                       seq_len: int,
+                       max_games: int = MAX_BATCH_GAMES
+                       ) -> Iterator[tuple[slice, np.ndarray, np.ndarray]]:
+    '''
+    Score a batch of decks against consecutive slices of the combinations (see score_deck_batch),
+    each slice small enough that no more than max_games games are held at once, so memory
+    stays flat as seq_len (and with it the number of combinations) grows
+
+    Arguments:
+        decks (np.ndarray): 2D array of shape (n_decks, deck_size), each row is a shuffled deck
+        all_combos (list): all possible ways for players to match sequences
+                           while playing the game (pregenerated), or generate.ComboCodes
+        seq_len (int): the number of elements in each player's chosen sequence
+        max_games (int): the most games per slice, None to score every combination at once
+
+    Output:
+        combos (slice): yields the slice of all_combos scored
+        tricks (np.ndarray): its tricks, of shape (n_decks, slice length, 2) (see score_deck_batch)
+        cards (np.ndarray): its cards, of shape (n_decks, slice length, 2)
+    '''
+    n_combos = len(all_combos)
+    step = n_combos if max_games is None else max(1, max_games // max(1, len(decks)))
+    for start in range(0, n_combos, max(1, step)):
+        combos = slice(start, min(start + step, n_combos))
+        yield (combos, *score_deck_batch(decks, all_combos[combos], seq_len))
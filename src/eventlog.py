@@ -0,0 +1,164 @@
+import json
+import logging
+import os
+import queue
+import threading
+
+import numpy as np
+
+# summary: run-level progress and results only; sample: also trace every trace_every-th deck;
+# debug: also trace every game to the structured event log
+VERBOSITY_LEVELS = ("summary", "sample", "debug")
+
+logger = logging.getLogger("penney")
+
+_event_log = None
+_trace_every = 0
+
+class EventLog:
+    '''
+    An EventLog object is a buffered structured log, one JSON object per line. Events are
+    appended to an in-memory buffer on the hot path, and full buffers are handed to a
+    background thread that serializes and writes them, so tracing costs a list append per event.
+    '''
+    def __init__(self,
+                 path: str,
+                 buffer_size: int = 10000,
+                 max_pending: int = 16
+                 ) -> None:
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self.path = path
+        self.buffer_size = buffer_size
+        self._buffer = []
+        self._pending = queue.Queue(maxsize=max_pending)
+        self._writer = threading.Thread(target=self._write_buffers, daemon=True)
+        self._writer.start()
+        return
+
+    def __repr__(self) -> str:
+        return f"Event log writing to {self.path}"
+
+    def record(self, event: dict) -> None:
+        '''
+        Buffer one event, handing the buffer to the writer thread once full
+
+        Arguments:
+            event (dict): the event, any NumPy arrays in it are written as lists
+                          (they must not be modified after being recorded)
+        '''
+        self._buffer.append(event)
+        if(len(self._buffer) >= self.buffer_size):
+            self.flush()
+        return
+
+    def flush(self) -> None:
+        '''
+        Hand the buffered events to the writer thread
+        '''
+        if self._buffer:
+            self._pending.put(self._buffer)
+            self._buffer = []
+        return
+
+    def close(self) -> None:
+        '''
+        Write out every buffered event and stop the writer thread
+        '''
+        self.flush()
+        self._pending.put(None)
+        self._writer.join()
+        return
+
+    def _write_buffers(self) -> None:
+        '''
+        Writer thread, serializing each handed-off buffer until the log is closed
+        '''
+        with open(self.path, "w") as f:
+            while True:
+                events = self._pending.get()
+                if events is None:
+                    break
+                f.write("".join(json.dumps(event, default=_to_json) + "\n" for event in events))
+        return
+
+def _to_json(value):
+    '''
+    JSON fallback for the NumPy arrays and scalars recorded in events
+    '''
+    if isinstance(value, (np.ndarray, np.generic)):
+        return value.tolist()
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+def configure_logging(log_path: str,
+                      verbosity: str = "summary",
+                      trace_every: int = 1000,
+                      trace_path: str = None
+                      ) -> None:
+    '''
+    Send the simulation's log to log_path at the given verbosity level
+
+    Arguments:
+        log_path (str): file path of the run's text log
+        verbosity (str): "summary" for run-level progress and results only, "sample" to also
+                         trace every trace_every-th deck in the text log, or "debug" to also
+                         trace every game to a structured event log (see EventLog)
+        trace_every (int): the deck sampling interval at "sample" and "debug" verbosity
+        trace_path (str): file path of the event log, defaults to log_path with a .jsonl extension
+    '''
+    global _event_log, _trace_every
+    if(verbosity not in VERBOSITY_LEVELS):
+        raise Exception("Invalid Verbosity")
+
+    close_logging()
+    os.makedirs(os.path.dirname(log_path) or ".", exist_ok=True)
+    handler = logging.FileHandler(log_path, mode="w")
+    handler.setFormatter(logging.Formatter("%(message)s"))
+    logger.addHandler(handler)
+    logger.setLevel(logging.DEBUG if verbosity == "debug" else logging.INFO)
+    logger.propagate = False
+
+    _trace_every = trace_every if verbosity != "summary" else 0
+    if(verbosity == "debug"):
+        _event_log = EventLog(trace_path or os.path.splitext(log_path)[0] + ".jsonl")
+    return
+
+def close_logging() -> None:
+    '''
+    Flush and close the run's text log and event log
+    '''
+    global _event_log, _trace_every
+    for handler in list(logger.handlers):
+        handler.close()
+        logger.removeHandler(handler)
+    if _event_log is not None:
+        _event_log.close()
+    _event_log = None
+    _trace_every = 0
+    return
+
+def get_event_log() -> EventLog:
+    '''
+    Get the structured event log of the run, None unless tracing at "debug" verbosity
+    '''
+    return _event_log
+
+def is_tracing() -> bool:
+    '''
+    Whether the run traces decks or games, i.e. logs above "summary" verbosity
+    '''
+    return _trace_every > 0 or _event_log is not None
+
+def is_traced_deck(deck_idx: int) -> bool:
+    '''
+    Whether the deck at deck_idx is one of the sampled decks traced in the text log
+    '''
+    return _trace_every > 0 and deck_idx % _trace_every == 0
+
+def traced_decks(first_deck_idx: int, n_decks: int) -> range:
+    '''
+    Positions within a batch of n_decks decks, starting at deck first_deck_idx, 
+    of the sampled decks traced in the text log
+    '''
+    if(_trace_every <= 0):
+        return range(0)
+    return range(-first_deck_idx % _trace_every, n_decks, _trace_every)
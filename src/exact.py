@@ -0,0 +1,145 @@
+from fractions import Fraction
+from math import comb
+import numpy as np
+import pandas as pd
+
+from game import compile_automaton
+from eventlog import logger
+
+def exact_matchup_probabilities(two_player_seqs: tuple,
+                                deck_size: int = 52,
+                                scoring: str = "TRICKS",
+                                rational: bool = False
+                                ) -> tuple:
+    '''
+    Compute the exact probabilities of Player 1 winning, Player 2 winning and a tie for one
+    matchup over every possible shuffle of a deck with deck_size/2 0s and deck_size/2 1s.
+    Runs a dynamic program over (0s dealt, matchup automaton state, cards in play,
+    trick/card differential), dealing one card per step; since every arrangement of the deck
+    is equally likely, the next card is a 0 with probability (0s left)/(cards left). An odd
+    deck_size plays decks of deck_size - 1 cards, like the sampled decks (see generate.get_n_decks).
+
+    Arguments:
+        two_player_seqs (tuple): the two players' chosen sequences of 0s and 1s
+        deck_size (int): the number of cards in each deck
+        scoring (str): the desired method to score the players (see scoring methods)
+        rational (bool): count shuffles with exact integers and return fractions.Fraction
+                         probabilities instead of floats
+
+    Output:
+        p1_win (float or Fraction): probability that Player 1 wins this matchup
+        p2_win (float or Fraction): probability that Player 2 wins this matchup
+        tie (float or Fraction): probability that this matchup ends in a tie
+    '''
+    if(scoring != "TRICKS" and scoring != "CARDS"):
+        raise Exception("Invalid Scoring Method")
+
+    step, winner = compile_automaton(tuple(tuple(seq) for seq in two_player_seqs))
+    n_states = len(step) // 2
+    seq_len = len(two_player_seqs[0])
+    half_deck_size = deck_size // 2
+    n_cards = 2 * half_deck_size
+    total_shuffles = comb(n_cards, half_deck_size)
+
+    # scoring by cards needs the number of cards in play to know how many a trick is worth,
+    # scoring by tricks only ever moves the differential by one
+    by_cards = scoring == "CARDS"
+    max_pending = n_cards + 1 if by_cards else 1
+    max_diff = n_cards if by_cards else n_cards // seq_len
+    n_diffs = 2 * max_diff + 1
+
+    # when rational, weights are 0/1 so the table counts shuffles; object dtype once the
+    # counts could overflow int64
+    if rational:
+        dtype = np.int64 if total_shuffles < 2**62 else object
+    else:
+        dtype = np.float64
+
+    zeros_dealt = np.arange(half_deck_size + 1)
+    table = np.zeros((half_deck_size + 1, n_states, max_pending, n_diffs), dtype=dtype)
+    table[0, 0, 0, max_diff] = 1
+
+    for elem_idx in range(n_cards):
+        ones_dealt = elem_idx - zeros_dealt
+        zeros_left = np.clip(half_deck_size - zeros_dealt, 0, None)
+        ones_left = np.clip(half_deck_size - ones_dealt, 0, half_deck_size)
+        if rational:
+            weights = ((zeros_left > 0).astype(dtype), (ones_left > 0).astype(dtype))
+        else:
+            weights = (zeros_left / (n_cards - elem_idx), ones_left / (n_cards - elem_idx))
+
+        new_table = np.zeros_like(table)
+        for card in (0, 1):
+            dealt = table * weights[card][:, None, None, None]
+            # dealing a 0 moves the state to the next row of 0s dealt
+            src = dealt[:-1] if card == 0 else dealt
+            dst = new_table[1:] if card == 0 else new_table
+
+            for state in range(n_states):
+                transition = 2 * state + card
+                if not winner[transition]:
+                    if by_cards:
+                        dst[:, step[transition], 1:] += src[:, state, :-1]
+                    else:
+                        dst[:, step[transition]] += src[:, state]
+                    continue
+
+                # trick: the table is cleared and the differential moves by the trick's worth
+                # (a trick needs at least seq_len - 1 cards already in play)
+                sign = 1 if winner[transition] == 1 else -1
+                min_pending = seq_len - 1 if by_cards else 0
+                for pending in range(min_pending, min(elem_idx + 1, max_pending)):
+                    gain = pending + 1 if by_cards else 1
+                    if sign > 0:
+                        dst[:, 0, 0, gain:] += src[:, state, pending, :n_diffs - gain]
+                    else:
+                        dst[:, 0, 0, :n_diffs - gain] += src[:, state, pending, gain:]
+        table = new_table
+
+    # done dealing the full deck, cards still in play go to neither player
+    diffs = table.sum(axis=(0, 1, 2))
+    p1_win = diffs[max_diff + 1:].sum()
+    p2_win = diffs[:max_diff].sum()
+    tie = diffs[max_diff]
+
+    if rational:
+        return (Fraction(int(p1_win), total_shuffles), Fraction(int(p2_win), total_shuffles),
+                Fraction(int(tie), total_shuffles))
+    return float(p1_win), float(p2_win), float(tie)
+
+def solve_exact(deck_size: int,
+                all_combos: list,
+                scoring: str = "TRICKS",
+                rational: bool = False
+                ) -> pd.DataFrame:
+    '''
+    Exact counterpart of run_full_sim_and_score, computing every combination's true win
+    probabilities (see exact_matchup_probabilities) instead of sampling decks
+
+    Arguments:
+        deck_size (int): the number of cards in each deck
+        all_combos (list): all possible ways for players to match sequences
+                           while playing the game (pregenerated)
+        scoring (str): the desired method to score the players (see scoring methods)
+        rational (bool): return fractions.Fraction probabilities instead of floats
+
+    Output:
+        all_games_output (pd.DataFrame): the exact data from player one's perspective
+                                         containing columns for player one's sequences,
+                                         player two's sequences, the sequence combination's
+                                         probability of player one's wins, of player two's
+                                         wins and of a tie
+    '''
+    all_games_output = pd.DataFrame(columns = ["p1 combo", "p2 combo",
+                                               "p1 winner freq", "p2 winner freq", "tie freq"])
+    probabilities = [exact_matchup_probabilities(combo, deck_size, scoring, rational)
+                     for combo in all_combos]
+    logger.info(f"Exact win probabilities computed for {len(all_combos)} combos")
+
+    all_games_output["p1 combo"]=[''.join(str(e) for e in combo[0]) for combo in all_combos]
+    all_games_output["p2 combo"]=[''.join(str(e) for e in combo[1]) for combo in all_combos]
+    all_games_output["p1 winner freq"]=[p[0] for p in probabilities]
+    all_games_output["p2 winner freq"]=[p[1] for p in probabilities]
+    all_games_output["tie freq"]=[p[2] for p in probabilities]
+
+    return all_games_output
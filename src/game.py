@@ -1,4 +1,53 @@
-import queue
+import functools
+
+from eventlog import get_event_log
+
+@functools.lru_cache(maxsize=None)
+def compile_automaton(two_player_seqs: tuple) -> tuple[tuple, tuple]:
+    '''
+    Compile the two players' sequences into a small state machine (an Aho-Corasick automaton 
+    over the two sequences) so a deck can be scored with one table lookup per card. A state 
+    is the longest run of cards on the table that is still the start of either sequence; 
+    reaching a full sequence is a trick, after which the table is cleared and the machine 
+    restarts from the empty state. Compiled once per matchup and cached.
+
+    Arguments:
+        two_player_seqs (tuple): the two players' chosen sequences of 0s and 1s
+
+    Output:
+        step (tuple): the next state for each (state * 2 + card) transition
+        winner (tuple): the player (1 or 2) who takes a trick on each (state * 2 + card) 
+                        transition, or 0 if no one does
+    '''
+    p1_seq, p2_seq = (tuple(int(e) for e in seq) for seq in two_player_seqs)
+
+    # states are every proper prefix of either sequence, the empty table being state 0
+    prefixes = [()]
+    for seq in (p1_seq, p2_seq):
+        for length in range(1, len(seq)):
+            if seq[:length] not in prefixes:
+                prefixes.append(seq[:length])
+    state_of = {prefix: idx for idx, prefix in enumerate(prefixes)}
+
+    step = []
+    winner = []
+    for prefix in prefixes:
+        for card in (0, 1):
+            table = prefix + (card,)
+            if table == p1_seq:
+                step.append(0)
+                winner.append(1)
+            elif table == p2_seq:
+                step.append(0)
+                winner.append(2)
+            else:
+                # fall back to the longest suffix of the table that starts either sequence
+                while table not in state_of:
+                    table = table[1:]
+                step.append(state_of[table])
+                winner.append(0)
+
+    return tuple(step), tuple(winner)
 
 class Game:
     '''
@@ -31,121 +80,47 @@ class Game:
                               a list of each player's number of tricks, card counts 
                               for each player, and the number of extra cards from this game
         '''
-        print(f'Deck shuffle sequence: {self.master_seq}')
-        print(f"Two players' sequences: {self.two_player_seqs}")
-        
         # call function to get statistics from this deck shuffle and combination of players' sequences
-        win_stats = self._recurse()
-        print(f"Win stats this round:{win_stats} \n")
+        win_stats = self._play_automaton()
+
+        # full per-game trace, only recorded at debug verbosity
+        event_log = get_event_log()
+        if event_log is not None:
+            event_log.record({"event": "game", "deck": self.master_seq, 
+                              "seqs": self.two_player_seqs, "win_stats": win_stats})
 
         return win_stats
     
-    def _recurse(self, 
-                 memory: queue.Queue = None, 
-                 tricks: list = None, 
-                 p1_cards: list = None, 
-                 p2_cards: list = None, 
-                 extra: list = None, 
-                 num_cards: int = 0, 
-                 elem_idx: int = 0
-                 ) -> dict:
+    def _play_automaton(self) -> dict:
         '''
-        Recursive method to iterate through this deck shuffle with this combination of players' 
-        sequences, storing the top seq_len cards and making comparisons between this and the sequences,
-        tracking statistics for tricks and cards 
-
-        Arguments:
-            memory (queue.Queue): the recursively-updated queue of length seq_len or less, putting and 
-                                  getting from it as it cycles through the current combination and 
-                                  shuffle, against which comparison occurs with the players' sequences, 
-                                  checking for tricks
-            tricks (list): the recursively-updated list of length 2 for this shuffle with this 
-                           combination of sequences, tracking the number of tricks obtained by 
-                           Players 1 and 2
-            p1_cards (list): the recursively-updated list of length 1 for this shuffle with this 
-                             combination of sequences, tracking the number of cards obtained by Player 1
-            p2_cards (list): the recursively-updated list of length 1 for this shuffle with this 
-                             combination of sequences, tracking the number of cards obtained by Player 2
-            extra (list): the recursively-updated list of length 1 for this shuffle with this 
-                          combination of sequences, tracking the number of extra cards won by 
-                          neither Players
-            num_cards (int): the recursively-updated int for this shuffle with this combination of 
-                             sequences, tracking the number of cards in play (on the table, not in 
-                             either player's hand) eventually added to p1_cards[], p2_cards[], or extra[] 
-            elem_idx (int):  the recursively-updated int for this shuffle with this combination, 
-                             iterating through the deck and tracking the current index, method concludes 
-                             when this int reaches deck length
+        Iterate through this deck shuffle with this combination of players' sequences using 
+        the matchup's compiled state machine (see compile_automaton), tracking statistics for 
+        tricks and cards in a single flat loop
 
         Output:
             win_stats (dict): the dictionary from a processed simulation containing 
                               a list of each player's number of tricks, card counts 
                               for each player, and the number of extra cards from this game
         '''
-        # add elements to the various lists if starting from the first function call on this deck
-        if memory is None:
-            memory = queue.Queue()
-        if tricks is None:
-            tricks = [0, 0]
-        if p1_cards is None:
-            p1_cards = [0]
-        if p2_cards is None:
-            p2_cards = [0]  
-        if extra is None:
-            extra = [0]
-        
-        # iterate through this deck with this combination of sequences
-        if(elem_idx < len(self.master_seq)):
-            
-            # add one card to deck to bring num cards in queue between 1 and seq_len 
-            # for upcoming sequence comparison
-            memory.put(self.master_seq[elem_idx])
-            num_cards+=1
-            # print(f'Current sequence on the table: {tuple(memory.queue)}')
-            
-            # trick and cards for p1 if p1 sequence matches the top seq_len cards on the table 
-            if(tuple(memory.queue) == self.two_player_seqs[0]):
-                tricks[0]+=1
-                p1_cards[0]+=num_cards
-                num_cards = 0
-                # print("-----------------------P1 trick-----------------------")
-
-                #remove cards from memory to simulate all the in-play cards going to p1
-                while not memory.empty(): 
-                    memory.get()
-                
-                # recurse through this method to make the comparison repeatedly until end of deck 
-                return self._recurse(memory, tricks, p1_cards, 
-                                    p2_cards, extra, num_cards, elem_idx+1)
-            
-            # trick and cards for p2 if p2 sequence matches the top seq_len cards on the table 
-            elif (tuple(memory.queue) == self.two_player_seqs[1]):
-                tricks[1]+=1
-                p2_cards[0]+=num_cards
+        step, winner = compile_automaton(tuple(tuple(seq) for seq in self.two_player_seqs))
+
+        state = 0
+        num_cards = 0 # cards in play (on the table, not in either player's hand)
+        tricks = [0, 0]
+        cards = [0, 0]
+
+        for card in self.master_seq:
+            transition = 2 * state + card
+            num_cards += 1
+
+            # trick and cards for the player whose sequence was just completed
+            if winner[transition]:
+                tricks[winner[transition] - 1] += 1
+                cards[winner[transition] - 1] += num_cards
                 num_cards = 0
-                # print("-----------------------P2 trick-----------------------")
-
-                #remove cards from memory to simulate all the in-play cards going to p1
-                while not memory.empty(): 
-                    memory.get()
-                
-                # recurse through this method to make the comparison repeatedly until end of deck 
-                return self._recurse(memory, tricks, p1_cards, 
-                                    p2_cards, extra, num_cards, elem_idx+1)            
-
-            # if neither sequence matches the top seq_len cards on the table, 
-            # remove first added card, keeping queue length at seq_len-1 for next recursive comparison 
-            else:
-                if(memory.qsize()>=self.seq_len):
-                    memory.get() 
-                
-                # recurse through this method to make the comparison repeatedly until end of deck 
-                return self._recurse(memory, tricks, p1_cards, 
-                                     p2_cards, extra, num_cards, elem_idx+1)        
-        else: 
-            # done iterating through full deck, break and return the statistics here in dict form
-            extra[0]+=num_cards
-            # print("-----------------------Round Over-----------------------")
-
-            win_stats = {"tricks": tricks, "p1_cards": p1_cards, 
-                         "p2_cards": p2_cards, "extra cards": extra}
-            return(win_stats)
\ No newline at end of file
+            state = step[transition]
+
+        # done iterating through full deck, cards still on the table are extra
+        win_stats = {"tricks": tricks, "p1_cards": [cards[0]], 
+                     "p2_cards": [cards[1]], "extra cards": [num_cards]}
+        return win_stats
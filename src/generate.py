@@ -1,6 +1,10 @@
 import numpy as np
 import itertools
 import os
+from typing import Iterator
+
+from deckstore import (write_deck_store, tee_deck_store, SEED_SCHEME_PER_DECK, SEED_SCHEME_SPAWN, 
+                       SEED_SCHEME_UNKNOWN)
 
 def create_game_combos(seq_len: int=3) -> list:
     '''
@@ -22,6 +26,194 @@ def create_game_combos(seq_len: int=3) -> list:
 
     return(combinations)
 
+def reduce_game_combos(all_combos: list) -> list:
+    '''
+    Keep one representative of each class of equivalent sequence combinations. With an equal 
+    number of 0s and 1s in the deck, swapping colors (0s and 1s) in both sequences gives an 
+    identically distributed game, and swapping the players mirrors the result, so 
+    (x, y), (~x, ~y), (y, x) and (~y, ~x) only need to be scored once (see 
+    results.expand_symmetric_output to recover the rest).
+
+    Arguments:
+        all_combos (list): all possible ways for players to match sequences 
+                           while playing the game (see create_game_combos)
+    
+    Output:
+        combinations (list): the first combination of each equivalence class, 
+                             in the order of all_combos
+    '''
+    seen = set()
+    combinations = []
+    for combo in all_combos:
+        if combo in seen:
+            continue
+        combinations.append(combo)
+
+        x, y = combo
+        not_x = tuple(1 - e for e in x)
+        not_y = tuple(1 - e for e in y)
+        seen.update([(x, y), (not_x, not_y), (y, x), (not_y, not_x)])
+
+    return(combinations)
+
+class ComboCodes:
+    '''
+    A ComboCodes object is a set of sequence combinations kept as two integer arrays of 
+    sequence codes (see engine.encode_sequence), player one's and player two's, in the order of 
+    create_game_combos, instead of a list of nested tuples. The engines read the codes directly 
+    (see engine.encode_combos); iterating or indexing it gives (p1 tuple, p2 tuple) combinations 
+    one at a time, so it can stand in for all_combos anywhere.
+    '''
+    def __init__(self, seq_len: int, p1_codes: np.ndarray, p2_codes: np.ndarray) -> None:
+        self.seq_len = seq_len
+        self.p1_codes = np.asarray(p1_codes, dtype=np.int64)
+        self.p2_codes = np.asarray(p2_codes, dtype=np.int64)
+        return
+
+    def __repr__(self) -> str:
+        return f"{len(self)} combos of length-{self.seq_len} sequences"
+
+    def __len__(self) -> int:
+        return len(self.p1_codes)
+
+    def __iter__(self) -> Iterator[tuple]:
+        for p1_code, p2_code in zip(self.p1_codes.tolist(), self.p2_codes.tolist()):
+            yield (_decode_sequence(p1_code, self.seq_len), _decode_sequence(p2_code, self.seq_len))
+
+    def __getitem__(self, idx):
+        # one combination as tuples, or a subset (slice, index array or mask) as ComboCodes
+        if isinstance(idx, (int, np.integer)):
+            return (_decode_sequence(int(self.p1_codes[idx]), self.seq_len), 
+                    _decode_sequence(int(self.p2_codes[idx]), self.seq_len))
+        return ComboCodes(self.seq_len, self.p1_codes[idx], self.p2_codes[idx])
+
+    def reduce(self) -> "ComboCodes":
+        '''
+        Vectorized reduce_game_combos: keep the first combination of each class of equivalent 
+        combinations, (x, y), (~x, ~y), (y, x) and (~y, ~x)
+
+        Output:
+            combinations (ComboCodes): one combination per class, in the same order
+        '''
+        mask = (1 << self.seq_len) - 1
+        x, y = self.p1_codes, self.p2_codes
+        not_x, not_y = x ^ mask, y ^ mask
+        # each class is named by the position its first member has in create_game_combos' order
+        class_ids = np.minimum.reduce([x << self.seq_len | y, not_x << self.seq_len | not_y, 
+                                       y << self.seq_len | x, not_y << self.seq_len | not_x])
+        _, first = np.unique(class_ids, return_index=True)
+        return self[np.sort(first)]
+
+def get_combo_codes(seq_len: int = 3, 
+                    p1_seqs: list = None, 
+                    p2_seqs: list = None, 
+                    best_response_only: bool = False, 
+                    sample: int = None, 
+                    seed: int = 0
+                    ) -> ComboCodes:
+    '''
+    Integer-coded counterpart of create_game_combos, optionally narrowed down to the 
+    combinations of interest, without building any tuples
+
+    Arguments:
+        seq_len (int): The number of elements per sequence that players select
+        p1_seqs (list): if given, only these sequences for player one, as B/R or 0/1 strings, 
+                        tuples of 0s and 1s or sequence codes
+        p2_seqs (list): if given, only these sequences for player two
+        best_response_only (bool): only Conway-style best response candidates for player two, 
+                                   a card followed by player one's sequence without its last 
+                                   card (the best response is always one of these two)
+        sample (int): if given, a random subset of this many of the remaining combinations, 
+                      kept in order
+        seed (int): seed of the random subset
+
+    Output:
+        combinations (ComboCodes): the selected combinations, in the order of create_game_combos
+    '''
+    # count the combinations first, then copy each chunk straight into place (only the ones 
+    # sampled, if sampling), so no more than one chunk is held besides the result
+    n_combos = sum(len(chunk) for chunk in iter_combo_codes(seq_len, p1_seqs, p2_seqs, best_response_only))
+    keep = None
+    if(sample is not None and sample < n_combos):
+        rng = np.random.default_rng(seed)
+        keep = np.sort(rng.choice(n_combos, sample, replace=False))
+
+    p1_codes = np.empty(n_combos if keep is None else len(keep), dtype=np.int64)
+    p2_codes = np.empty_like(p1_codes)
+    start = 0
+    for chunk in iter_combo_codes(seq_len, p1_seqs, p2_seqs, best_response_only):
+        if keep is None:
+            rows, lo, hi = slice(None), start, start + len(chunk)
+        else:
+            lo, hi = np.searchsorted(keep, [start, start + len(chunk)])
+            rows = keep[lo:hi] - start
+        p1_codes[lo:hi] = chunk.p1_codes[rows]
+        p2_codes[lo:hi] = chunk.p2_codes[rows]
+        start += len(chunk)
+    return ComboCodes(seq_len, p1_codes, p2_codes)
+
+def iter_combo_codes(seq_len: int = 3, 
+                     p1_seqs: list = None, 
+                     p2_seqs: list = None, 
+                     best_response_only: bool = False, 
+                     chunk_size: int = 65536
+                     ) -> Iterator[ComboCodes]:
+    '''
+    Lazily enumerate the combinations of get_combo_codes in chunks of about chunk_size, 
+    a block of player one's sequences at a time, so memory stays flat as seq_len grows
+
+    Arguments:
+        seq_len (int): The number of elements per sequence that players select
+        p1_seqs (list): if given, only these sequences for player one (see get_combo_codes)
+        p2_seqs (list): if given, only these sequences for player two
+        best_response_only (bool): only Conway-style best response candidates for player two
+        chunk_size (int): the most combinations per chunk (at least one player one sequence's)
+
+    Output:
+        combinations (ComboCodes): yields chunks of combinations, in the order of create_game_combos
+    '''
+    n_seqs = 2**seq_len
+    p1_all = np.arange(n_seqs) if p1_seqs is None else np.unique([_sequence_code(seq, seq_len) for seq in p1_seqs])
+    p2_all = np.arange(n_seqs) if p2_seqs is None else np.unique([_sequence_code(seq, seq_len) for seq in p2_seqs])
+
+    p1_per_chunk = max(1, chunk_size // (2 if best_response_only else len(p2_all)))
+    for start in range(0, len(p1_all), p1_per_chunk):
+        p1_block = p1_all[start:start + p1_per_chunk]
+        if best_response_only:
+            # Conway: the best response to x1..xk is c x1..x(k-1) for one of the cards c
+            p1_codes = np.repeat(p1_block, 2)
+            p2_codes = (np.tile([0, 1], len(p1_block)) << (seq_len - 1)) | (p1_codes >> 1)
+            keep = (p1_codes != p2_codes) & np.isin(p2_codes, p2_all)
+        else:
+            p1_codes = np.repeat(p1_block, len(p2_all))
+            p2_codes = np.tile(p2_all, len(p1_block))
+            keep = p1_codes != p2_codes
+        if keep.any():
+            yield ComboCodes(seq_len, p1_codes[keep], p2_codes[keep])
+
+def _sequence_code(seq, seq_len: int) -> int:
+    '''
+    Sequence code of a length-seq_len sequence given as a B/R or 0/1 string, a tuple of 0s 
+    and 1s, or a code
+    '''
+    if isinstance(seq, (int, np.integer)):
+        if(not 0 <= seq < 2**seq_len):
+            raise Exception("Invalid Sequence")
+        return int(seq)
+    if isinstance(seq, str):
+        seq = seq.upper().translate(str.maketrans("BR", "01"))
+    if(len(seq) != seq_len):
+        raise Exception("Invalid Sequence Length")
+    if(set(str(card) for card in seq) - {"0", "1"}):
+        raise Exception("Invalid Sequence")
+    return int(''.join(str(card) for card in seq), 2)
+
+def _decode_sequence(code: int, seq_len: int) -> tuple:
+    '''
+    Tuple of 0s and 1s of a sequence code, first card in the most significant bit
+    '''
+    return tuple((code >> shift) & 1 for shift in range(seq_len - 1, -1, -1))
+
 # Function adapted from student Yueran Shi from Piazza
 def _get_init_deck(half_deck_size: int) -> np.ndarray:
     """
@@ -39,7 +231,9 @@ def _get_init_deck(half_deck_size: int) -> np.ndarray:
 
 # Function adapted from student Yueran Shi from Piazza
 def get_n_decks(n_decks: int, 
-                half_num_cards: int
+                half_num_cards: int,
+                save_csv: bool = True,
+                store_path: str = None
                 ) -> tuple[np.ndarray, np.ndarray]:
     """
     Efficiently generate `n_decks` shuffled decks using NumPy.
@@ -48,6 +242,9 @@ def get_n_decks(n_decks: int,
         n_decks (int): number of decks to generate
         half_num_cards (int): half the size of each to-be shuffled deck, 
                               representing the number of 0s and 1s
+        save_csv (bool): whether to also write every deck to data/decks_output.csv
+        store_path (str): if given, also write every deck to this binary deck store 
+                          (see deckstore.write_deck_store)
     
     Output:
         decks (np.ndarray): 2D array of shape (n_decks, half_num_cards), each row is a shuffled deck.
@@ -62,8 +259,104 @@ def get_n_decks(n_decks: int,
         np.random.shuffle(decks[i])  # Shuffle each row with a different seed
     
     # output as .csv in data folder (create if doesn't already exist)
-    fig_dir = "data/"  
-    os.makedirs(fig_dir, exist_ok=True)
-    np.savetxt(os.path.join(fig_dir, "decks_output.csv"), decks, delimiter=",", fmt="%d")  
+    if save_csv:
+        fig_dir = "data/"  
+        os.makedirs(fig_dir, exist_ok=True)
+        np.savetxt(os.path.join(fig_dir, "decks_output.csv"), decks, delimiter=",", fmt="%d")  
+    if store_path is not None:
+        write_deck_store(store_path, decks, 2 * half_num_cards, seed_scheme = SEED_SCHEME_PER_DECK)
+    
+    return decks, seeds
+
+def get_shard_seed(seed: int, shard_idx: int) -> np.random.SeedSequence:
+    """
+    Get the independent, reproducible random stream of one shard of decks. Shard i's stream
+    depends only on the master seed and i, never on how many shards or workers there are.
+
+    Arguments:
+        seed (int): master seed of the whole simulation
+        shard_idx (int): index of the shard of decks
+
+    Output:
+        shard_seed (np.random.SeedSequence): the seed sequence spawned for this shard
+    """
+    return np.random.SeedSequence(seed, spawn_key=(shard_idx,))
+
+def get_shard_decks(shard_seed: np.random.SeedSequence, 
+                    n_decks: int, 
+                    half_num_cards: int,
+                    dtype: type = np.int8
+                    ) -> np.ndarray:
+    """
+    Generate one shard of `n_decks` shuffled decks from the shard's own random stream,
+    shuffling every row at once.
+
+    Arguments:
+        shard_seed (np.random.SeedSequence): the shard's seed sequence (see get_shard_seed)
+        n_decks (int): number of decks to generate
+        half_num_cards (int): half the size of each to-be shuffled deck, 
+                              representing the number of 0s and 1s
+        dtype (type): integer type of the cards, one byte per card by default
     
-    return decks, seeds
\ No newline at end of file
+    Output:
+        decks (np.ndarray): 2D array of shape (n_decks, 2 * half_num_cards), each row is a shuffled deck.
+    """
+    rng = np.random.default_rng(shard_seed)
+    decks = np.tile(_get_init_deck(half_num_cards).astype(dtype), (n_decks, 1))
+    return rng.permuted(decks, axis=1)
+
+def iter_deck_chunks(n_decks: int, 
+                     half_num_cards: int, 
+                     chunk_size: int = 10000, 
+                     seed: int = 0, 
+                     dtype: type = np.int8,
+                     csv_path: str = None,
+                     first_chunk: int = 0,
+                     store_path: str = None
+                     ) -> Iterator[np.ndarray]:
+    """
+    Lazily generate `n_decks` shuffled decks in chunks of `chunk_size`, chunk i being the decks 
+    of shard i under the master seed (see get_shard_decks), so only one chunk is held in memory 
+    however many decks there are, and the decks match a sharded run with the same chunk size.
+
+    Arguments:
+        n_decks (int): number of decks to generate
+        half_num_cards (int): half the size of each to-be shuffled deck, 
+                              representing the number of 0s and 1s
+        chunk_size (int): number of decks per chunk (the last chunk may be smaller)
+        seed (int): master seed from which every chunk's random stream is spawned
+        dtype (type): integer type of the cards, one byte per card by default
+        csv_path (str): if given, also write every deck to this .csv as its chunk is generated
+        first_chunk (int): index of the first chunk to generate, to continue or split up a run
+        store_path (str): if given, also write every deck to this binary deck store as its chunk 
+                          is generated (see deckstore.tee_deck_store), recording the seed and 
+                          chunk size the decks can be regenerated from
+
+    Output:
+        decks (np.ndarray): yields 2D arrays of shape (chunk_size, 2 * half_num_cards), 
+                            each row is a shuffled deck.
+    """
+    if store_path is not None:
+        # a store of a run starting past chunk 0 can't be regenerated from its seed alone
+        seed_scheme = SEED_SCHEME_SPAWN if first_chunk == 0 else SEED_SCHEME_UNKNOWN
+        yield from tee_deck_store(store_path, 
+                                  iter_deck_chunks(n_decks, half_num_cards, chunk_size, seed, dtype, 
+                                                   csv_path, first_chunk), 
+                                  2 * half_num_cards, seed_scheme, seed, chunk_size)
+        return
+
+    csv_file = None
+    if csv_path is not None:
+        os.makedirs(os.path.dirname(csv_path) or ".", exist_ok=True)
+        csv_file = open(csv_path, "w")
+
+    try:
+        for shard_idx, start in enumerate(range(0, n_decks, chunk_size), start=first_chunk):
+            decks = get_shard_decks(get_shard_seed(seed, shard_idx), 
+                                    min(chunk_size, n_decks - start), half_num_cards, dtype)
+            if csv_file is not None:
+                np.savetxt(csv_file, decks, delimiter=",", fmt="%d")
+            yield decks
+    finally:
+        if csv_file is not None:
+            csv_file.close()
\ No newline at end of file
@@ -1,21 +1,40 @@
+import numpy as np
 import pandas as pd
+import os
 
-from generate import create_game_combos, get_n_decks
-from score import run_full_sim_and_score
-from visualize import visualize_all_games_output
+from generate import get_combo_codes, iter_deck_chunks
+from score import (run_full_sim_and_score, run_parallel_sim_and_score, 
+                   run_adaptive_sim_and_score, run_checkpointed_sim_and_score, 
+                   run_bundle_sim_and_score, run_cached_sim_and_score, 
+                   run_sweep_sim_and_score, run_antithetic_sim_and_score)
+from checkpoint import merge_checkpoints, checkpoint_to_output, load_checkpoint
+from exact import solve_exact
+from deckstore import open_deck_store
+from eventlog import logger, is_tracing
+from cache import DEFAULT_CACHE_DIR
+from metrics import stage, timed_iter
+from results import (pivot_output, pivot_result_tensor, bundle_to_output, save_bundle, load_bundle, 
+                     save_result_tensor, load_result_tensor, save_output, load_output, 
+                     expand_symmetric_output, expand_result_tensor, SCORING_METHODS)
+from visualize import render_heatmaps
+from stream import run_streaming_sim_and_score
 
 def split_simulation_output(all_games_output: pd.DataFrame) -> pd.DataFrame:
     '''
     Function that takes the raw dataframe from a fully-run simulation and transforms via pivoting
     into the shape of a heatmaps while switching numerical labels (0 and 1) into strings to represent
-    black and red cards (B and R)
+    black and red cards (B and R). A result tensor (see results.new_result_tensor) is pivoted 
+    straight into the heatmaps' shape instead. Only the sequences played are rows and columns, 
+    so combinations left out by symmetry are filled in beforehand (see 
+    results.expand_symmetric_output and results.expand_result_tensor).
 
     Arguments:
         all_games_output (pd.DataFrame): the raw data from a full simulation from one player's 
                                          perspective containing columns for player one's sequences, 
                                          player two's sequences, the sequence combination's frequency 
                                          of player one's wins, and the sequence combination's 
-                                         frequency of player two's wins
+                                         frequency of player two's wins, or the simulation's 
+                                         result tensor
     
     Output: 
         all_games_output_one (pd.DataFrame): the pivoted data from a full simulation from player one's 
@@ -28,24 +47,12 @@ def split_simulation_output(all_games_output: pd.DataFrame) -> pd.DataFrame:
                                              and data being frequency of that player's wins
     '''
     # pivot the all_games_output into the shape of heatmaps, displaying 
-    # the sequence combinations along with Player 1's win frequency as the main data                              
-    all_games_output_one = all_games_output.pivot(index = 'p1 combo', 
-                                                  columns = 'p2 combo', 
-                                                  values = "p1 winner freq")
+    # the sequence combinations along with Player 1's and Player 2's win frequency as the main data                              
+    if isinstance(all_games_output, dict):
+        return pivot_result_tensor(all_games_output, 0), pivot_result_tensor(all_games_output, 1)
 
-    # switch 1s to red (R) and 0s to black (B)
-    all_games_output_one.index = all_games_output_one.index.map(lambda x: x.replace('0', 'B').replace('1', 'R'))
-    all_games_output_one.columns = all_games_output_one.columns.map(lambda x: x.replace('0', 'B').replace('1', 'R'))
-
-    # pivot the all_games_output into the shape of heatmaps, displaying 
-    # the sequence combinations along with Player 2's win frequency as the main data                              
-    all_games_output_two = all_games_output.pivot(index = 'p1 combo', 
-                                                  columns = 'p2 combo', 
-                                                  values = "p2 winner freq")
-
-    # switch 1s to red (R) and 0s to black (B)
-    all_games_output_two.index = all_games_output_two.index.map(lambda x: x.replace('0', 'B').replace('1', 'R'))
-    all_games_output_two.columns = all_games_output_two.columns.map(lambda x: x.replace('0', 'B').replace('1', 'R'))
+    all_games_output_one = pivot_output(all_games_output, "p1 winner freq")
+    all_games_output_two = pivot_output(all_games_output, "p2 winner freq")
     
     return all_games_output_one, all_games_output_two
 
@@ -53,7 +60,24 @@ def simulate_and_visualize(current_time: str,
                            seq_len: int = 3, 
                            deck_size: int = 52, 
                            num_decks: int = 1000, 
-                           scoring: str = "TRICKS") -> None:
+                           scoring: str = "TRICKS",
+                           engine: str = "vectorized",
+                           n_workers: int = None,
+                           seed: int = 0,
+                           save_decks: bool = False,
+                           deck_file: str = None,
+                           target_half_width: float = None,
+                           checkpoint_path: str = None,
+                           resume: bool = False,
+                           first_chunk: int = 0,
+                           use_symmetry: bool = True,
+                           cache_dir: str = DEFAULT_CACHE_DIR,
+                           antithetic: str = None,
+                           p1_seqs: list = None,
+                           p2_seqs: list = None,
+                           best_response_only: bool = False,
+                           combo_sample: int = None,
+                           stream: bool = False) -> None:
     '''
     Augmentation function for user to modify and run the Penney's Game simulation, generating all 
     results and visualizations
@@ -63,35 +87,532 @@ def simulate_and_visualize(current_time: str,
         seq_len (int): the number of elements in each player's chosen sequence
         deck_size (int): the number of cards in each deck
         num_decks (int): the desired number of Monte Carlo simulations to execute this simulation
-        scoring (str): the desired method to score the players (see scoring methods)
+        scoring (str): the desired method to score the players (see scoring methods), or "BOTH" 
+                       to score the same games by tricks and by cards in one vectorized pass 
+                       (see run_bundle_sim_and_score), also saving tie rate heatmaps and the 
+                       results bundle (results.npz) next to the heatmaps (full or streamed 
+                       single-process runs only)
+        engine (str): the scoring engine to run the simulation with (see run_full_sim_and_score),
+                      or "exact" to compute the true win probabilities without sampling decks
+                      (see exact.solve_exact), in which case num_decks is unused; the automaton 
+                      engine only plays single-process runs scored one way, and combinations of 
+                      options no run supports raise an exception before anything is played
+        n_workers (int): if given, generate and score the decks in shards over this many worker 
+                         processes (see run_parallel_sim_and_score), with the same results as 
+                         the single-process run (full or cached runs of newly generated decks only)
+        seed (int): master seed of the decks (see generate.iter_deck_chunks)
+        save_decks (bool): whether to also write every deck played to a binary deck store, 
+                           data/heatmaps/<current_time>/decks.bin (see deckstore.DeckStore), 
+                           which deck_file can replay (single-process runs only)
+        deck_file (str): if given, replay the first num_decks decks of this binary deck store 
+                         (see deckstore.DeckStore) instead of generating new ones (neither can 
+                         be used by exact, adaptive, antithetic or checkpointed runs)
+        target_half_width (float): if given, stop sampling each combination once its 95% 
+                                   confidence intervals are this narrow (see 
+                                   run_adaptive_sim_and_score), num_decks being the most decks 
+                                   any combination is played on, and also save a heatmap of 
+                                   the intervals' half-widths
+        checkpoint_path (str): if given, periodically checkpoint the run's results to this file 
+                               (see run_checkpointed_sim_and_score)
+        resume (bool): whether to continue from the checkpoint at checkpoint_path
+        first_chunk (int): index of the first chunk of decks to play in a checkpointed run, 
+                           so runs on different hosts can split up the decks of one seed
+        use_symmetry (bool): whether to only score one combination of each class of equivalent 
+                             combinations (see generate.reduce_game_combos), the heatmaps being 
+                             filled in by symmetry
+        cache_dir (str): directory of the result cache (see run_cached_sim_and_score) that 
+                         seeded vectorized runs are served from and saved to, None to always 
+                         simulate from scratch (runs logging above "summary" verbosity always 
+                         simulate, so their sampled decks are traced)
+        antithetic (str): if given, play each deck drawn together with its "reverse", its color 
+                          "complement" or "both" (see run_antithetic_sim_and_score), num_decks 
+                          counting the paired decks, and also save a heatmap of the standard errors
+        p1_seqs (list): if given, only play these sequences for player one, e.g. ["BRR", "RBB"]
+                        (see generate.get_combo_codes), the other heatmap cells being left blank
+        p2_seqs (list): if given, only play these sequences for player two
+        best_response_only (bool): only play player two's Conway-style best response candidates 
+                                   against each of player one's sequences
+        combo_sample (int): if given, only play a random subset of this many combinations 
+                            (seeded by seed)
+        stream (bool): whether to generate (or read), score and count the decks in overlapping 
+                       pipeline stages with constant memory (see stream.run_streaming_sim_and_score), 
+                       for vectorized runs of any number of decks (bypassing the result cache, 
+                       whose per-chunk counts grow with the number of decks); the automaton 
+                       engine, sharded, adaptive, antithetic and checkpointed runs can't stream
     '''
-    # create all of the possible sequence combinations match-ups of length seq_len between the two players
-    # store in a list of tuples
-    all_combos = create_game_combos(seq_len = seq_len) 
+    _check_options(engine, scoring, n_workers, save_decks, deck_file, target_half_width, 
+                   checkpoint_path, antithetic, stream)
+
+    # create the sequence combinations match-ups of length seq_len between the two players
+    # as integer sequence codes (see generate.ComboCodes), which the engines score directly; 
+    # the results are filled back in over the selected ones, and only those are visualized
+    selected = get_combo_codes(seq_len = seq_len, p1_seqs = p1_seqs, p2_seqs = p2_seqs, 
+                               best_response_only = best_response_only, 
+                               sample = combo_sample, seed = seed)
+    all_combos = selected.reduce() if use_symmetry else selected
+
+    if(engine == "exact"):
+        logger.info(f"Date and time of this run: {current_time}")
+        with stage("score", profile = True, matchups = len(all_combos)):
+            all_games_output = solve_exact(deck_size = deck_size, 
+                                           all_combos = all_combos, 
+                                           scoring = scoring)
+        _save_and_visualize_output(all_games_output, current_time, 
+                                   f"Exact Win Rate for {deck_size}-Length Decks Scored by {scoring}, Sequence Length of {seq_len}", 
+                                   all_combos = selected)
+        return
+
+    if(target_half_width is not None):
+        logger.info(f"Date and time of this run: {current_time}")
+        with stage("score", profile = True) as record:
+            all_games_output = run_adaptive_sim_and_score(deck_size = deck_size, 
+                                                          seq_len = seq_len, 
+                                                          all_combos = all_combos, 
+                                                          scoring = scoring, 
+                                                          target_half_width = target_half_width, 
+                                                          max_decks = num_decks, 
+                                                          seed = seed)
+            record.update(_score_counts(all_games_output["n decks"].to_numpy(), all_combos, deck_size))
+        title = f"Win Rate Over Up To {num_decks} {deck_size}-Length Decks Scored by {scoring}, Sequence Length of {seq_len}"
+        all_games_output["ci half width"] = _ci_half_width(all_games_output)
+        _save_and_visualize_output(all_games_output, current_time, title, 
+                                   [("ci half width", f"95% CI Half-Width of {title}")], all_combos = selected)
+        return
+
+    if(antithetic is not None):
+        logger.info(f"Date and time of this run: {current_time}")
+        with stage("score", profile = True, **_score_counts(num_decks, all_combos, deck_size)):
+            all_games_output = run_antithetic_sim_and_score(deck_size = deck_size, 
+                                                            seq_len = seq_len, 
+                                                            num_decks = num_decks, 
+                                                            all_combos = all_combos, 
+                                                            scoring = scoring, 
+                                                            pairing = antithetic, 
+                                                            seed = seed)
+        title = f"Win Rate Over {num_decks} {deck_size}-Length Decks Scored by {scoring}, Sequence Length of {seq_len}"
+        _save_and_visualize_output(all_games_output, current_time, title, 
+                                   [("p1 se", f"Standard Error of P1 {title} ({antithetic} pairs)")], 
+                                   all_combos = selected)
+        return
 
-    # create a num_decks amount of randomly generated deck shuffles of deck_size number of cards
-    # store in a list of lists
-    master_seq_list, seeds = get_n_decks(n_decks = num_decks, half_num_cards = int(deck_size/2))
+    if(checkpoint_path is not None):
+        logger.info(f"Date and time of this run: {current_time}")
+        with stage("score", profile = True, **_score_counts(num_decks, all_combos, deck_size)):
+            all_games_output = run_checkpointed_sim_and_score(deck_size = deck_size, 
+                                                              seq_len = seq_len, 
+                                                              num_decks = num_decks, 
+                                                              all_combos = all_combos, 
+                                                              scoring = scoring, 
+                                                              seed = seed, 
+                                                              checkpoint_path = checkpoint_path, 
+                                                              resume = resume, 
+                                                              first_chunk = first_chunk)
+        _save_and_visualize_output(all_games_output, current_time, 
+                                   f"Win Rate Over {num_decks} {deck_size}-Length Decks Scored by {scoring}, Sequence Length of {seq_len}", 
+                                   all_combos = selected)
+        return
 
-    print(f"Date and time of this run: {current_time}")
+    if(cache_dir is not None and engine == "vectorized" and scoring != "BOTH" 
+       and deck_file is None and not save_decks and not stream and not is_tracing()):
+        logger.info(f"Date and time of this run: {current_time}")
+        with stage("score", profile = True, **_score_counts(num_decks, all_combos, deck_size)):
+            tensor = run_cached_sim_and_score(deck_size = deck_size, 
+                                              seq_len = seq_len, 
+                                              num_decks = num_decks, 
+                                              all_combos = all_combos, 
+                                              scoring = scoring, 
+                                              seed = seed, 
+                                              n_workers = n_workers or 1, 
+                                              cache_dir = cache_dir, 
+                                              as_tensor = True)
+        _save_and_visualize_tensor(tensor, current_time, deck_size, scoring, 
+                                   f"Win Rate Over {num_decks} {deck_size}-Length Decks Scored by {scoring}, Sequence Length of {seq_len}", 
+                                   selected)
+        return
+
+    if(n_workers is not None):
+        logger.info(f"Date and time of this run: {current_time}")
+        with stage("score", profile = True, **_score_counts(num_decks, all_combos, deck_size)):
+            all_games_output = run_parallel_sim_and_score(deck_size = deck_size, 
+                                                          seq_len = seq_len, 
+                                                          num_decks = num_decks, 
+                                                          all_combos = all_combos, 
+                                                          scoring = scoring, 
+                                                          seed = seed, 
+                                                          n_workers = n_workers, 
+                                                          as_tensor = True)
+        _save_and_visualize_tensor(all_games_output, current_time, deck_size, scoring, 
+                                   f"Win Rate Over {num_decks} {deck_size}-Length Decks Scored by {scoring}, Sequence Length of {seq_len}", 
+                                   selected)
+        return
+
+    # replay stored decks, or lazily create a num_decks amount of randomly generated deck shuffles 
+    # of deck_size number of cards as a stream of chunks, so only one chunk of decks is in memory at a time
+    if(deck_file is not None):
+        deck_store = open_deck_store(deck_file)
+        if(deck_store.deck_size != deck_size):
+            raise Exception("Invalid Deck Size")
+        num_decks = min(num_decks, len(deck_store))
+        master_seq_list = deck_store.iter_chunks(stop = num_decks)
+    else:
+        master_seq_list = iter_deck_chunks(n_decks = num_decks, half_num_cards = int(deck_size/2), 
+                                           seed = seed, 
+                                           store_path = os.path.join("data/heatmaps", current_time, "decks.bin") 
+                                                        if save_decks else None)
+
+    master_seq_list = timed_iter("generate", master_seq_list, deck_size)
+    logger.info(f"Date and time of this run: {current_time}")
+
+    if stream:
+        with stage("score", profile = True, **_score_counts(num_decks, all_combos, deck_size)):
+            results = run_streaming_sim_and_score(deck_size = deck_size, 
+                                                  seq_len = seq_len, 
+                                                  num_decks = num_decks, 
+                                                  all_combos = all_combos, 
+                                                  scoring = scoring, 
+                                                  deck_chunks = master_seq_list, 
+                                                  histograms = scoring == "BOTH", 
+                                                  as_tensor = True)
+        if(scoring == "BOTH"):
+            visualize_bundle(results, current_time, selected)
+            return
+        _save_and_visualize_tensor(results, current_time, deck_size, scoring, 
+                                   f"Win Rate Over {num_decks} {deck_size}-Length Decks Scored by {scoring}, Sequence Length of {seq_len}", 
+                                   selected)
+        return
+
+    if(scoring == "BOTH"):
+        with stage("score", profile = True, **_score_counts(num_decks, all_combos, deck_size)):
+            bundle = run_bundle_sim_and_score(master_seq_list = master_seq_list, 
+                                              deck_size = deck_size, 
+                                              seq_len = seq_len, 
+                                              num_decks = num_decks, 
+                                              all_combos = all_combos)
+        visualize_bundle(bundle, current_time, selected)
+        return
 
     # run the simulation with all decks and all possible shuffles and score it 
-    all_games_output = run_full_sim_and_score(master_seq_list = master_seq_list, 
-                                            deck_size = deck_size, 
-                                            seq_len = seq_len,  
-                                            num_decks=num_decks, 
-                                            all_combos=all_combos, 
-                                            scoring=scoring)
+    with stage("score", profile = True, **_score_counts(num_decks, all_combos, deck_size)):
+        all_games_output = run_full_sim_and_score(master_seq_list = master_seq_list, 
+                                                deck_size = deck_size, 
+                                                seq_len = seq_len,  
+                                                num_decks=num_decks, 
+                                                all_combos=all_combos, 
+                                                scoring=scoring,
+                                                engine=engine,
+                                                as_tensor=True)
+    _save_and_visualize_tensor(all_games_output, current_time, deck_size, scoring, 
+                               f"Win Rate Over {num_decks} {deck_size}-Length Decks Scored by {scoring}, Sequence Length of {seq_len}", 
+                               selected)
 
-    all_games_output_one, all_games_output_two = split_simulation_output(all_games_output)
-    print("\nVisualizing...")
+def sweep_and_visualize(current_time: str,
+                        seq_lens: list = (3,), 
+                        deck_sizes: list = (52,), 
+                        num_decks_list: list = (1000,), 
+                        scorings: list = ("TRICKS",),
+                        seed: int = 0,
+                        use_symmetry: bool = True) -> None:
+    '''
+    Run every configuration in the grid of sequence lengths, deck sizes, numbers of decks and 
+    scoring methods, generating the decks of each deck size once for all its configurations 
+    (see run_sweep_sim_and_score), and save each configuration's result tensor (results.npz, 
+    see results.save_result_tensor) and heatmaps in its own directory under 
+    data/heatmaps/<current_time>, the heatmaps of all configurations being rendered in parallel
+
+    Arguments:
+        current_time (str): date and time of this run to create distinct filenames for heatmaps
+        seq_lens (list): the sequence lengths to sweep over
+        deck_sizes (list): the deck sizes to sweep over
+        num_decks_list (list): the numbers of decks to sweep over
+        scorings (list): the scoring methods to sweep over (see scoring methods)
+        seed (int): master seed of the decks (see generate.iter_deck_chunks)
+        use_symmetry (bool): whether to only score one combination of each class of equivalent 
+                             combinations (see generate.reduce_game_combos)
+    '''
+    logger.info(f"Date and time of this run: {current_time}")
+    combos_by_seq_len = {}
+    for seq_len in seq_lens:
+        all_combos = get_combo_codes(seq_len = seq_len)
+        combos_by_seq_len[seq_len] = all_combos.reduce() if use_symmetry else all_combos
+
+    # the plan: one pass over the decks per deck size, scoring every other configuration
+    logger.info(f"Sweep of {len(deck_sizes) * len(num_decks_list) * len(seq_lens) * len(scorings)} "
+                f"configurations in {len(deck_sizes)} deck passes (deck sizes {list(deck_sizes)}, up to "
+                f"{max(num_decks_list)} decks each)")
+
+    heatmaps = []
+    for deck_size in deck_sizes:
+        # only the number of combinations counts here
+        sweep_combos = range(sum(len(all_combos) for all_combos in combos_by_seq_len.values()))
+        with stage("score", profile = True, deck_size = deck_size, 
+                   **_score_counts(max(num_decks_list), sweep_combos, deck_size)):
+            tensors = run_sweep_sim_and_score(deck_size = deck_size, 
+                                              num_decks_list = num_decks_list, 
+                                              combos_by_seq_len = combos_by_seq_len, 
+                                              scorings = scorings, 
+                                              seed = seed)
+
+        for (num_decks, seq_len, scoring), tensor in tensors.items():
+            tensor = expand_result_tensor(tensor)
+            config_dir = os.path.join(current_time, f"deck{deck_size}_seq{seq_len}_n{num_decks}_{scoring}")
+            save_result_tensor(os.path.join("data/heatmaps", config_dir, "results.npz"), 
+                               tensor, deck_size, scoring)
+            heatmaps += _both_players_heatmaps(tensor, config_dir, 
+                                               f"Win Rate Over {num_decks} {deck_size}-Length Decks Scored by {scoring}, Sequence Length of {seq_len}")
+
+    # render every configuration's heatmaps together, in parallel
+    logger.info("\nVisualizing...")
+    with stage("visualize", figures = len(heatmaps)):
+        render_heatmaps(heatmaps)
+
+def visualize_bundle(bundle: dict, current_time: str, all_combos: list = None) -> None:
+    '''
+    Save a results bundle (see results.new_results_bundle) and visualize both players' win 
+    rates and the tie rates under both scoring methods
+
+    Arguments:
+        bundle (dict): the results bundle, e.g. from run_bundle_sim_and_score or results.load_bundle
+        current_time (str): date and time of this run to create distinct filenames for heatmaps
+        all_combos (list): the combinations to fill in by symmetry and visualize (see 
+                           results.expand_symmetric_output), by default every one equivalent to 
+                           a combination in the bundle
+    '''
+    save_bundle(os.path.join("data/heatmaps", current_time, "results.npz"), bundle)
+
+    heatmaps = []
+    for scoring in SCORING_METHODS:
+        title = f"Over {bundle['num_decks']} {bundle['deck_size']}-Length Decks Scored by {scoring}, Sequence Length of {bundle['seq_len']}"
+        all_games_output = expand_symmetric_output(bundle_to_output(bundle, scoring), all_combos)
+        heatmaps += _both_players_heatmaps(all_games_output, current_time, f"Win Rate {title}")
+        heatmaps.append({"all_games_output": pivot_output(all_games_output, "tie freq"), 
+                         "current_time": current_time, 
+                         "title": f"Tie Rate {title}"})
+
+    logger.info("\nVisualizing...")
+    with stage("visualize", figures = len(heatmaps)):
+        render_heatmaps(heatmaps)
+
+def visualize_merged_results(current_time: str, result_paths: list) -> None:
+    '''
+    Merge the partial results of checkpointed runs over disjoint decks (see 
+    checkpoint.merge_checkpoints) and visualize them like a single run
+
+    Arguments:
+        current_time (str): date and time of this run to create distinct filenames for heatmaps
+        result_paths (list): file paths of the partial results
+    '''
+    merged = merge_checkpoints(result_paths)
+    logger.info(f"Merged {merged['num_decks']} shuffles from {len(result_paths)} result files")
+    _visualize_both_players(expand_symmetric_output(checkpoint_to_output(merged)), current_time, 
+                            f"Win Rate Over {merged['num_decks']} {merged['deck_size']}-Length Decks Scored by {merged['scoring']}, Sequence Length of {merged['seq_len']}")
+
+def render_saved_results(current_time: str, result_path: str) -> None:
+    '''
+    Visualize the saved results of an earlier run without simulating again: a result tensor 
+    (results.npz of a run or sweep configuration, see results.save_result_tensor), a results 
+    bundle (results.npz of a "BOTH" run, see results.save_bundle) or a checkpoint 
+    (see checkpoint.save_checkpoint)
+
+    Arguments:
+        current_time (str): date and time of this run to create distinct filenames for heatmaps
+        result_path (str): file path of the saved results
+    '''
+    with np.load(result_path) as data:
+        keys = set(data.files)
+    logger.info(f"Rendering the results saved in {result_path}")
+
+    if("counts" in keys or "tensor" in keys):
+        results = load_result_tensor(result_path)
+        _visualize_both_players(results["tensor"], current_time, 
+                                f"Win Rate Over {results['num_decks']} {results['deck_size']}-Length Decks Scored by {results['scoring']}, Sequence Length of {results['seq_len']}")
+    elif "tricks_outcomes" in keys:
+        visualize_bundle(load_bundle(result_path), current_time)
+    elif "columns" in keys:
+        results = load_output(result_path)
+        _save_and_visualize_output(results["all_games_output"], current_time, results["title"], 
+                                   results["heatmaps"], save = False)
+    elif "winner_ones" in keys:
+        checkpoint = load_checkpoint(result_path)
+        _visualize_both_players(expand_symmetric_output(checkpoint_to_output(checkpoint)), current_time, 
+                                f"Win Rate Over {checkpoint['num_decks']} {checkpoint['deck_size']}-Length Decks Scored by {checkpoint['scoring']}, Sequence Length of {checkpoint['seq_len']}")
+    else:
+        raise Exception("Invalid Results File")
+
+def _save_and_visualize_output(all_games_output: pd.DataFrame, 
+                               current_time: str, 
+                               title: str, 
+                               heatmaps: list = (), 
+                               all_combos: list = None,
+                               save: bool = True) -> None:
+    '''
+    Save the raw output of a run without a result tensor as its results.npz (see 
+    results.save_output) and visualize both players' win rates and its further heatmaps, 
+    all rendered in parallel
+
+    Arguments:
+        all_games_output (pd.DataFrame): the raw data from the run
+        current_time (str): date and time of this run to create distinct filenames for heatmaps
+        title (str): the heatmap title shared by both players, prefixed with "P1 " and "P2 "
+        heatmaps (list): (column, title) of each further heatmap, e.g. ("p1 se", ...)
+        all_combos (list): the combinations to fill in by symmetry before saving (see 
+                           results.expand_symmetric_output)
+        save (bool): whether to save the results (not when rendering saved ones, which are 
+                     already filled in)
+    '''
+    if save:
+        all_games_output = expand_symmetric_output(all_games_output, all_combos)
+        save_output(os.path.join("data/heatmaps", current_time, "results.npz"), 
+                    all_games_output, title, heatmaps)
+
+    # render the further heatmaps together with both players' in one pool
+    figures = _both_players_heatmaps(all_games_output, current_time, title)
+    figures += [{"all_games_output": pivot_output(all_games_output, column), 
+                 "current_time": current_time, 
+                 "title": heatmap_title} for column, heatmap_title in heatmaps]
+
+    logger.info("\nVisualizing...")
+    with stage("visualize", figures = len(figures)):
+        render_heatmaps(figures)
+    logger.info("Done!")
+    return
+
+def _save_and_visualize_tensor(tensor: dict, 
+                               current_time: str, 
+                               deck_size: int, 
+                               scoring: str, 
+                               title: str, 
+                               all_combos: list = None) -> None:
+    '''
+    Fill in a run's result tensor by symmetry over the selected combinations (see 
+    results.expand_result_tensor), save it as its results.npz (see results.save_result_tensor) 
+    and visualize both players' win rates
+
+    Arguments:
+        tensor (dict): the run's result tensor (see results.new_result_tensor)
+        current_time (str): date and time of this run to create distinct filenames for heatmaps
+        deck_size (int): the number of cards in each deck
+        scoring (str): the method the players were scored by (see scoring methods)
+        title (str): the heatmap title shared by both players, prefixed with "P1 " and "P2 "
+        all_combos (list): the combinations selected (see generate.get_combo_codes), by 
+                           default every combination
+    '''
+    tensor = expand_result_tensor(tensor, all_combos)
+    save_result_tensor(os.path.join("data/heatmaps", current_time, "results.npz"), 
+                       tensor, deck_size, scoring)
+    _visualize_both_players(tensor, current_time, title)
+    return
+
+def _visualize_both_players(all_games_output: pd.DataFrame, 
+                            current_time: str, 
+                            title: str) -> None:
+    '''
+    Pivot the raw output of a run and save both players' heatmaps, rendered in parallel
+
+    Arguments:
+        all_games_output (pd.DataFrame): the raw data from a full simulation, or its result tensor 
+                                         (see split_simulation_output)
+        current_time (str): date and time of this run to create distinct filenames for heatmaps
+        title (str): the heatmap title shared by both players, prefixed with "P1 " and "P2 "
+    '''
+    heatmaps = _both_players_heatmaps(all_games_output, current_time, title)
+    logger.info("\nVisualizing...")
 
     # visualize the two heatmaps, once from Player 1's perspective and again from Player 2's perspective
-    visualize_all_games_output(all_games_output = all_games_output_one, 
-                            current_time = current_time,
-                            title = f"P1 Win Rate Over {num_decks} {deck_size}-Length Decks Scored by {scoring}, Sequence Length of {seq_len}")
-    visualize_all_games_output(all_games_output = all_games_output_two,
-                            current_time = current_time,
-                            title = f"P2 Win Rate Over {num_decks} {deck_size}-Length Decks Scored by {scoring}, Sequence Length of {seq_len}")
-    print("Done!")
+    with stage("visualize", figures = len(heatmaps)):
+        render_heatmaps(heatmaps)
+    logger.info("Done!")
+
+def _both_players_heatmaps(all_games_output: pd.DataFrame, 
+                           current_time: str, 
+                           title: str) -> list:
+    '''
+    Pivot the raw output of a run into both players' heatmaps, ready to render 
+    (see visualize.render_heatmaps)
+
+    Arguments:
+        all_games_output (pd.DataFrame): the raw data from a full simulation, or its result tensor 
+                                         (see split_simulation_output)
+        current_time (str): date and time of this run to create distinct filenames for heatmaps
+        title (str): the heatmap title shared by both players, prefixed with "P1 " and "P2 "
+
+    Output:
+        heatmaps (list): the keyword arguments of visualize.visualize_all_games_output 
+                         for each player's heatmap
+    '''
+    with stage("split"):
+        all_games_output_one, all_games_output_two = split_simulation_output(all_games_output)
+
+    return [{"all_games_output": all_games_output_one, "current_time": current_time, "title": f"P1 {title}"}, 
+            {"all_games_output": all_games_output_two, "current_time": current_time, "title": f"P2 {title}"}]
+
+def _ci_half_width(all_games_output: pd.DataFrame) -> pd.Series:
+    '''
+    The larger confidence interval half-width of the two players' win frequencies of each 
+    combination of an adaptive run (see run_adaptive_sim_and_score)
+    '''
+    return pd.concat([all_games_output["p1 ci high"] - all_games_output["p1 ci low"], 
+                      all_games_output["p2 ci high"] - all_games_output["p2 ci low"]], 
+                     axis=1).max(axis=1) / 2
+
+def _score_counts(num_decks, all_combos: list, deck_size: int) -> dict:
+    '''
+    Item counts of a scoring stage (see metrics.stage)
+
+    Arguments:
+        num_decks: the number of decks played (or an array of each combination's number of decks)
+        all_combos (list): the sequence combinations played
+        deck_size (int): the number of cards in each deck
+
+    Output:
+        counts (dict): the "decks" dealt, "games" played and "cards" processed
+    '''
+    decks_played = np.broadcast_to(num_decks, len(all_combos))
+    games = int(decks_played.sum())
+    return {"decks": int(decks_played.max(initial=0)), "games": games, "cards": games * deck_size}
+
+def _check_options(engine: str, 
+                   scoring: str, 
+                   n_workers: int, 
+                   save_decks: bool, 
+                   deck_file: str, 
+                   target_half_width: float, 
+                   checkpoint_path: str, 
+                   antithetic: str, 
+                   stream: bool) -> None:
+    '''
+    Rejects combinations of simulate_and_visualize's options that no single run supports, 
+    before anything is generated, so no option is silently dropped for another run
+
+    Arguments:
+        see simulate_and_visualize
+    '''
+    if(engine not in ("vectorized", "automaton", "exact")):
+        raise Exception("Invalid Engine")
+    if(scoring not in SCORING_METHODS and scoring != "BOTH"):
+        raise Exception("Invalid Scoring Method")
+
+    # the exact solver samples no decks, and the automaton engine only plays 
+    # single-process runs of one scoring method over every deck given
+    sampling = target_half_width is not None or antithetic is not None or checkpoint_path is not None
+    if(engine == "exact" and (n_workers is not None or sampling)):
+        raise Exception("Invalid Engine")
+    if(engine == "automaton" and (n_workers is not None or scoring == "BOTH" or sampling)):
+        raise Exception("Invalid Engine")
+    if(stream and engine != "vectorized"):
+        raise Exception("Invalid Engine")
+
+    # a stream is one single-process pass over the decks, in order
+    if(stream and (n_workers is not None or sampling)):
+        raise Exception("Incompatible Options")
+
+    # only single-process runs over one stream of decks score them both ways at once
+    if(scoring == "BOTH" and (engine == "exact" or n_workers is not None or sampling)):
+        raise Exception("Invalid Scoring Method")
+
+    # only freshly generated decks of full or cached runs are sharded over worker processes
+    if(n_workers is not None and (deck_file is not None or save_decks or sampling)):
+        raise Exception("Incompatible Options")
 
+    # only runs over one stream of decks replay or store them
+    if((deck_file is not None or save_decks) and (engine == "exact" or sampling)):
+        raise Exception("Incompatible Options")
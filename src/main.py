@@ -1,34 +1,108 @@
+import argparse
 import datetime as dt
-import sys
 import os
 
-from helpers import simulate_and_visualize
+from helpers import (simulate_and_visualize, visualize_merged_results, sweep_and_visualize, 
+                     render_saved_results)
+from eventlog import configure_logging, close_logging
+from metrics import start_run_metrics, write_metrics_report
 
 # start here! modify these parameters to change aspects of the simulation
 seq_len = 3
 deck_size = 52
 num_decks = 10000
-scoring = "TRICKS"
+scoring = "TRICKS" # "TRICKS", "CARDS", or "BOTH" (score the same games both ways in one pass)
+engine = "vectorized" # "vectorized", "automaton", or "exact" (no deck sampling)
+n_workers = None # set to a number of processes to shard the decks over (seeded by seed)
+seed = 0
+use_symmetry = True # score one combo per class of color/player-swapped equivalents, filling in the rest by symmetry
+deck_file = None # set to a binary deck store (see deckstore.py) to replay its decks
+save_decks = False # also keep the decks played as a binary deck store next to the heatmaps (decks.bin), replayable as deck_file
+target_half_width = None # set to stop sampling each combo once its 95% CI is this narrow (num_decks becomes the cap)
+verbosity = "summary" # "summary", "sample" (also trace every trace_every-th deck), or "debug" (also trace every game)
+trace_every = 1000
+checkpoint_path = None # set to periodically checkpoint the run's results to this file (or pass --checkpoint)
+cache_dir = "data/cache" # reuse results of earlier runs with the same parameters and seed (None to always re-simulate)
+antithetic = None # "complement", "reverse", or "both" to play each deck with its color complement and/or reversal
+p1_seqs = None # set to e.g. ["BRR", "RBB"] to only play these player one sequences
+best_response_only = False # only play player two's Conway-style best response candidates to each player one sequence
+stream = False # generate, score and count the decks in overlapping pipeline stages with constant memory (vectorized engine)
+profile = False # also profile the scoring loop with cProfile in the run's metrics report (or pass --profile)
 
-# to record all print statements in the log, create the directory if it doesn't exist
-log_dir = "data/logs"
-os.makedirs(log_dir, exist_ok=True)  
+# worker processes re-import this module, so only run the simulation from the main process
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run the Penney's Game simulation")
+    parser.add_argument("--checkpoint", default=checkpoint_path, 
+                        help="periodically checkpoint the run's results to this file")
+    parser.add_argument("--resume", action="store_true", 
+                        help="continue the run from the checkpoint given by --checkpoint")
+    parser.add_argument("--first-chunk", type=int, default=0, 
+                        help="index of the first chunk of decks to play, to split one seed's decks across hosts")
+    parser.add_argument("--merge", nargs="+", metavar="RESULTS", 
+                        help="merge these checkpointed results of disjoint runs and visualize them instead of simulating")
+    parser.add_argument("--render", metavar="RESULTS", 
+                        help="visualize these saved results (e.g. a run's results.npz) instead of simulating")
+    parser.add_argument("--no-cache", action="store_true", 
+                        help="simulate from scratch instead of reusing cached results")
+    parser.add_argument("--profile", action="store_true", default=profile, 
+                        help="profile the scoring loop with cProfile in the run's metrics report")
+    parser.add_argument("--sweep", action="store_true", 
+                        help="run every configuration in the grid given by the options below, "
+                             "generating each deck size's decks once for all of them")
+    parser.add_argument("--seq-lens", nargs="+", type=int, 
+                        help="sequence lengths to sweep over (default: seq_len)")
+    parser.add_argument("--deck-sizes", nargs="+", type=int, 
+                        help="deck sizes to sweep over (default: deck_size)")
+    parser.add_argument("--num-decks", nargs="+", type=int, 
+                        help="numbers of decks to sweep over (default: num_decks)")
+    parser.add_argument("--scorings", nargs="+", choices=["TRICKS", "CARDS"], 
+                        help="scoring methods to sweep over (default: scoring, both for \"BOTH\")")
+    args = parser.parse_args()
 
-# get current time to identify this run
-current_time = dt.datetime.now().strftime("%Y-%m-%d_%H-%M-%S")
+    # the grid options only shape a sweep, a single run takes the parameters above
+    grid_options = {"--seq-lens": args.seq_lens, "--deck-sizes": args.deck_sizes, 
+                    "--num-decks": args.num_decks, "--scorings": args.scorings}
+    given = [option for option, values in grid_options.items() if values is not None]
+    if(given and not args.sweep):
+        parser.error(f"{', '.join(given)} only apply with --sweep")
 
-# create a log file to identify this game and open the recording of print statements
-log_file_path = os.path.join(log_dir, f"penneys_game_{current_time}.log")
-old_stdout = sys.stdout
+    # to record the run in the log, create the directory if it doesn't exist
+    log_dir = "data/logs"
+    os.makedirs(log_dir, exist_ok=True)  
 
-log_file = open(log_file_path,"w")
-sys.stdout = log_file
+    # get current time to identify this run
+    current_time = dt.datetime.now().strftime("%Y-%m-%d_%H-%M-%S")
 
-#run the simulation w/a helper function and generate heatmaps
-simulate_and_visualize(current_time, seq_len = seq_len, deck_size = deck_size, 
-                       num_decks = num_decks, scoring = scoring)
+    # create a log file to identify this game and start logging at the chosen verbosity
+    # (debug traces also go to a .jsonl event log next to it)
+    log_file_path = os.path.join(log_dir, f"penneys_game_{current_time}.log")
+    configure_logging(log_file_path, verbosity = verbosity, trace_every = trace_every)
+    start_run_metrics(profile = args.profile)
 
-sys.stdout = old_stdout
-log_file.close()
+    #run the simulation w/a helper function and generate heatmaps
+    if args.merge:
+        visualize_merged_results(current_time, args.merge)
+    elif args.render:
+        render_saved_results(current_time, args.render)
+    elif args.sweep:
+        sweep_and_visualize(current_time, seq_lens = args.seq_lens or [seq_len], 
+                            deck_sizes = args.deck_sizes or [deck_size], 
+                            num_decks_list = args.num_decks or [num_decks], 
+                            scorings = args.scorings or (["TRICKS", "CARDS"] if scoring == "BOTH" else [scoring]), 
+                            seed = seed, use_symmetry = use_symmetry)
+    else:
+        simulate_and_visualize(current_time, seq_len = seq_len, deck_size = deck_size, 
+                               num_decks = num_decks, scoring = scoring, engine = engine, 
+                               n_workers = n_workers, seed = seed, save_decks = save_decks, deck_file = deck_file, 
+                               target_half_width = target_half_width, 
+                               checkpoint_path = args.checkpoint, resume = args.resume, 
+                               first_chunk = args.first_chunk, use_symmetry = use_symmetry, 
+                               cache_dir = None if args.no_cache else cache_dir, 
+                               antithetic = antithetic, p1_seqs = p1_seqs, 
+                               best_response_only = best_response_only, stream = stream)
 
-print("-----------------------Done-----------------------")
\ No newline at end of file
+    # per-stage times, memory and item counts go next to the heatmaps (metrics.json)
+    write_metrics_report(current_time)
+    close_logging()
+
+    print("-----------------------Done-----------------------")
\ No newline at end of file
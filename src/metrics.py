@@ -0,0 +1,228 @@
+import contextlib
+import cProfile
+import json
+import os
+import pstats
+import threading
+import time
+from typing import Iterator
+
+try:
+    import resource
+except ImportError: # not available on Windows, peak RSS is then left out
+    resource = None
+
+from eventlog import logger
+
+# number of hottest functions (by cumulative time) kept from each profiled stage
+PROFILE_TOP = 30
+# seconds between samples of the process's RSS while a stage runs
+RSS_SAMPLE_INTERVAL = 0.01
+
+_stages = None
+_profile = False
+
+def start_run_metrics(profile: bool = False) -> None:
+    '''
+    Start recording the metrics of a run's stages (see stage), replacing any earlier run's
+
+    Arguments:
+        profile (bool): whether to also profile the stages that opt in to it (the scoring loop)
+                        with cProfile, which slows them down
+    '''
+    global _stages, _profile
+    _stages = []
+    _profile = profile
+    return
+
+@contextlib.contextmanager
+def stage(name: str, profile: bool = False, **counts) -> Iterator[dict]:
+    '''
+    Record one stage of a run: its wall time, CPU time (including worker processes that
+    finished within it), the peak RSS of this process while it ran (sampled, see 
+    _sample_peak_rss) and its item counts. Does nothing unless recording (see start_run_metrics).
+
+    Arguments:
+        name (str): the stage's name, e.g. "score" or "visualize"
+        profile (bool): whether this stage is profiled when the run profiles (see start_run_metrics)
+        counts: the items the stage processes, e.g. decks=..., games=..., cards=...
+
+    Output:
+        record (dict): yields the stage's record, whose item counts may be added to
+                       while the stage runs
+    '''
+    record = {"stage": name, **counts}
+    if _stages is None:
+        yield record
+        return
+
+    profiler = cProfile.Profile() if (profile and _profile) else None
+    wall_start = time.perf_counter()
+    cpu_start = _cpu_time()
+    if profiler is not None:
+        profiler.enable()
+    try:
+        with _sample_peak_rss(record):
+            yield record
+    finally:
+        if profiler is not None:
+            profiler.disable()
+        record["wall_s"] = time.perf_counter() - wall_start
+        record["cpu_s"] = _cpu_time() - cpu_start
+        if profiler is not None:
+            record["profile"] = _top_functions(profiler)
+        _stages.append(record)
+        logger.info(f"Stage {name} took {record['wall_s']:.3f}s wall, {record['cpu_s']:.3f}s CPU")
+    return
+
+def timed_iter(name: str, deck_chunks, deck_size: int) -> Iterator:
+    '''
+    Pass through a stream of deck chunks (see generate.iter_deck_chunks), recording the time
+    spent producing them as its own stage, so lazily generated decks are timed apart from the
+    stage consuming them (whose times and peak RSS still include it)
+
+    Arguments:
+        name (str): the stage's name, e.g. "generate"
+        deck_chunks: the stream of 2D deck chunks
+        deck_size (int): the number of cards in each deck
+
+    Output:
+        decks (np.ndarray): yields the stream's chunks
+    '''
+    if _stages is None:
+        yield from deck_chunks
+        return
+
+    record = {"stage": name, "decks": 0, "cards": 0, "wall_s": 0.0, "cpu_s": 0.0}
+    _stages.append(record)
+    deck_chunks = iter(deck_chunks)
+    while True:
+        wall_start = time.perf_counter()
+        cpu_start = _cpu_time()
+        decks = next(deck_chunks, None)
+        record["wall_s"] += time.perf_counter() - wall_start
+        record["cpu_s"] += _cpu_time() - cpu_start
+        if decks is None:
+            return
+        record["decks"] += len(decks)
+        record["cards"] += len(decks) * deck_size
+        yield decks
+
+def add_stage_time(name: str, wall_s: float, cpu_s: float, **counts) -> None:
+    '''
+    Add time spent on a stage outside of this process's stages, e.g. generating decks in worker 
+    processes, to the run's record of that stage (the times then being summed over the workers). 
+    Does nothing unless recording (see start_run_metrics).
+
+    Arguments:
+        name (str): the stage's name, e.g. "generate"
+        wall_s (float): wall time spent, in seconds
+        cpu_s (float): CPU time spent, in seconds
+        counts: the items processed meanwhile, e.g. decks=..., cards=...
+    '''
+    if _stages is None:
+        return
+
+    record = next((record for record in _stages if record["stage"] == name and record.get("in_workers")), None)
+    if record is None:
+        record = {"stage": name, "in_workers": True, "wall_s": 0.0, "cpu_s": 0.0}
+        _stages.append(record)
+    record["wall_s"] += wall_s
+    record["cpu_s"] += cpu_s
+    for key, count in counts.items():
+        record[key] = record.get(key, 0) + count
+    return
+
+def write_metrics_report(current_time: str) -> str:
+    '''
+    Write the run's stage metrics as a JSON report next to its heatmaps, with the peak RSS of 
+    the whole run, and stop recording
+
+    Arguments:
+        current_time (str): date and time of this run, naming its heatmap directory
+
+    Output:
+        path (str): file path of the report (data/heatmaps/<current_time>/metrics.json),
+                    None if nothing was recorded
+    '''
+    global _stages
+    if _stages is None:
+        return None
+
+    path = os.path.join("data/heatmaps", current_time, "metrics.json")
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "w") as f:
+        json.dump({"run": current_time, "profiled": _profile, "peak_rss_mb": _peak_rss_mb(), 
+                   "stages": _stages}, f, indent=2)
+    _stages = None
+    logger.info(f"Metrics report saved to {path}")
+    return path
+
+def _cpu_time() -> float:
+    '''
+    CPU time of this process and its finished child processes, in seconds
+    '''
+    times = os.times()
+    return times.user + times.system + times.children_user + times.children_system
+
+@contextlib.contextmanager
+def _sample_peak_rss(record: dict) -> Iterator[None]:
+    '''
+    Sample this process's RSS from a background thread while the block runs, setting the
+    record's "peak_rss_mb" to the largest sample (None where the RSS can't be read), since
+    the process's own peak (see _peak_rss_mb) covers every earlier stage too
+    '''
+    samples = [_current_rss_mb()]
+    if samples[0] is None:
+        record["peak_rss_mb"] = None
+        yield
+        return
+
+    done = threading.Event()
+    def sample() -> None:
+        while not done.wait(RSS_SAMPLE_INTERVAL):
+            samples.append(_current_rss_mb())
+        return
+
+    sampler = threading.Thread(target = sample, daemon = True)
+    sampler.start()
+    try:
+        yield
+    finally:
+        done.set()
+        sampler.join()
+        samples.append(_current_rss_mb())
+        record["peak_rss_mb"] = max(samples)
+    return
+
+def _current_rss_mb() -> float:
+    '''
+    Current resident set size of this process, in MB, or None where it isn't available (only
+    read from /proc on Linux)
+    '''
+    try:
+        with open("/proc/self/statm") as f:
+            resident_pages = int(f.read().split()[1])
+    except (OSError, IndexError, ValueError):
+        return None
+    return resident_pages * os.sysconf("SC_PAGE_SIZE") / 2**20
+
+def _peak_rss_mb() -> float:
+    '''
+    Peak resident set size of this process so far, in MB, or None where it isn't available
+    '''
+    if resource is None:
+        return None
+    # ru_maxrss is in kilobytes on Linux, bytes on macOS
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / 2**20 if os.uname().sysname == "Darwin" else peak / 2**10
+
+def _top_functions(profiler: cProfile.Profile) -> list:
+    '''
+    The hottest functions of a profiled stage by cumulative time
+    '''
+    stats = pstats.Stats(profiler)
+    top = sorted(stats.stats.items(), key=lambda item: item[1][3], reverse=True)[:PROFILE_TOP]
+    return [{"function": f"{filename}:{line}({function})", "calls": calls,
+             "total_s": total_time, "cumulative_s": cumulative_time}
+            for (filename, line, function), (_, calls, total_time, cumulative_time, _) in top]
@@ -0,0 +1,479 @@
+import numpy as np
+import pandas as pd
+import os
+
+from engine import encode_combos
+
+# a results bundle holds, for both scoring methods, each combination's outcome counts
+# (OUTCOMES columns) and the distribution of the P1 minus P2 trick or card differential
+SCORING_METHODS = ("TRICKS", "CARDS")
+OUTCOMES = ("p1 wins", "p2 wins", "ties")
+
+def new_results_bundle(all_combos: list,
+                       deck_size: int,
+                       seq_len: int
+                       ) -> dict:
+    '''
+    Create the empty results bundle of a simulation scored by both tricks and cards
+
+    Arguments:
+        all_combos (list): all possible ways for players to match sequences
+                           while playing the game (pregenerated)
+        deck_size (int): the number of cards in each deck
+        seq_len (int): the number of elements in each player's chosen sequence
+
+    Output:
+        bundle (dict): the bundle; "p1_combos" and "p2_combos" labels, the "num_decks" played,
+                       and for each scoring method ("tricks_" or "cards_" prefix) the
+                       per-combination "outcomes" counts (see OUTCOMES) and "margins", the
+                       number of games with each P1 minus P2 differential, offset by the
+                       largest possible differential
+    '''
+    max_margins = {"TRICKS": deck_size // seq_len, "CARDS": deck_size}
+    bundle = {"p1_combos": np.array([''.join(str(e) for e in combo[0]) for combo in all_combos]),
+              "p2_combos": np.array([''.join(str(e) for e in combo[1]) for combo in all_combos]),
+              "num_decks": 0, "deck_size": deck_size, "seq_len": seq_len}
+    for scoring in SCORING_METHODS:
+        prefix = scoring.lower()
+        bundle[f"{prefix}_outcomes"] = np.zeros((len(all_combos), len(OUTCOMES)), dtype=np.int64)
+        bundle[f"{prefix}_margins"] = np.zeros((len(all_combos), 2 * max_margins[scoring] + 1),
+                                               dtype=np.int64)
+    return bundle
+
+def add_to_bundle(bundle: dict, tricks: np.ndarray, cards: np.ndarray) -> None:
+    '''
+    Add a batch of games scored by the vectorized engine to a results bundle
+
+    Arguments:
+        bundle (dict): the results bundle (see new_results_bundle)
+        tricks (np.ndarray): the batch's tricks (see engine.score_deck_batch)
+        cards (np.ndarray): the batch's cards (see engine.score_deck_batch)
+    '''
+    for prefix, counts in (("tricks", tricks), ("cards", cards)):
+        margins = bundle[f"{prefix}_margins"]
+        n_combos, n_margins = margins.shape
+        diff = counts[..., 0].astype(np.int64) - counts[..., 1]
+
+        bundle[f"{prefix}_outcomes"] += np.stack([(diff > 0).sum(axis=0), (diff < 0).sum(axis=0),
+                                                  (diff == 0).sum(axis=0)], axis=1)
+
+        # one bincount over every (combination, differential) cell of the batch
+        cells = np.arange(n_combos) * n_margins + diff + n_margins // 2
+        margins += np.bincount(cells.ravel(), minlength=n_combos * n_margins).reshape(margins.shape)
+
+    bundle["num_decks"] += len(tricks)
+    return
+
+def bundle_to_output(bundle: dict, scoring: str = "TRICKS") -> pd.DataFrame:
+    '''
+    Turn a results bundle into the raw output of a simulation under one scoring method,
+    which split_simulation_output consumes
+
+    Arguments:
+        bundle (dict): the results bundle (see new_results_bundle)
+        scoring (str): the desired method to score the players (see scoring methods)
+
+    Output:
+        all_games_output (pd.DataFrame): same as run_full_sim_and_score, plus each combination's
+                                         frequency of ties ("tie freq") and mean differential
+                                         from each player's side ("p1 mean margin",
+                                         "p2 mean margin")
+    '''
+    if(scoring not in SCORING_METHODS):
+        raise Exception("Invalid Scoring Method")
+
+    prefix = scoring.lower()
+    outcomes = bundle[f"{prefix}_outcomes"]
+    margins = bundle[f"{prefix}_margins"]
+    margin_values = np.arange(margins.shape[1]) - margins.shape[1] // 2
+    mean_margin = margins @ margin_values / bundle["num_decks"]
+
+    all_games_output = pd.DataFrame(columns = ["p1 combo", "p2 combo",
+                                               "p1 winner freq", "p2 winner freq", "tie freq",
+                                               "p1 mean margin", "p2 mean margin"])
+    all_games_output["p1 combo"]=bundle["p1_combos"].tolist()
+    all_games_output["p2 combo"]=bundle["p2_combos"].tolist()
+    all_games_output["p1 winner freq"]=outcomes[:, 0] / bundle["num_decks"]
+    all_games_output["p2 winner freq"]=outcomes[:, 1] / bundle["num_decks"]
+    all_games_output["tie freq"]=outcomes[:, 2] / bundle["num_decks"]
+    all_games_output["p1 mean margin"]=mean_margin
+    all_games_output["p2 mean margin"]=-mean_margin
+
+    return all_games_output
+
+def margin_distribution(bundle: dict,
+                        p1_combo: str,
+                        p2_combo: str,
+                        scoring: str = "TRICKS"
+                        ) -> pd.Series:
+    '''
+    Get the distribution of one combination's P1 minus P2 differential from a results bundle,
+    looking the combination up through its color- or player-swapped equivalent if the
+    bundle only holds one representative of its class (see generate.reduce_game_combos)
+
+    Arguments:
+        bundle (dict): the results bundle (see new_results_bundle)
+        p1_combo (str): player one's sequence as a string of 0s and 1s
+        p2_combo (str): player two's sequence as a string of 0s and 1s
+        scoring (str): the desired method to score the players (see scoring methods)
+
+    Output:
+        distribution (pd.Series): the frequency of each differential, indexed by differential
+    '''
+    if(scoring not in SCORING_METHODS):
+        raise Exception("Invalid Scoring Method")
+
+    margins = bundle[f"{scoring.lower()}_margins"]
+    swap_colors = str.maketrans("01", "10")
+    combos = list(zip(bundle["p1_combos"].tolist(), bundle["p2_combos"].tolist()))
+
+    # a player-swapped equivalent has its differentials mirrored
+    for x, y, mirrored in ((p1_combo, p2_combo, False), (p2_combo, p1_combo, True)):
+        for combo in ((x, y), (x.translate(swap_colors), y.translate(swap_colors))):
+            if combo in combos:
+                counts = margins[combos.index(combo)]
+                counts = counts[::-1] if mirrored else counts
+                margin_values = np.arange(len(counts)) - len(counts) // 2
+                return pd.Series(counts / bundle["num_decks"], index=margin_values)
+
+    raise Exception("Combination Not In Results")
+
+def save_bundle(path: str, bundle: dict) -> None:
+    '''
+    Write a results bundle to disk
+
+    Arguments:
+        path (str): file path of the bundle (.npz)
+        bundle (dict): the results bundle (see new_results_bundle)
+    '''
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    np.savez(path, **bundle)
+    return
+
+def load_bundle(path: str) -> dict:
+    '''
+    Read a results bundle from disk
+
+    Arguments:
+        path (str): file path of the bundle (.npz)
+
+    Output:
+        bundle (dict): the results bundle (see new_results_bundle)
+    '''
+    with np.load(path) as data:
+        bundle = {key: data[key] for key in data.files}
+    for key in ("num_decks", "deck_size", "seq_len"):
+        bundle[key] = int(bundle[key])
+    return bundle
+
+def save_output(path: str, all_games_output: pd.DataFrame, title: str, heatmaps: list = ()) -> None:
+    '''
+    Write the raw output of a run that has no result tensor (an exact, adaptive or antithetic 
+    run) to disk, with the titles needed to visualize it again
+
+    Arguments:
+        path (str): file path of the results (.npz)
+        all_games_output (pd.DataFrame): the raw data from the run, one row per combination
+        title (str): the title of both players' heatmaps, prefixed with "P1 " and "P2 "
+        heatmaps (list): (column, title) of each further heatmap of the run, e.g. its 
+                         confidence interval half-widths
+    '''
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    np.savez(path, columns=np.array(all_games_output.columns, dtype=str), title=title, 
+             heatmaps=np.array(heatmaps, dtype=str).reshape(-1, 2), 
+             **{f"column {name}": _plain_array(all_games_output[name]) for name in all_games_output.columns})
+    return
+
+def _plain_array(column: pd.Series) -> np.ndarray:
+    '''
+    A column as an array .npz files can hold without pickling: numbers as floats, labels as strings
+    '''
+    values = column.to_numpy()
+    if(values.dtype != object):
+        return values
+    if all(isinstance(value, str) for value in values):
+        return values.astype(str)
+    return values.astype(float)
+
+def load_output(path: str) -> dict:
+    '''
+    Read the raw output of a run written by save_output
+
+    Arguments:
+        path (str): file path of the results (.npz)
+
+    Output:
+        results (dict): the run's "all_games_output", "title" and further "heatmaps" (see save_output)
+    '''
+    with np.load(path) as data:
+        all_games_output = pd.DataFrame({name: data[f"column {name}"] for name in data["columns"]})
+        title = str(data["title"])
+        heatmaps = [tuple(heatmap) for heatmap in data["heatmaps"].tolist()]
+    return {"all_games_output": all_games_output, "title": title, "heatmaps": heatmaps}
+
+def expand_symmetric_output(all_games_output: pd.DataFrame, all_combos: list = None) -> pd.DataFrame:
+    '''
+    Fill in the sequence combinations left out of a simulation by symmetry (see
+    generate.reduce_game_combos): the color-swapped combination has the same results, and the
+    player-swapped combinations have the players' results swapped. Combinations already in
+    the output are kept as they are.
+
+    Arguments:
+        all_games_output (pd.DataFrame): the raw data from a simulation, possibly only over
+                                         one representative combination per equivalence class
+        all_combos (list): if given, only fill in these combinations (e.g. the ones selected 
+                           before reducing them, see generate.get_combo_codes), instead of 
+                           every combination equivalent to one in the output
+
+    Output:
+        all_games_output (pd.DataFrame): the raw data over all sequence combinations
+    '''
+    swap_colors = str.maketrans("01", "10")
+    color_swapped = all_games_output.assign(**{
+        "p1 combo": all_games_output["p1 combo"].str.translate(swap_colors),
+        "p2 combo": all_games_output["p2 combo"].str.translate(swap_colors)})
+
+    # swap every player one column ("p1 ...") with its player two counterpart ("p2 ...")
+    both = pd.concat([all_games_output, color_swapped], ignore_index=True)
+    player_swapped = both.rename(columns={column: column.replace("p1 ", "p2 ", 1) if column.startswith("p1 ")
+                                          else column.replace("p2 ", "p1 ", 1)
+                                          for column in both.columns})
+
+    expanded = pd.concat([both, player_swapped[both.columns]], ignore_index=True)
+    expanded = expanded.drop_duplicates(subset=["p1 combo", "p2 combo"])
+    if all_combos is not None:
+        p1_codes, p2_codes = encode_combos(all_combos)
+        seq_len = len(expanded["p1 combo"].iloc[0]) if len(expanded) else 0
+        keys = np.array([int(p1 + p2, 2) for p1, p2 in zip(expanded["p1 combo"], expanded["p2 combo"])], 
+                        dtype=np.int64)
+        expanded = expanded[np.isin(keys, (p1_codes << seq_len) | p2_codes)]
+    return expanded.reset_index(drop=True)
+
+def pivot_output(all_games_output: pd.DataFrame, column: str) -> pd.DataFrame:
+    '''
+    Pivot one column of the raw dataframe from a simulation into the shape of a heatmap,
+    player one's sequences as rows and player two's as columns, switching numerical labels
+    (0 and 1) into strings to represent black and red cards (B and R). Only the sequences 
+    played are rows and columns; combinations left out by symmetry are filled in beforehand 
+    (see expand_symmetric_output).
+
+    Arguments:
+        all_games_output (pd.DataFrame): the raw data from a full simulation
+        column (str): the column holding the heatmap's data
+
+    Output:
+        pivoted (pd.DataFrame): the pivoted column
+    '''
+    # switch 1s to red (R) and 0s to black (B)
+    to_colors = str.maketrans("01", "BR")
+    all_games_output = all_games_output.assign(**{
+        "p1 combo": all_games_output["p1 combo"].str.translate(to_colors),
+        "p2 combo": all_games_output["p2 combo"].str.translate(to_colors)})
+
+    pivoted = all_games_output.pivot(index = 'p1 combo',
+                                     columns = 'p2 combo',
+                                     values = column)
+    return pivoted
+
+def new_result_tensor(seq_len: int, all_combos: list) -> dict:
+    '''
+    Create the empty result tensor of a simulation, a sparse tensor counting each combination's 
+    outcomes (see OUTCOMES) at [p1 code, p2 code, outcome], sequences coded as in 
+    engine.encode_sequence. Only the combinations played are held, one row each, so it grows 
+    with them rather than with the (2^seq_len, 2^seq_len) grid of every combination.
+
+    Arguments:
+        seq_len (int): the number of elements in each player's chosen sequence
+        all_combos (list): the sequence combinations played (or generate.ComboCodes)
+
+    Output:
+        tensor (dict): "seq_len", each row's "p1_codes" and "p2_codes", in the order of 
+                       all_combos, and its "counts", a 2D int64 array of zeros of shape 
+                       (n_combos, 3)
+    '''
+    p1_codes, p2_codes = encode_combos(all_combos)
+    return {"seq_len": seq_len, "p1_codes": np.asarray(p1_codes, dtype=np.int64), 
+            "p2_codes": np.asarray(p2_codes, dtype=np.int64), 
+            "counts": np.zeros((len(p1_codes), len(OUTCOMES)), dtype=np.int64)}
+
+def add_outcomes(tensor: dict,
+                 winner_ones: np.ndarray,
+                 winner_twos: np.ndarray,
+                 num_decks,
+                 combos = slice(None)
+                 ) -> None:
+    '''
+    Add a batch of decks' outcomes to a result tensor, in bulk for all combinations
+
+    Arguments:
+        tensor (dict): the result tensor (see new_result_tensor)
+        winner_ones (np.ndarray): player one's number of wins for each combination
+        winner_twos (np.ndarray): player two's number of wins for each combination
+        num_decks: the number of decks in the batch (or an array of each combination's)
+        combos: the rows of the combinations added to (a slice or index array), by default all
+    '''
+    tensor["counts"][combos] += np.stack(np.broadcast_arrays(
+        winner_ones, winner_twos, num_decks - winner_ones - winner_twos), axis=-1)
+    return
+
+def sequence_labels(seq_len: int, colors: bool = False, codes: np.ndarray = None) -> list:
+    '''
+    Labels of every sequence of seq_len cards, in sequence code order
+
+    Arguments:
+        seq_len (int): the number of elements in each player's chosen sequence
+        colors (bool): label black and red cards (B and R) instead of 0s and 1s
+        codes (np.ndarray): if given, only label these sequence codes, in their order
+
+    Output:
+        labels (list): the label of each sequence code
+    '''
+    codes = range(2**seq_len) if codes is None else np.asarray(codes).tolist()
+    labels = [format(code, f"0{seq_len}b") for code in codes]
+    if colors:
+        to_colors = str.maketrans("01", "BR")
+        labels = [label.translate(to_colors) for label in labels]
+    return labels
+
+def tensor_to_output(tensor: dict) -> pd.DataFrame:
+    '''
+    Turn a result tensor into the raw output of a simulation, one row per combination in the 
+    tensor's order, frequencies being computed once here rather than as the decks are played
+
+    Arguments:
+        tensor (dict): the result tensor (see new_result_tensor)
+
+    Output:
+        all_games_output (pd.DataFrame): same as run_full_sim_and_score, plus each combination's
+                                         frequency of ties ("tie freq")
+    '''
+    counts = tensor["counts"]
+    with np.errstate(invalid="ignore", divide="ignore"):
+        freqs = counts / counts.sum(axis=-1, keepdims=True)
+
+    all_games_output = pd.DataFrame(columns = ["p1 combo", "p2 combo",
+                                               "p1 winner freq", "p2 winner freq", "tie freq"])
+    all_games_output["p1 combo"]=sequence_labels(tensor["seq_len"], codes=tensor["p1_codes"])
+    all_games_output["p2 combo"]=sequence_labels(tensor["seq_len"], codes=tensor["p2_codes"])
+    all_games_output["p1 winner freq"]=freqs[:, 0]
+    all_games_output["p2 winner freq"]=freqs[:, 1]
+    all_games_output["tie freq"]=freqs[:, 2]
+
+    return all_games_output
+
+def expand_result_tensor(tensor: dict, all_combos: list = None) -> dict:
+    '''
+    Fill in the combinations left out of a result tensor by symmetry, like
+    expand_symmetric_output; combinations played are kept as they are, and the 
+    color-swapped, player-swapped and color- and player-swapped ones are looked up in turn 
+    for the others
+
+    Arguments:
+        tensor (dict): the result tensor (see new_result_tensor)
+        all_combos (list): the combinations to fill in (e.g. the ones selected before reducing 
+                           them, see generate.get_combo_codes), by default every combination 
+                           of two different sequences
+
+    Output:
+        expanded (dict): the result tensor over the combinations of all_combos equivalent to 
+                         one played, in their order
+    '''
+    seq_len = tensor["seq_len"]
+    mask = (1 << seq_len) - 1
+    if all_combos is None:
+        p1_codes, p2_codes = np.divmod(np.arange(4**seq_len, dtype=np.int64), 2**seq_len)
+        distinct = p1_codes != p2_codes
+        p1_codes, p2_codes = p1_codes[distinct], p2_codes[distinct]
+    else:
+        p1_codes, p2_codes = (np.asarray(codes, dtype=np.int64) for codes in encode_combos(all_combos))
+
+    # the combinations played, sorted by their (p1 code, p2 code) key for lookups
+    played = tensor["counts"].sum(axis=-1) > 0
+    keys = (tensor["p1_codes"][played] << seq_len) | tensor["p2_codes"][played]
+    order = np.argsort(keys)
+    keys, counts = keys[order], tensor["counts"][played][order]
+
+    expanded_counts = np.zeros((len(p1_codes), len(OUTCOMES)), dtype=np.int64)
+    found = np.zeros(len(p1_codes), dtype=bool)
+    for x, y, outcomes in ((p1_codes, p2_codes, [0, 1, 2]), 
+                           (p1_codes ^ mask, p2_codes ^ mask, [0, 1, 2]), 
+                           (p2_codes, p1_codes, [1, 0, 2]),       # P1 and P2 wins trade places
+                           (p2_codes ^ mask, p1_codes ^ mask, [1, 0, 2])):
+        if not len(keys):
+            break
+        wanted = (x << seq_len) | y
+        idx = np.minimum(np.searchsorted(keys, wanted), len(keys) - 1)
+        hit = ~found & (keys[idx] == wanted)
+        expanded_counts[hit] = counts[idx[hit]][:, outcomes]
+        found |= hit
+
+    return {"seq_len": seq_len, "p1_codes": p1_codes[found], "p2_codes": p2_codes[found], 
+            "counts": expanded_counts[found]}
+
+def pivot_result_tensor(tensor: dict, outcome: int = 0) -> pd.DataFrame:
+    '''
+    Pivot a result tensor straight into the shape of a heatmap of one outcome's frequency,
+    player one's sequences (B/R) as rows and player two's as columns, only the sequences 
+    played being rows and columns; combinations left out by symmetry are filled in 
+    beforehand (see expand_result_tensor)
+
+    Arguments:
+        tensor (dict): the result tensor (see new_result_tensor)
+        outcome (int): index of the outcome (see OUTCOMES)
+
+    Output:
+        pivoted (pd.DataFrame): the frequency of the outcome, NaN where a combination wasn't 
+                                played (e.g. the players' sequences are equal)
+    '''
+    rows, row_idx = np.unique(tensor["p1_codes"], return_inverse=True)
+    columns, column_idx = np.unique(tensor["p2_codes"], return_inverse=True)
+    num_decks = tensor["counts"].sum(axis=-1)
+
+    freqs = np.full((len(rows), len(columns)), np.nan)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        freqs[row_idx, column_idx] = np.where(num_decks > 0, tensor["counts"][:, outcome] / num_decks, np.nan)
+
+    pivoted = pd.DataFrame(freqs, 
+                           index=pd.Index(sequence_labels(tensor["seq_len"], True, rows), name="p1 combo"),
+                           columns=pd.Index(sequence_labels(tensor["seq_len"], True, columns), name="p2 combo"))
+    return pivoted
+
+def save_result_tensor(path: str, tensor: dict, deck_size: int, scoring: str) -> None:
+    '''
+    Write a result tensor to disk with the configuration needed to visualize it again
+
+    Arguments:
+        path (str): file path of the results (.npz)
+        tensor (dict): the result tensor (see new_result_tensor)
+        deck_size (int): the number of cards in each deck
+        scoring (str): the method the players were scored by (see scoring methods)
+    '''
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    np.savez(path, **tensor, deck_size=deck_size, scoring=scoring)
+    return
+
+def load_result_tensor(path: str) -> dict:
+    '''
+    Read a result tensor written by save_result_tensor (or a dense (2^seq_len, 2^seq_len, 3) 
+    "tensor" written before result tensors were sparse, expanded over every combination)
+
+    Arguments:
+        path (str): file path of the results (.npz)
+
+    Output:
+        results (dict): the "tensor", its "deck_size" and "scoring", and the "seq_len" and 
+                        largest "num_decks" of any combination
+    '''
+    with np.load(path) as data:
+        if "tensor" in data.files:
+            dense = data["tensor"]
+            p1_codes, p2_codes = np.nonzero(dense.sum(axis=-1))
+            tensor = expand_result_tensor({"seq_len": int(np.log2(dense.shape[0])), "p1_codes": p1_codes, 
+                                           "p2_codes": p2_codes, "counts": dense[p1_codes, p2_codes]})
+        else:
+            tensor = {"seq_len": int(data["seq_len"]), "p1_codes": data["p1_codes"], 
+                      "p2_codes": data["p2_codes"], "counts": data["counts"]}
+        deck_size = int(data["deck_size"])
+        scoring = str(data["scoring"])
+    return {"tensor": tensor, "deck_size": deck_size, "scoring": scoring, "seq_len": tensor["seq_len"], 
+            "num_decks": int(tensor["counts"].sum(axis=-1).max(initial=0))}
@@ -1,7 +1,24 @@
 from game import Game
+from engine import encode_combos, iter_score_batches, MAX_BATCH_GAMES
+from eventlog import logger, get_event_log, is_traced_deck, traced_decks, is_tracing
+from generate import get_shard_seed, get_shard_decks, iter_deck_chunks, ComboCodes
+from checkpoint import new_checkpoint, save_checkpoint, load_checkpoint, checkpoint_to_output
+from metrics import add_stage_time
+from cache import ResultCache, result_key, prefix_counts, DEFAULT_CACHE_DIR
+from results import (new_results_bundle, add_to_bundle, new_result_tensor, add_outcomes, 
+                     tensor_to_output)
+from concurrent.futures import ProcessPoolExecutor
+from statistics import NormalDist
+from typing import Iterator
+import os
 import random
+import time
+import numpy as np
 import pandas as pd
 
+# how run_antithetic_sim_and_score pairs each deck drawn with identically distributed decks
+ANTITHETIC_PAIRINGS = ("reverse", "complement", "both")
+
 def _score_sim_by_tricks(win_stats: dict) -> int:
     '''
     Compare the entry in the win_stats dict to see which player won more tricks 
@@ -50,98 +67,825 @@ def run_full_sim_and_score(master_seq_list: list,
                            seq_len: int, 
                            num_decks: int, 
                            all_combos: list, 
-                           scoring: str = "TRICKS"
+                           scoring: str = "TRICKS",
+                           engine: str = "vectorized",
+                           batch_size: int = 10000,
+                           as_tensor: bool = False
                            ) -> pd.DataFrame:
     '''
     Processes the entire simulation with the desired number of deck shuffles to cumulatively 
-    calculate the frequency of both players winning
+    calculate the frequency of both players winning. Each batch of decks is added in bulk to 
+    a result tensor of outcome counts (see results.new_result_tensor), and the frequencies 
+    are computed once at the end.
 
     Arguments:
-        master_seq_list (list): all shuffled decks for the simulation to process against
+        master_seq_list (list): all shuffled decks for the simulation to process against, either 
+                                a 2D array with one deck per row or an iterable of such 2D 
+                                chunks (see generate.iter_deck_chunks) consumed as they come
         deck_size (int): the number of cards in each deck
         seq_len (int): the number of elements in each player's chosen sequence 
         num_decks (int): the desired number of Monte Carlo simulations to execute this simulation
         all_combos (list): all possible ways for players to match sequences 
                            while playing the game (pregenerated)
         scoring (str): the desired method to score the players (see scoring methods)
+        engine (str): "vectorized" to score batches of decks against all combinations at once
+                      (see engine.score_deck_batch), or "automaton" to play one Game at a time
+        batch_size (int): the number of decks scored together by the vectorized engine, or 
+                          played between tensor updates by the automaton engine
+        as_tensor (bool): whether to return the result tensor itself, which 
+                          split_simulation_output pivots directly
            
     Output:
         all_games_output (pd.DataFrame): the raw data from a full simulation from one player's 
                                          perspective containing columns for player one's sequences, 
                                          player two's sequences, the sequence combination's frequency 
                                          of player one's wins, and the sequence combination's 
-                                         frequency of player two's wins
+                                         frequency of player two's wins (and ties)
 
     '''
     # first, account for Invalid Scoring Method error
     if(scoring != "TRICKS" and scoring != "CARDS"):
         raise Exception("Invalid Scoring Method")
+    if(engine != "vectorized" and engine != "automaton"):
+        raise Exception("Invalid Engine")
+
+    if(engine == "vectorized"):
+        tensor = _run_vectorized_sim_and_score(master_seq_list, num_decks, seq_len, 
+                                               all_combos, scoring, batch_size)
+        return tensor if as_tensor else _tensor_output(tensor)
+
+    # preallocated outcome counts for all decks and combinations
+    tensor = new_result_tensor(seq_len, all_combos)
+
+    start = 0
+    for decks in _iter_deck_batches(master_seq_list, num_decks, batch_size):
+        # each deck's winner of each combination, 1 for player one, 2 for player two, 0 for a tie
+        winners = np.zeros((len(decks), len(all_combos)), dtype=np.int8)
+
+        # iterate through the batch's deck shuffles and all combinations of player sequences
+        for deck_idx, deck in enumerate(decks):
+            master_seq = deck.tolist()
+            for combo_idx, this_combo in enumerate(all_combos):
+                # instantiate Game object with current deck and current player sequence combination 
+                g = Game(two_player_seqs = this_combo, 
+                         master_seq = master_seq, 
+                         deck_size = deck_size, 
+                         seq_len = seq_len)
+                
+                # play this Game
+                win_stats = g.play_this_game_deck()
+
+                # score this Game, Exception for Invalid Scoring Method already accounted for
+                if (scoring == "TRICKS"):
+                    winners[deck_idx, combo_idx] = _score_sim_by_tricks(win_stats)
+                elif (scoring == "CARDS"):
+                    winners[deck_idx, combo_idx] = _score_sim_by_cards(win_stats)
+
+            # sampled per-deck trace
+            if is_traced_deck(start + deck_idx):
+                played = winners[:deck_idx + 1]
+                logger.info(f"\nshuffle {start + deck_idx + 1}")
+                logger.info(f'Winners for this deck over all shuffles: {winners[deck_idx].tolist()}')
+                logger.info(f"Player one's cumulative wins in this simulation so far: {(tensor['counts'][:, 0] + (played == 1).sum(axis=0)).tolist()}")
+                logger.info(f"Player two's cumulative wins in this simulation so far: {(tensor['counts'][:, 1] + (played == 2).sum(axis=0)).tolist()}")
+
+        # add the whole batch's outcomes at once
+        add_outcomes(tensor, (winners == 1).sum(axis=0), (winners == 2).sum(axis=0), len(decks))
+        start += len(decks)
+
+    return tensor if as_tensor else _tensor_output(tensor)
+
+def run_bundle_sim_and_score(master_seq_list: list, 
+                             deck_size: int, 
+                             seq_len: int, 
+                             num_decks: int, 
+                             all_combos: list, 
+                             batch_size: int = 10000
+                             ) -> dict:
+    '''
+    Processes the entire simulation in a single pass of the vectorized engine, scoring every 
+    game by both tricks and cards and keeping ties and the distribution of each combination's 
+    trick and card differentials
+
+    Arguments:
+        master_seq_list (list): all shuffled decks for the simulation (see run_full_sim_and_score)
+        deck_size (int): the number of cards in each deck
+        seq_len (int): the number of elements in each player's chosen sequence 
+        num_decks (int): the desired number of Monte Carlo simulations to execute this simulation
+        all_combos (list): all possible ways for players to match sequences 
+                           while playing the game (pregenerated)
+        batch_size (int): the number of decks scored together per batch
+
+    Output:
+        bundle (dict): the results under both scoring methods (see results.new_results_bundle), 
+                       from which results.bundle_to_output gives each one's all_games_output
+    '''
+    bundle = new_results_bundle(all_combos, deck_size, seq_len)
+
+    for decks in _iter_deck_batches(master_seq_list, num_decks, batch_size):
+        add_batch_to_bundle(bundle, decks, all_combos, seq_len, first_deck_idx = bundle["num_decks"])
+        logger.info(f"Scored shuffles 1 to {bundle['num_decks']}")
+
+    return bundle
+
+def run_parallel_sim_and_score(deck_size: int, 
+                               seq_len: int, 
+                               num_decks: int, 
+                               all_combos: list, 
+                               scoring: str = "TRICKS",
+                               seed: int = 0,
+                               n_workers: int = None,
+                               shard_size: int = 10000,
+                               as_tensor: bool = False
+                               ) -> pd.DataFrame:
+    '''
+    Processes the entire simulation split into shards of shard_size decks, each generated from 
+    its own random stream (see generate.get_shard_seed) and scored by the vectorized engine in 
+    a pool of worker processes, then adds up the per-combination win counts. Shards are fixed 
+    by the master seed and shard_size, so results are identical for any number of workers.
+
+    Arguments:
+        deck_size (int): the number of cards in each deck
+        seq_len (int): the number of elements in each player's chosen sequence 
+        num_decks (int): the desired number of Monte Carlo simulations to execute this simulation
+        all_combos (list): all possible ways for players to match sequences 
+                           while playing the game (pregenerated)
+        scoring (str): the desired method to score the players (see scoring methods)
+        seed (int): master seed from which every shard's random stream is spawned
+        n_workers (int): number of worker processes (defaults to the number of CPUs), 
+                         1 scores every shard in this process
+        shard_size (int): the number of decks generated and scored per shard
+        as_tensor (bool): whether to return the result tensor (see run_full_sim_and_score)
+
+    Output:
+        all_games_output (pd.DataFrame): same as run_full_sim_and_score
+    '''
+    if(scoring != "TRICKS" and scoring != "CARDS"):
+        raise Exception("Invalid Scoring Method")
+
+    all_shard_wins = _score_shards(deck_size, seq_len, num_decks, all_combos, scoring, 
+                                   seed, n_workers, shard_size)
+
+    # reduce the shards' win counts, integer sums so the order shards finish in doesn't matter
+    tensor = new_result_tensor(seq_len, all_combos)
+    for n_decks, wins_one, wins_two in all_shard_wins:
+        add_outcomes(tensor, wins_one, wins_two, n_decks)
+    logger.info(f"Scored {num_decks} shuffles in {len(all_shard_wins)} shards")
+
+    return tensor if as_tensor else _tensor_output(tensor)
+
+def run_adaptive_sim_and_score(deck_size: int, 
+                               seq_len: int, 
+                               all_combos: list, 
+                               scoring: str = "TRICKS",
+                               target_half_width: float = 0.01,
+                               max_decks: int = 1000000,
+                               batch_size: int = 10000,
+                               confidence: float = 0.95,
+                               seed: int = 0
+                               ) -> pd.DataFrame:
+    '''
+    Processes the simulation in batches of decks (see generate.iter_deck_chunks), tracking a 
+    Wilson score interval for each combination's frequency of player one's and player two's 
+    wins, and stops sampling a combination once both intervals are within target_half_width 
+    of the estimate, or once max_decks decks have been drawn
+
+    Arguments:
+        deck_size (int): the number of cards in each deck
+        seq_len (int): the number of elements in each player's chosen sequence 
+        all_combos (list): all possible ways for players to match sequences 
+                           while playing the game (pregenerated)
+        scoring (str): the desired method to score the players (see scoring methods)
+        target_half_width (float): the interval half-width at which a combination has converged
+        max_decks (int): the most decks any combination is played on, at least 1
+        batch_size (int): the number of decks scored between convergence checks
+        confidence (float): the confidence level of the intervals
+        seed (int): master seed of the decks
+
+    Output:
+        all_games_output (pd.DataFrame): same as run_full_sim_and_score, plus each combination's 
+                                         interval bounds ("p1 ci low", "p1 ci high", 
+                                         "p2 ci low", "p2 ci high") and the number of decks 
+                                         it was played on ("n decks")
+    '''
+    if(scoring != "TRICKS" and scoring != "CARDS"):
+        raise Exception("Invalid Scoring Method")
+    if(max_decks < 1):
+        raise Exception("Not Enough Decks")
+
+    z = NormalDist().inv_cdf(0.5 + confidence / 2)
+    winner_ones = np.zeros(len(all_combos), dtype=np.int64)
+    winner_twos = np.zeros(len(all_combos), dtype=np.int64)
+    decks_played = np.zeros(len(all_combos), dtype=np.int64)
+    sampling = np.ones(len(all_combos), dtype=bool)
+
+    start = 0
+    for decks in iter_deck_chunks(max_decks, deck_size // 2, chunk_size = batch_size, seed = seed):
+        # only the combinations that haven't converged yet are played on this batch
+        sampling_idx = np.flatnonzero(sampling)
+        wins_one, wins_two = count_wins(decks, _combo_subset(all_combos, sampling_idx), 
+                                         seq_len, scoring, first_deck_idx = start)
+        winner_ones[sampling_idx] += wins_one
+        winner_twos[sampling_idx] += wins_two
+        decks_played[sampling_idx] += len(decks)
+        start += len(decks)
+
+        low_one, high_one = _wilson_interval(winner_ones, decks_played, z)
+        low_two, high_two = _wilson_interval(winner_twos, decks_played, z)
+        sampling &= np.maximum(high_one - low_one, high_two - low_two) / 2 > target_half_width
+        logger.info(f"Scored shuffles 1 to {start}, {sampling.sum()} combos still sampling")
+
+        if not sampling.any():
+            break
+
+    low_one, high_one = _wilson_interval(winner_ones, decks_played, z)
+    low_two, high_two = _wilson_interval(winner_twos, decks_played, z)
+    tensor = new_result_tensor(seq_len, all_combos)
+    add_outcomes(tensor, winner_ones, winner_twos, decks_played)
+    all_games_output = _tensor_output(tensor)
+    all_games_output["p1 ci low"]=low_one
+    all_games_output["p1 ci high"]=high_one
+    all_games_output["p2 ci low"]=low_two
+    all_games_output["p2 ci high"]=high_two
+    all_games_output["n decks"]=decks_played
+    logger.info(f"Played {decks_played.sum()} games instead of {max_decks * len(all_combos)}")
+
+    return all_games_output
+
+def run_checkpointed_sim_and_score(deck_size: int, 
+                                   seq_len: int, 
+                                   num_decks: int, 
+                                   all_combos: list, 
+                                   scoring: str = "TRICKS",
+                                   seed: int = 0,
+                                   checkpoint_path: str = "data/checkpoint.npz",
+                                   checkpoint_every: int = 10,
+                                   resume: bool = False,
+                                   chunk_size: int = 10000,
+                                   first_chunk: int = 0
+                                   ) -> pd.DataFrame:
+    '''
+    Processes the simulation chunk by chunk of decks (see generate.iter_deck_chunks), 
+    periodically saving the per-combination win and tie counts, the number of decks processed 
+    and the next chunk of decks to play (see checkpoint.save_checkpoint), so a run that dies 
+    can be resumed, and runs over disjoint chunks can be merged (see checkpoint.merge_checkpoints)
+
+    Arguments:
+        deck_size (int): the number of cards in each deck
+        seq_len (int): the number of elements in each player's chosen sequence 
+        num_decks (int): the desired number of Monte Carlo simulations to execute this simulation
+        all_combos (list): all possible ways for players to match sequences 
+                           while playing the game (pregenerated)
+        scoring (str): the desired method to score the players (see scoring methods)
+        seed (int): master seed of the decks
+        checkpoint_path (str): file path of the checkpoint, which holds the final results once done
+        checkpoint_every (int): the number of chunks played between checkpoints
+        resume (bool): whether to continue from the checkpoint at checkpoint_path, if there is one
+        chunk_size (int): the number of decks per chunk
+        first_chunk (int): index of the first chunk of decks to play when not resuming, 
+                           e.g. to give each host its own range of chunks under one seed
+
+    Output:
+        all_games_output (pd.DataFrame): same as checkpoint.checkpoint_to_output
+    '''
+    if(scoring != "TRICKS" and scoring != "CARDS"):
+        raise Exception("Invalid Scoring Method")
+
+    p1_combos = [''.join(str(e) for e in combo[0]) for combo in all_combos]
+    p2_combos = [''.join(str(e) for e in combo[1]) for combo in all_combos]
+
+    if resume and os.path.exists(checkpoint_path):
+        checkpoint = load_checkpoint(checkpoint_path)
+        if((checkpoint["deck_size"], checkpoint["seq_len"], checkpoint["scoring"], 
+            checkpoint["chunk_size"], int(checkpoint["seed_ranges"][-1, 0])) 
+           != (deck_size, seq_len, scoring, chunk_size, seed)
+           or checkpoint["p1_combos"].tolist() != p1_combos 
+           or checkpoint["p2_combos"].tolist() != p2_combos):
+            raise Exception("Mismatched Simulation Configurations")
+        logger.info(f"Resuming from {checkpoint['num_decks']} shuffles in {checkpoint_path}")
+    else:
+        checkpoint = new_checkpoint(p1_combos, p2_combos, deck_size, seq_len, scoring, 
+                                    seed, chunk_size, first_chunk)
+
+    # the last seed range is this run's, its next chunk being where the decks pick up
+    seed_range = checkpoint["seed_ranges"][-1]
+    deck_chunks = iter_deck_chunks(num_decks - checkpoint["num_decks"], deck_size // 2, 
+                                   chunk_size = chunk_size, seed = seed, 
+                                   first_chunk = int(seed_range[2]))
+
+    for chunk_count, decks in enumerate(deck_chunks, start=1):
+        wins_one, wins_two = count_wins(decks, all_combos, seq_len, scoring, 
+                                         first_deck_idx = checkpoint["num_decks"])
+        checkpoint["winner_ones"] += wins_one
+        checkpoint["winner_twos"] += wins_two
+        checkpoint["ties"] += len(decks) - wins_one - wins_two
+        checkpoint["num_decks"] += len(decks)
+        seed_range[2] += 1
+
+        if(chunk_count % checkpoint_every == 0):
+            save_checkpoint(checkpoint_path, checkpoint)
+            logger.info(f"Checkpointed {checkpoint['num_decks']} shuffles to {checkpoint_path}")
+
+    save_checkpoint(checkpoint_path, checkpoint)
+    logger.info(f"Scored {checkpoint['num_decks']} shuffles, results saved to {checkpoint_path}")
+
+    return checkpoint_to_output(checkpoint)
+
+def run_cached_sim_and_score(deck_size: int, 
+                             seq_len: int, 
+                             num_decks: int, 
+                             all_combos: list, 
+                             scoring: str = "TRICKS",
+                             seed: int = 0,
+                             n_workers: int = 1,
+                             chunk_size: int = 10000,
+                             cache_dir: str = DEFAULT_CACHE_DIR,
+                             as_tensor: bool = False
+                             ) -> pd.DataFrame:
+    '''
+    Processes the simulation through the on-disk result cache (see cache.ResultCache). A cached 
+    run with the same parameters and seed answers the request without playing any deck if 
+    num_decks ends on one of its chunk boundaries; otherwise the cached run's chunks are reused 
+    and only the chunks after them are played (like run_parallel_sim_and_score), the longer 
+    run being cached in turn.
+
+    Arguments:
+        deck_size (int): the number of cards in each deck
+        seq_len (int): the number of elements in each player's chosen sequence 
+        num_decks (int): the desired number of Monte Carlo simulations to execute this simulation
+        all_combos (list): all possible ways for players to match sequences 
+                           while playing the game (pregenerated)
+        scoring (str): the desired method to score the players (see scoring methods)
+        seed (int): master seed of the decks (see generate.iter_deck_chunks)
+        n_workers (int): number of worker processes scoring the chunks that aren't cached, 
+                         None for the number of CPUs
+        chunk_size (int): the number of decks per seeded chunk
+        cache_dir (str): directory of the result cache
+        as_tensor (bool): whether to return the result tensor (see run_full_sim_and_score)
+
+    Output:
+        all_games_output (pd.DataFrame): same as run_full_sim_and_score
+    '''
+    if(scoring != "TRICKS" and scoring != "CARDS"):
+        raise Exception("Invalid Scoring Method")
+
+    p1_codes, p2_codes = encode_combos(all_combos)
+    cache = ResultCache(cache_dir)
+    key = result_key(deck_size, seq_len, scoring, seed, chunk_size, p1_codes, p2_codes)
+    entry = cache.get(key)
+
+    counts = prefix_counts(entry, num_decks) if entry is not None else None
+    if counts is not None:
+        logger.info(f"Loaded {num_decks} shuffles from the result cache ({key[:12]})")
+    else:
+        # reuse the cached run's leading full chunks, play the rest
+        chunk_counts = np.zeros((0, len(all_combos), 3), dtype=np.int64)
+        if entry is not None:
+            full = entry["chunk_sizes"] == chunk_size
+            n_full = min(len(full) if full.all() else int(np.argmin(full)), num_decks // chunk_size)
+            chunk_counts = entry["chunk_counts"][:n_full]
+        first = len(chunk_counts)
+
+        all_shard_wins = _score_shards(deck_size, seq_len, num_decks, all_combos, scoring, 
+                                       seed, n_workers, chunk_size, first_shard = first)
+        logger.info(f"Reused {first * chunk_size} cached shuffles, scored {num_decks - first * chunk_size} more")
+
+        new_counts = np.zeros((len(all_shard_wins), len(all_combos), 3), dtype=np.int64)
+        for new_count, (n_decks, wins_one, wins_two) in zip(new_counts, all_shard_wins):
+            new_count[:] = np.stack([wins_one, wins_two, n_decks - wins_one - wins_two], axis=1)
+        chunk_counts = np.concatenate([chunk_counts, new_counts])
+        counts = chunk_counts.sum(axis=0)
+
+        # only replace the cached run with a longer one
+        if(entry is None or num_decks > entry["chunk_sizes"].sum()):
+            chunk_sizes = np.array([chunk_size] * first + [n_decks for n_decks, _, _ in all_shard_wins], 
+                                   dtype=np.int64)
+            cache.put(key, {"chunk_counts": chunk_counts, "chunk_sizes": chunk_sizes})
+
+    tensor = new_result_tensor(seq_len, all_combos)
+    add_outcomes(tensor, counts[:, 0], counts[:, 1], num_decks)
+    return tensor if as_tensor else _tensor_output(tensor)
+
+def run_sweep_sim_and_score(deck_size: int, 
+                            num_decks_list: list, 
+                            combos_by_seq_len: dict, 
+                            scorings: list, 
+                            seed: int = 0,
+                            chunk_size: int = 10000
+                            ) -> dict:
+    '''
+    Processes every configuration of a sweep sharing one deck size in a single pass over the 
+    decks: each chunk of decks (see generate.iter_deck_chunks) is generated once and scored 
+    against every sequence length's combinations while it is in memory, both scoring methods 
+    coming from the same engine call, and shorter runs are snapshots of the longest one's 
+    first decks. Results match separate runs with the same seed.
+
+    Arguments:
+        deck_size (int): the number of cards in each deck
+        num_decks_list (list): the numbers of decks of the sweep's configurations
+        combos_by_seq_len (dict): each sequence length's sequence combinations to play
+        scorings (list): the scoring methods of the sweep's configurations (see scoring methods)
+        seed (int): master seed of the decks
+        chunk_size (int): the number of decks generated and scored together
+
+    Output:
+        tensors (dict): the result tensor (see results.new_result_tensor) of each 
+                        (num_decks, seq_len, scoring) configuration
+    '''
+    if any(scoring != "TRICKS" and scoring != "CARDS" for scoring in scorings):
+        raise Exception("Invalid Scoring Method")
+
+    running = {(seq_len, scoring): new_result_tensor(seq_len, all_combos) 
+               for seq_len, all_combos in combos_by_seq_len.items() for scoring in scorings}
+    tensors = {}
+    stops = sorted(set(num_decks_list))
+
+    start = 0
+    for chunk in iter_deck_chunks(stops[-1], deck_size // 2, chunk_size = chunk_size, seed = seed):
+        # split the chunk where a shorter configuration's decks end
+        bounds = [stop - start for stop in stops if start < stop < start + len(chunk)]
+        for decks in np.split(chunk, bounds):
+            for seq_len, all_combos in combos_by_seq_len.items():
+                for combos, tricks, cards in iter_score_batches(decks, all_combos, seq_len):
+                    for scoring in scorings:
+                        counts = tricks if scoring == "TRICKS" else cards
+                        add_outcomes(running[seq_len, scoring], (counts[..., 0] > counts[..., 1]).sum(axis=0), 
+                                     (counts[..., 0] < counts[..., 1]).sum(axis=0), len(decks), combos)
+            start += len(decks)
+
+            if start in stops:
+                for (seq_len, scoring), tensor in running.items():
+                    tensors[start, seq_len, scoring] = {**tensor, "counts": tensor["counts"].copy()}
+        logger.info(f"Scored {deck_size}-card shuffles 1 to {start} for sequence lengths {list(combos_by_seq_len)}")
+
+    return tensors
+
+def run_antithetic_sim_and_score(deck_size: int, 
+                                 seq_len: int, 
+                                 num_decks: int, 
+                                 all_combos: list, 
+                                 scoring: str = "TRICKS",
+                                 pairing: str = "complement",
+                                 seed: int = 0,
+                                 batch_size: int = 10000
+                                 ) -> pd.DataFrame:
+    '''
+    Processes the simulation with antithetic decks: every deck drawn (see generate.iter_deck_chunks) 
+    is played together with its reversal and/or color complement, which are identically 
+    distributed shuffles, and each combination's outcome is averaged over the group first. 
+    Frequencies are the mean over all decks played, and their standard errors come from the 
+    spread of the group averages, so any correlation within a group is accounted for.
+
+    Arguments:
+        deck_size (int): the number of cards in each deck
+        seq_len (int): the number of elements in each player's chosen sequence 
+        num_decks (int): the number of decks to play, counting the paired ones, so 
+                         num_decks // group size decks are drawn
+        all_combos (list): all possible ways for players to match sequences 
+                           while playing the game (pregenerated)
+        scoring (str): the desired method to score the players (see scoring methods)
+        pairing (str): "reverse" to pair each deck with its reversal, "complement" with its 
+                       color complement (0s and 1s swapped), or "both" for groups of four 
+                       (the deck, its reversal, its complement and its reversed complement). 
+                       Complements reduce the variance most (about 1.5x by tricks and 5x by 
+                       cards on average for seq_len 3), while reversals are positively 
+                       correlated with the deck and increase it.
+        seed (int): master seed of the decks
+        batch_size (int): the number of decks drawn and scored (with their pairs) together
+
+    Output:
+        all_games_output (pd.DataFrame): same as run_full_sim_and_score, plus the standard error 
+                                         of each combination's frequencies ("p1 se", "p2 se") and 
+                                         the standard error plain Monte Carlo would have over the 
+                                         same number of decks ("p1 mc se", "p2 mc se")
+    '''
+    if(scoring != "TRICKS" and scoring != "CARDS"):
+        raise Exception("Invalid Scoring Method")
+    if(pairing not in ANTITHETIC_PAIRINGS):
+        raise Exception("Invalid Pairing")
+
+    group_size = 4 if pairing == "both" else 2
+    num_groups = num_decks // group_size
+    if(num_groups < 2):
+        raise Exception("Not Enough Decks")
+
+    tensor = new_result_tensor(seq_len, all_combos)
+    # sums and sums of squares of each group's average win indicator, per player and combination
+    sums = np.zeros((2, len(all_combos)))
+    squares = np.zeros((2, len(all_combos)))
+
+    for decks in iter_deck_chunks(num_groups, deck_size // 2, chunk_size = batch_size, seed = seed):
+        if(pairing == "reverse"):
+            group = [decks, decks[:, ::-1]]
+        elif(pairing == "complement"):
+            group = [decks, 1 - decks]
+        else:
+            group = [decks, decks[:, ::-1], 1 - decks, 1 - decks[:, ::-1]]
+
+        for combos, tricks, cards in iter_score_batches(np.concatenate(group), all_combos, seq_len):
+            counts = (tricks if scoring == "TRICKS" else cards).reshape(group_size, len(decks), -1, 2)
+            wins = np.stack([counts[..., 0] > counts[..., 1], counts[..., 0] < counts[..., 1]])
+
+            add_outcomes(tensor, wins[0].sum(axis=(0, 1)), wins[1].sum(axis=(0, 1)), 
+                         group_size * len(decks), combos)
+            group_means = wins.mean(axis=1)
+            sums[:, combos] += group_means.sum(axis=1)
+            squares[:, combos] += (group_means**2).sum(axis=1)
+
+    freqs = sums / num_groups
+    se = np.sqrt(np.maximum(squares / num_groups - freqs**2, 0) / (num_groups - 1))
+    mc_se = np.sqrt(freqs * (1 - freqs) / (num_groups * group_size))
+
+    all_games_output = _tensor_output(tensor)
+    all_games_output["p1 se"]=se[0]
+    all_games_output["p2 se"]=se[1]
+    all_games_output["p1 mc se"]=mc_se[0]
+    all_games_output["p2 mc se"]=mc_se[1]
+
+    # the variance ratio is how many times more decks plain Monte Carlo would need
+    with np.errstate(invalid="ignore", divide="ignore"):
+        ratio = np.nanmean(mc_se**2 / se**2)
+    logger.info(f"Scored {num_groups * group_size} shuffles in groups of {group_size} ({pairing}), "
+                f"variance reduced {ratio:.2f}x on average compared to independent decks")
+
+    return all_games_output
+
+def _wilson_interval(wins: np.ndarray, 
+                     num_decks: np.ndarray, 
+                     z: float
+                     ) -> tuple[np.ndarray, np.ndarray]:
+    '''
+    Wilson score interval of each combination's frequency of wins
+
+    Arguments:
+        wins (np.ndarray): a player's number of wins for each combination
+        num_decks (np.ndarray): the number of decks each combination was played on
+        z (float): the standard normal quantile of the interval's confidence level
+
+    Output:
+        low (np.ndarray): lower bound of each combination's interval
+        high (np.ndarray): upper bound of each combination's interval
+    '''
+    freq = wins / num_decks
+    denominator = 1 + z**2 / num_decks
+    center = (freq + z**2 / (2 * num_decks)) / denominator
+    half_width = z * np.sqrt(freq * (1 - freq) / num_decks + z**2 / (4 * num_decks**2)) / denominator
+    return center - half_width, center + half_width
+
+def _score_shards(deck_size: int, 
+                  seq_len: int, 
+                  num_decks: int, 
+                  all_combos: list, 
+                  scoring: str, 
+                  seed: int, 
+                  n_workers: int, 
+                  shard_size: int, 
+                  first_shard: int = 0
+                  ) -> list:
+    '''
+    Generate and score the decks of a sharded run (see run_parallel_sim_and_score and 
+    run_cached_sim_and_score) in a pool of worker processes, each shard of shard_size decks 
+    from its own random stream (see generate.get_shard_seed), recording their generation time
+
+    Arguments:
+        deck_size (int): the number of cards in each deck
+        seq_len (int): the number of elements in each player's chosen sequence 
+        num_decks (int): the number of decks of the whole run
+        all_combos (list): the sequence combinations played
+        scoring (str): the desired method to score the players (see scoring methods)
+        seed (int): master seed from which every shard's random stream is spawned
+        n_workers (int): number of worker processes, None for the number of CPUs, 
+                         1 to score every shard in this process
+        shard_size (int): the number of decks per shard
+        first_shard (int): index of the first shard to play, the decks before it being skipped
+
+    Output:
+        all_shard_wins (list): each shard's (n_decks, winner_ones, winner_twos), in shard order
+    '''
+    shards = [(get_shard_seed(seed, shard_idx), min(shard_size, num_decks - start), 
+               deck_size, seq_len, all_combos, scoring)
+              for shard_idx, start in enumerate(range(first_shard * shard_size, num_decks, shard_size), 
+                                                start=first_shard)]
+    if(n_workers == 1):
+        all_shard_wins = list(map(_score_shard, shards))
+    else:
+        with ProcessPoolExecutor(max_workers=n_workers) as pool:
+            all_shard_wins = list(pool.map(_score_shard, shards))
+
+    _record_shard_generation(all_shard_wins, shards)
+    return [(shard[1], wins_one, wins_two) for (wins_one, wins_two, _), shard in zip(all_shard_wins, shards)]
+
+def _score_shard(shard: tuple) -> tuple[np.ndarray, np.ndarray, tuple]:
+    '''
+    Worker task of _score_shards, generating one shard of decks and counting 
+    both players' wins per combination
+
+    Arguments:
+        shard (tuple): the shard's (shard_seed, n_decks, deck_size, seq_len, all_combos, scoring)
+
+    Output:
+        winner_ones (np.ndarray): player one's number of wins for each combination in this shard
+        winner_twos (np.ndarray): player two's number of wins for each combination in this shard
+        generate_time (tuple): wall and CPU seconds spent generating the shard's decks
+                               (see metrics.add_stage_time)
+    '''
+    shard_seed, n_decks, deck_size, seq_len, all_combos, scoring = shard
+    wall_start, cpu_start = time.perf_counter(), time.process_time()
+    decks = get_shard_decks(shard_seed, n_decks, deck_size // 2)
+    generate_time = (time.perf_counter() - wall_start, time.process_time() - cpu_start)
+    return (*count_wins(decks, all_combos, seq_len, scoring), generate_time)
+
+def _record_shard_generation(all_shard_wins: list, shards: list) -> None:
+    '''
+    Record the time the shards' decks took to generate as the run's "generate" stage
+    '''
+    for (_, _, (wall_s, cpu_s)), shard in zip(all_shard_wins, shards):
+        add_stage_time("generate", wall_s, cpu_s, decks = shard[1], cards = shard[1] * shard[2])
+    return
+
+def count_wins(decks: np.ndarray, 
+               all_combos: list, 
+               seq_len: int, 
+               scoring: str,
+               first_deck_idx: int = None
+               ) -> tuple[np.ndarray, np.ndarray]:
+    '''
+    Score a batch of decks against all combinations with the vectorized engine and count 
+    both players' wins per combination, a slice of the combinations at a time 
+    (see engine.iter_score_batches)
+
+    Arguments:
+        decks (np.ndarray): 2D array of shape (n_decks, deck_size), each row is a shuffled deck
+        all_combos (list): all possible ways for players to match sequences 
+                           while playing the game (pregenerated)
+        seq_len (int): the number of elements in each player's chosen sequence 
+        scoring (str): the desired method to score the players (see scoring methods)
+        first_deck_idx (int): the simulation-wide index of the batch's first deck, if given the 
+                              batch's sampled decks are traced (see eventlog.configure_logging), 
+                              traced batches being scored against every combination at once
+
+    Output:
+        winner_ones (np.ndarray): player one's number of wins for each combination
+        winner_twos (np.ndarray): player two's number of wins for each combination
+    '''
+    traced = first_deck_idx is not None and is_tracing()
+    winner_ones = np.zeros(len(all_combos), dtype=np.int64)
+    winner_twos = np.zeros(len(all_combos), dtype=np.int64)
+    for combos, tricks, cards in iter_score_batches(decks, all_combos, seq_len, 
+                                                    max_games = None if traced else MAX_BATCH_GAMES):
+        if traced:
+            trace_batch(decks, tricks, cards, first_deck_idx)
+
+        # score these Games, Exception for Invalid Scoring Method already accounted for by callers
+        counts = tricks if scoring == "TRICKS" else cards
+        winner_ones[combos] = (counts[..., 0] > counts[..., 1]).sum(axis=0)
+        winner_twos[combos] = (counts[..., 0] < counts[..., 1]).sum(axis=0)
+    return winner_ones, winner_twos
+
+def add_batch_to_bundle(bundle: dict, 
+                        decks: np.ndarray, 
+                        all_combos: list, 
+                        seq_len: int, 
+                        first_deck_idx: int = None
+                        ) -> None:
+    '''
+    Score a batch of decks against all combinations with the vectorized engine and add the 
+    games to a results bundle under both scoring methods, a slice of the combinations at a time 
+    (see engine.iter_score_batches)
+
+    Arguments:
+        bundle (dict): the results bundle (see results.new_results_bundle)
+        decks (np.ndarray): 2D array of shape (n_decks, deck_size), each row is a shuffled deck
+        all_combos (list): all possible ways for players to match sequences 
+                           while playing the game (pregenerated)
+        seq_len (int): the number of elements in each player's chosen sequence 
+        first_deck_idx (int): the simulation-wide index of the batch's first deck, if given the 
+                              batch's sampled decks are traced (see count_wins)
+    '''
+    traced = first_deck_idx is not None and is_tracing()
+    counters = [key for key in bundle if key.endswith(("_outcomes", "_margins"))]
+    for combos, tricks, cards in iter_score_batches(decks, all_combos, seq_len, 
+                                                    max_games = None if traced else MAX_BATCH_GAMES):
+        if traced:
+            trace_batch(decks, tricks, cards, first_deck_idx)
+        # views of the slice's rows, added to in place
+        add_to_bundle({**{key: bundle[key][combos] for key in counters}, "num_decks": 0}, tricks, cards)
+    bundle["num_decks"] += len(decks)
+    return
+
+def trace_batch(decks: np.ndarray, 
+                 tricks: np.ndarray, 
+                 cards: np.ndarray, 
+                 first_deck_idx: int
+                 ) -> None:
+    '''
+    Trace a batch scored by the vectorized engine: the sampled decks' tricks and cards for 
+    every combination in the text log and, at debug verbosity, every deck's games as one 
+    event each in the structured event log
+
+    Arguments:
+        decks (np.ndarray): 2D array of shape (n_decks, deck_size), each row is a shuffled deck
+        tricks (np.ndarray): the batch's tricks (see engine.score_deck_batch)
+        cards (np.ndarray): the batch's cards (see engine.score_deck_batch)
+        first_deck_idx (int): the simulation-wide index of the batch's first deck
+    '''
+    for idx in traced_decks(first_deck_idx, len(decks)):
+        logger.info(f"\nshuffle {first_deck_idx + idx + 1}: {decks[idx].tolist()}")
+        logger.info(f"Tricks for each combo: {tricks[idx].tolist()}")
+        logger.info(f"Cards for each combo: {cards[idx].tolist()}")
+
+    event_log = get_event_log()
+    if event_log is not None:
+        for idx in range(len(decks)):
+            event_log.record({"event": "deck", "deck_idx": first_deck_idx + idx, "deck": decks[idx], 
+                              "tricks": tricks[idx], "cards": cards[idx]})
+    return
+
+def _combo_subset(all_combos: list, idx: np.ndarray) -> list:
+    '''
+    The combinations at the given indices, staying integer-coded when all_combos is (see generate.ComboCodes)
+    '''
+    if isinstance(all_combos, ComboCodes):
+        return all_combos[idx]
+    return [all_combos[i] for i in idx]
+
+def _tensor_output(tensor: dict) -> pd.DataFrame:
+    '''
+    Turn a simulation's result tensor into its raw output, one row per combination
+
+    Arguments:
+        tensor (dict): the result tensor (see results.new_result_tensor)
+
+    Output:
+        all_games_output (pd.DataFrame): same as run_full_sim_and_score
+    '''
+    all_games_output = tensor_to_output(tensor)
+    logger.info('\n-----------------------Simulation concluded, all card decks have been run with all shuffles-----------------------')
+    logger.info(f"\nFreq wins player 1: {all_games_output['p1 winner freq'].tolist()}")
+    logger.info(f"Freq wins player 2: {all_games_output['p2 winner freq'].tolist()}")
+
+    return all_games_output
+
+def _run_vectorized_sim_and_score(master_seq_list: np.ndarray, 
+                                  num_decks: int, 
+                                  seq_len: int, 
+                                  all_combos: list, 
+                                  scoring: str, 
+                                  batch_size: int
+                                  ) -> dict:
+    '''
+    Vectorized counterpart of run_full_sim_and_score, scoring batch_size decks against all
+    combinations at once and adding both players' wins per combination to a result tensor
+
+    Arguments:
+        master_seq_list (np.ndarray): all shuffled decks for the simulation (see run_full_sim_and_score)
+        num_decks (int): the desired number of Monte Carlo simulations to execute this simulation
+        seq_len (int): the number of elements in each player's chosen sequence 
+        all_combos (list): all possible ways for players to match sequences 
+                           while playing the game (pregenerated)
+        scoring (str): the desired method to score the players (see scoring methods)
+        batch_size (int): the number of decks scored together per batch
+
+    Output:
+        tensor (dict): the result tensor (see results.new_result_tensor)
+    '''
+    tensor = new_result_tensor(seq_len, all_combos)
+
+    start = 0
+    for decks in _iter_deck_batches(master_seq_list, num_decks, batch_size):
+        wins_one, wins_two = count_wins(decks, all_combos, seq_len, scoring, first_deck_idx = start)
+        add_outcomes(tensor, wins_one, wins_two, len(decks))
+        logger.info(f"Scored shuffles {start + 1} to {start + len(decks)}")
+        start += len(decks)
+
+    return tensor
+
+def _iter_deck_batches(master_seq_list, 
+                       num_decks: int, 
+                       batch_size: int
+                       ) -> Iterator[np.ndarray]:
+    '''
+    Walk through the first num_decks decks of a simulation in 2D batches, slicing an in-memory 
+    array into batch_size rows or passing through the chunks of a deck stream as they come
+
+    Arguments:
+        master_seq_list (list): all shuffled decks for the simulation (see run_full_sim_and_score)
+        num_decks (int): the desired number of Monte Carlo simulations to execute this simulation
+        batch_size (int): the number of decks per batch when slicing an in-memory array
+
+    Output:
+        decks (np.ndarray): yields 2D arrays of shape (n_decks, deck_size), each row is a shuffled deck
+    '''
+    if isinstance(master_seq_list, (np.ndarray, list)):
+        master_seq_list = np.asarray(master_seq_list)
+        for start in range(0, num_decks, batch_size):
+            yield master_seq_list[start:min(start + batch_size, num_decks)]
+        return
 
-    # initialize all data storage objects to track of statistics for all decks and combinations
-    all_games_output = pd.DataFrame(columns = ["p1 combo", "p2 combo", 
-                                               "p1 winner freq", "p2 winner freq"])
-    p1_seqs = []
-    p2_seqs = []
-
-    freq_wins_one = [0] * len(all_combos)
-    winner_ones = [0] * len(all_combos)
-    freq_wins_two = [0] * len(all_combos)
-    winner_twos = [0] * len(all_combos)
-
-    # iterate through all the deck shuffles generated
-    for current_deck_idx in range(num_decks):
-        master_seq = master_seq_list[current_deck_idx].tolist()
-        winners = []
-        count = 0
-
-        # iterate through all combinations of player sequences for the current deck
-        for this_combo in all_combos:
-            count+=1
-
-            print(f"\nshuffle {current_deck_idx + 1}")
-            print(f'combo {count}')
-
-            if(current_deck_idx == 0):
-                p1_seqs.append(''.join(str(e) for e in this_combo[0]))
-                p2_seqs.append(''.join(str(e) for e in this_combo[1]))
-
-            # instantiate Game object with current deck and current player sequence combination 
-            g = Game(two_player_seqs = this_combo, 
-                     master_seq = master_seq, 
-                     deck_size = deck_size, 
-                     seq_len = seq_len)
-            
-            # play this Game
-            win_stats = g.play_this_game_deck()
-
-            # score this Game, Exception for Invalid Scoring Method already accounted for
-            if (scoring == "TRICKS"):
-                winners.append(_score_sim_by_tricks(win_stats))
-            elif (scoring == "CARDS"):
-                winners.append(_score_sim_by_cards(win_stats))
-
-        print(f'Winners for this deck over all shuffles: {winners}')
-
-        # calculate cumulative wins for each players so far across all games
-        for index, item in enumerate(winners):
-            winner_ones[index] += 1 if (item==1) else 0
-        print(f"\nPlayer one's cumulative wins in this simulation so far: {winner_ones}")
-
-        for index, item in enumerate(winners):
-            winner_twos[index] += 1 if (item==2) else 0
-        print(f"Player two's cumulative wins in this simulation so far: {winner_twos}")
-
-        # calculate frequency of wins for each players so far across all games
-        freq_wins_one=[current_deck_idx/num_decks for current_deck_idx in winner_ones]
-        freq_wins_two=[current_deck_idx/num_decks for current_deck_idx in winner_twos]
-    print('\n-----------------------Simulation concluded, all card decks have been run with all shuffles-----------------------')
-    print(f"\nFreq wins player 1: {freq_wins_one}")
-    print(f"Freq wins player 2: {freq_wins_two}")
-
-    # save and store all the winning frequency and combination data to display after all Games concluded 
-    all_games_output["p1 combo"]=p1_seqs
-    all_games_output["p2 combo"]=p2_seqs
-    all_games_output["p1 winner freq"]=freq_wins_one
-    all_games_output["p2 winner freq"]=freq_wins_two
-
-    return all_games_output
\ No newline at end of file
+    remaining = num_decks
+    for decks in master_seq_list:
+        if(remaining <= 0):
+            break
+        decks = decks[:remaining]
+        remaining -= len(decks)
+        yield decks
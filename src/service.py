@@ -0,0 +1,300 @@
+import argparse
+import asyncio
+import json
+import os
+import threading
+from urllib.parse import urlsplit, parse_qs
+
+import numpy as np
+
+from generate import create_game_combos, reduce_game_combos
+from exact import solve_exact
+from score import run_cached_sim_and_score
+from results import expand_result_tensor, expand_symmetric_output, sequence_labels
+from eventlog import logger
+
+DEFAULT_INDEX_DIR = "data/index"
+
+# configs with decks up to this size are filled in exactly (see exact.solve_exact), larger
+# ones by a cached vectorized simulation of ON_DEMAND_DECKS decks (see run_cached_sim_and_score)
+EXACT_MAX_DECK_SIZE = 52
+ON_DEMAND_DECKS = 100000
+
+# the longest sequences indexed, past which a config's (2^seq_len)^2 matchups take too long
+# to fill in on demand
+MAX_SEQ_LEN = 8
+
+class MatchupIndex:
+    '''
+    A MatchupIndex object holds, for each (deck_size, seq_len, scoring) config, the win, loss
+    and tie rates of every matchup as a 3D array indexed by [p1 code, p2 code, outcome]
+    (outcomes as in results.OUTCOMES), so best-response, row and pairwise queries are array
+    lookups. Configs are loaded from or saved to index_dir, and configs not computed yet are
+    filled in on demand by the fastest engine available for them.
+    '''
+    def __init__(self, index_dir: str = DEFAULT_INDEX_DIR) -> None:
+        self.index_dir = index_dir
+        self.rates = {}
+        self.engines = {}
+        self._lock = threading.Lock()
+        return
+
+    def __repr__(self) -> str:
+        return f"Matchup index of {len(self.rates)} configs in {self.index_dir}"
+
+    def precompute(self, configs: list) -> None:
+        '''
+        Make sure each config is in the index, computing and saving the missing ones
+
+        Arguments:
+            configs (list): (deck_size, seq_len, scoring) tuples
+        '''
+        for deck_size, seq_len, scoring in configs:
+            self.get_rates(deck_size, seq_len, scoring)
+        return
+
+    def get_rates(self, deck_size: int, seq_len: int, scoring: str = "TRICKS") -> np.ndarray:
+        '''
+        Get the rates of every matchup of a config, from memory, from index_dir, or computed
+        on demand and saved to index_dir (odd deck sizes being indexed as the decks of
+        deck_size - 1 cards they play, see generate.get_n_decks)
+
+        Arguments:
+            deck_size (int): the number of cards in each deck
+            seq_len (int): the number of elements in each player's chosen sequence
+            scoring (str): the desired method to score the players (see scoring methods)
+
+        Output:
+            rates (np.ndarray): 3D float array of shape (2^seq_len, 2^seq_len, 3), NaN where
+                                the players' sequences are equal
+        '''
+        config = _check_config(deck_size, seq_len, scoring)
+        if config in self.rates:
+            return self.rates[config]
+
+        # only one thread computes a missing config
+        with self._lock:
+            if config not in self.rates:
+                path = self._path(config)
+                if os.path.exists(path):
+                    with np.load(path) as data:
+                        rates, engine = data["rates"], str(data["engine"])
+                else:
+                    rates, engine = _compute_rates(deck_size, seq_len, scoring)
+                    os.makedirs(self.index_dir, exist_ok=True)
+                    np.savez(path, rates=rates, engine=engine)
+                    logger.info(f"Indexed {config} with the {engine} engine")
+                self.engines[config] = engine
+                self.rates[config] = rates
+        return self.rates[config]
+
+    def pairwise(self, p1_seq: str, p2_seq: str, deck_size: int = 52, scoring: str = "TRICKS") -> dict:
+        '''
+        Both players' win rates and the tie rate of one matchup
+
+        Arguments:
+            p1_seq (str): player one's sequence, as B/R cards or 0s and 1s (e.g. "BRR" or "011")
+            p2_seq (str): player two's sequence, of the same length
+            deck_size (int): the number of cards in each deck
+            scoring (str): the desired method to score the players (see scoring methods)
+
+        Output:
+            matchup (dict): "p1", "p2", "p1 win rate", "p2 win rate" and "tie rate"
+        '''
+        p1_code, seq_len = _parse_sequence(p1_seq)
+        p2_code, p2_len = _parse_sequence(p2_seq)
+        if(p2_len != seq_len or p1_code == p2_code):
+            raise Exception("Invalid Matchup")
+
+        rates = self.get_rates(deck_size, seq_len, scoring)[p1_code, p2_code]
+        return _matchup(p1_code, p2_code, seq_len, rates)
+
+    def row(self, p1_seq: str, deck_size: int = 52, scoring: str = "TRICKS") -> list:
+        '''
+        Every matchup of player one's sequence against each of player two's
+
+        Arguments:
+            p1_seq (str): player one's sequence, as B/R cards or 0s and 1s
+            deck_size (int): the number of cards in each deck
+            scoring (str): the desired method to score the players (see scoring methods)
+
+        Output:
+            matchups (list): one dict per player two sequence (see pairwise)
+        '''
+        p1_code, seq_len = _parse_sequence(p1_seq)
+        rates = self.get_rates(deck_size, seq_len, scoring)[p1_code]
+        return [_matchup(p1_code, p2_code, seq_len, rates[p2_code])
+                for p2_code in range(2**seq_len) if p2_code != p1_code]
+
+    def best_response(self, p1_seq: str, deck_size: int = 52, scoring: str = "TRICKS") -> dict:
+        '''
+        Player two's best response to player one's sequence, the one with the highest win rate
+
+        Arguments:
+            p1_seq (str): player one's sequence, as B/R cards or 0s and 1s
+            deck_size (int): the number of cards in each deck
+            scoring (str): the desired method to score the players (see scoring methods)
+
+        Output:
+            matchup (dict): the best response's matchup (see pairwise)
+        '''
+        p1_code, seq_len = _parse_sequence(p1_seq)
+        rates = self.get_rates(deck_size, seq_len, scoring)[p1_code]
+        p2_code = int(np.nanargmax(rates[:, 1]))
+        return _matchup(p1_code, p2_code, seq_len, rates[p2_code])
+
+    def _path(self, config: tuple) -> str:
+        '''
+        File path of a config's rates in index_dir
+        '''
+        deck_size, seq_len, scoring = config
+        return os.path.join(self.index_dir, f"deck{deck_size}_seq{seq_len}_{scoring}.npz")
+
+def _check_config(deck_size: int, seq_len: int, scoring: str) -> tuple[int, int, str]:
+    '''
+    Validate a config before it is looked up or computed, normalizing an odd deck size to the
+    even number of cards its decks hold
+
+    Output:
+        config (tuple): (deck_size, seq_len, scoring), the key of the config's rates
+    '''
+    if(scoring != "TRICKS" and scoring != "CARDS"):
+        raise Exception("Invalid Scoring Method")
+    if(deck_size < 2):
+        raise Exception("Invalid Deck Size")
+    deck_size = 2 * (deck_size // 2)
+    if(seq_len < 1 or seq_len > min(MAX_SEQ_LEN, deck_size)):
+        raise Exception("Invalid Sequence Length")
+    return deck_size, seq_len, scoring
+
+def _compute_rates(deck_size: int, seq_len: int, scoring: str) -> tuple[np.ndarray, str]:
+    '''
+    Compute the rates of every matchup of a config with the fastest engine available for it,
+    scoring one combination per class of equivalent combinations (see generate.reduce_game_combos)
+
+    Output:
+        rates (np.ndarray): the config's rates (see MatchupIndex.get_rates)
+        engine (str): "exact" or "vectorized"
+    '''
+    all_combos = reduce_game_combos(create_game_combos(seq_len))
+    if(deck_size <= EXACT_MAX_DECK_SIZE):
+        all_games_output = expand_symmetric_output(solve_exact(deck_size, all_combos, scoring))
+        rates = np.full((2**seq_len, 2**seq_len, 3), np.nan)
+        p1_codes = [int(combo, 2) for combo in all_games_output["p1 combo"]]
+        p2_codes = [int(combo, 2) for combo in all_games_output["p2 combo"]]
+        rates[p1_codes, p2_codes] = all_games_output[["p1 winner freq", "p2 winner freq",
+                                                      "tie freq"]].to_numpy(dtype=float)
+        return rates, "exact"
+
+    tensor = expand_result_tensor(run_cached_sim_and_score(deck_size, seq_len, ON_DEMAND_DECKS,
+                                                           all_combos, scoring, as_tensor = True))
+    rates = np.full((2**seq_len, 2**seq_len, 3), np.nan)
+    rates[tensor["p1_codes"], tensor["p2_codes"]] = tensor["counts"] / tensor["counts"].sum(axis=-1, keepdims=True)
+    return rates, "vectorized"
+
+def _parse_sequence(seq: str) -> tuple[int, int]:
+    '''
+    Sequence code (see engine.encode_sequence) and length of a sequence given as B/R cards or 0s and 1s
+    '''
+    bits = seq.upper().translate(str.maketrans("BR", "01"))
+    if(not bits or set(bits) - {"0", "1"}):
+        raise Exception("Invalid Sequence")
+    return int(bits, 2), len(bits)
+
+def _matchup(p1_code: int, p2_code: int, seq_len: int, rates: np.ndarray) -> dict:
+    '''
+    Query answer of one matchup, sequences labelled with B/R cards
+    '''
+    labels = sequence_labels(seq_len, colors=True)
+    return {"p1": labels[p1_code], "p2": labels[p2_code], "p1 win rate": float(rates[0]),
+            "p2 win rate": float(rates[1]), "tie rate": float(rates[2])}
+
+async def serve(index: MatchupIndex, host: str = "127.0.0.1", port: int = 8000) -> None:
+    '''
+    Answer queries over HTTP until cancelled: GET /best_response?p1=BRR, /row?p1=BRR and
+    /pairwise?p1=BRR&p2=RBB, each taking optional deck_size (default 52) and scoring
+    (default TRICKS) parameters and returning JSON. Configs not in the index yet are computed
+    in a worker thread, so other queries are still answered meanwhile.
+
+    Arguments:
+        index (MatchupIndex): the index to answer from
+        host (str): address to listen on
+        port (int): port to listen on
+    '''
+    async def handle(reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        try:
+            request_line = (await reader.readline()).decode("latin-1").split()
+            # skip the headers
+            while (await reader.readline()) not in (b"\r\n", b"\n", b""):
+                pass
+            status, body = await _answer(index, request_line)
+        except Exception as e:
+            status, body = 400, {"error": str(e)}
+
+        payload = json.dumps(body).encode()
+        writer.write(f"HTTP/1.1 {status} {'OK' if status == 200 else 'Error'}\r\n"
+                     f"Content-Type: application/json\r\nContent-Length: {len(payload)}\r\n"
+                     f"Connection: close\r\n\r\n".encode() + payload)
+        await writer.drain()
+        writer.close()
+        return
+
+    server = await asyncio.start_server(handle, host, port)
+    logger.info(f"Serving matchup queries on http://{host}:{port}")
+    async with server:
+        await server.serve_forever()
+    return
+
+async def _answer(index: MatchupIndex, request_line: list) -> tuple[int, object]:
+    '''
+    Status and JSON body answering one HTTP request line
+    '''
+    if(len(request_line) < 2 or request_line[0] != "GET"):
+        return 405, {"error": "Only GET Requests Are Supported"}
+
+    url = urlsplit(request_line[1])
+    params = {key: values[-1] for key, values in parse_qs(url.query).items()}
+    queries = {"/best_response": (index.best_response, ("p1",)),
+               "/row": (index.row, ("p1",)),
+               "/pairwise": (index.pairwise, ("p1", "p2"))}
+    if url.path not in queries:
+        return 404, {"error": "Unknown Query"}
+
+    query, seq_params = queries[url.path]
+    if(set(seq_params) - set(params)):
+        return 400, {"error": "Missing Sequence"}
+    args = [params[name] for name in seq_params]
+    deck_size = int(params.get("deck_size", 52))
+    scoring = params.get("scoring", "TRICKS").upper()
+
+    # reject a bad query before it can start computing a config
+    seq_lens = {_parse_sequence(seq)[1] for seq in args}
+    if(len(seq_lens) > 1):
+        raise Exception("Invalid Matchup")
+    config = _check_config(deck_size, seq_lens.pop(), scoring)
+
+    # answer from memory when the config is indexed, compute it off the event loop otherwise
+    if config not in index.rates:
+        await asyncio.get_running_loop().run_in_executor(None, index.get_rates, *config)
+    return 200, query(*args, deck_size, scoring)
+
+def _parse_config(config: str) -> tuple[int, int, str]:
+    '''
+    (deck_size, seq_len, scoring) of a DECK_SIZE:SEQ_LEN:SCORING command line config
+    '''
+    deck_size, seq_len, scoring = config.split(":")
+    return int(deck_size), int(seq_len), scoring.upper()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Serve Penney's Game best-response queries")
+    parser.add_argument("--precompute", nargs="*", default=[], metavar="DECK_SIZE:SEQ_LEN:SCORING",
+                        help="configs to index before serving, e.g. 52:3:TRICKS")
+    parser.add_argument("--index-dir", default=DEFAULT_INDEX_DIR)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    args = parser.parse_args()
+
+    index = MatchupIndex(args.index_dir)
+    index.precompute([_parse_config(config) for config in args.precompute])
+    print(f"Serving {index} on http://{args.host}:{args.port}")
+    asyncio.run(serve(index, args.host, args.port))
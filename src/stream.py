@@ -0,0 +1,193 @@
+import contextlib
+import os
+import queue
+import threading
+from typing import Iterable
+
+import numpy as np
+import pandas as pd
+
+from generate import iter_deck_chunks
+from score import count_wins, add_batch_to_bundle
+from results import new_results_bundle, new_result_tensor, add_outcomes, tensor_to_output
+from eventlog import logger, is_tracing
+
+# how often (in decks) the reducer logs its progress
+LOG_EVERY = 1000000
+
+def run_streaming_sim_and_score(deck_size: int,
+                                seq_len: int,
+                                num_decks: int,
+                                all_combos: list,
+                                scoring: str = "TRICKS",
+                                seed: int = 0,
+                                deck_chunks: Iterable = None,
+                                chunk_size: int = 10000,
+                                n_scorers: int = None,
+                                queue_size: int = 2,
+                                histograms: bool = False,
+                                as_tensor: bool = False
+                                ) -> pd.DataFrame:
+    '''
+    Processes the entire simulation as a pipeline of three stages joined by bounded queues:
+    a source thread generating (or reading) chunks of decks, n_scorers threads scoring them with
+    the vectorized engine and counting each chunk's outcomes, and a reducer (this thread)
+    adding the counts up into fixed-size per-combination counters. The stages overlap, and no
+    more than about 2 * queue_size + n_scorers chunks of decks and one slice of scores per
+    scorer (see engine.iter_score_batches) are ever held, so memory stays the same however
+    many decks are played and however long the sequences are. The counts are added up in
+    whatever order the chunks finish, which doesn't change them, so the results are the same
+    as run_full_sim_and_score's on the same decks.
+
+    Arguments:
+        deck_size (int): the number of cards in each deck
+        seq_len (int): the number of elements in each player's chosen sequence
+        num_decks (int): the desired number of Monte Carlo simulations to execute this simulation
+        all_combos (list): all possible ways for players to match sequences
+                           while playing the game (pregenerated, see generate.get_combo_codes)
+        scoring (str): the desired method to score the players (see scoring methods), unused
+                       with histograms, which count both
+        seed (int): master seed of the decks (see generate.iter_deck_chunks)
+        deck_chunks (Iterable): if given, the source of the decks, e.g. a stored run's
+                                deckstore.DeckStore.iter_chunks(), instead of num_decks new
+                                ones generated from seed
+        chunk_size (int): the number of decks per generated chunk
+        n_scorers (int): the number of scoring threads, by default one per CPU besides the
+                         source's (the engine spends most of its time in NumPy, which lets
+                         other threads run meanwhile)
+        queue_size (int): the most chunks waiting between two stages
+        histograms (bool): whether to also count the distribution of each combination's trick
+                           and card differentials, returning a results bundle
+                           (see results.new_results_bundle) instead
+        as_tensor (bool): whether to return the result tensor (see results.new_result_tensor)
+                          instead of the DataFrame
+
+    Output:
+        all_games_output (pd.DataFrame): same as run_full_sim_and_score (or the result tensor
+                                         if as_tensor, or the results bundle if histograms)
+    '''
+    if(not histograms and scoring != "TRICKS" and scoring != "CARDS"):
+        raise Exception("Invalid Scoring Method")
+    n_scorers = n_scorers or max(1, (os.cpu_count() or 1) - 1)
+    if deck_chunks is None:
+        deck_chunks = iter_deck_chunks(num_decks, deck_size // 2, chunk_size = chunk_size, seed = seed)
+
+    # the reducer's counters: a results bundle's outcome and margin counts under both scoring
+    # methods, or one scoring method's outcome counts
+    if histograms:
+        counters = new_results_bundle(all_combos, deck_size, seq_len)
+        counter_keys = [key for key in counters if key.endswith(("_outcomes", "_margins"))]
+    else:
+        counters = {"outcomes": np.zeros((len(all_combos), 3), dtype=np.int64), "num_decks": 0}
+        counter_keys = ["outcomes"]
+
+    deck_queue = queue.Queue(maxsize = queue_size)
+    count_queue = queue.Queue(maxsize = queue_size)
+    stop = threading.Event()
+    trace_lock = threading.Lock()
+
+    def source() -> None:
+        try:
+            first_deck_idx = 0
+            for decks in deck_chunks:
+                if not _put(deck_queue, (first_deck_idx, decks), stop):
+                    return
+                first_deck_idx += len(decks)
+        except Exception as e:
+            _put(count_queue, e, stop)
+        finally:
+            # one end marker per scorer
+            for _ in range(n_scorers):
+                _put(deck_queue, None, stop)
+        return
+
+    def scorer() -> None:
+        try:
+            while (item := _get(deck_queue, stop)) is not None:
+                first_deck_idx, decks = item
+                # the event log isn't thread-safe, so traced batches are scored one at a time
+                with (trace_lock if is_tracing() else contextlib.nullcontext()):
+                    if histograms:
+                        chunk_counts = {key: np.zeros_like(counters[key]) for key in counter_keys}
+                        chunk_counts["num_decks"] = 0
+                        add_batch_to_bundle(chunk_counts, decks, all_combos, seq_len, first_deck_idx)
+                    else:
+                        wins_one, wins_two = count_wins(decks, all_combos, seq_len, scoring, first_deck_idx)
+                        chunk_counts = {"outcomes": np.stack([wins_one, wins_two, len(decks) - wins_one - wins_two], 
+                                                             axis=1), 
+                                        "num_decks": len(decks)}
+                if not _put(count_queue, chunk_counts, stop):
+                    return
+        except Exception as e:
+            _put(count_queue, e, stop)
+        finally:
+            _put(count_queue, None, stop)
+        return
+
+    threads = [threading.Thread(target = source, daemon = True)]
+    threads += [threading.Thread(target = scorer, daemon = True) for _ in range(n_scorers)]
+    for thread in threads:
+        thread.start()
+
+    try:
+        finished_scorers = 0
+        next_log = LOG_EVERY
+        while finished_scorers < n_scorers:
+            chunk_counts = count_queue.get()
+            if chunk_counts is None:
+                finished_scorers += 1
+                continue
+            if isinstance(chunk_counts, Exception):
+                raise chunk_counts
+            for key in counter_keys:
+                counters[key] += chunk_counts[key]
+            counters["num_decks"] += chunk_counts["num_decks"]
+            if(counters["num_decks"] >= next_log):
+                logger.info(f"Streamed and scored {counters['num_decks']} shuffles")
+                next_log += LOG_EVERY
+    finally:
+        # let every stage return, even when one of them failed
+        stop.set()
+        for thread in threads:
+            thread.join()
+
+    logger.info(f"Streamed and scored {counters['num_decks']} shuffles in total")
+    if histograms:
+        return counters
+
+    tensor = new_result_tensor(seq_len, all_combos)
+    outcomes = counters["outcomes"]
+    add_outcomes(tensor, outcomes[:, 0], outcomes[:, 1], outcomes.sum(axis=1))
+    if as_tensor:
+        return tensor
+
+    all_games_output = tensor_to_output(tensor)
+    logger.info(f"\nFreq wins player 1: {all_games_output['p1 winner freq'].tolist()}")
+    logger.info(f"Freq wins player 2: {all_games_output['p2 winner freq'].tolist()}")
+    return all_games_output
+
+def _put(pipe: queue.Queue, item, stop: threading.Event) -> bool:
+    '''
+    Put an item on a bounded queue, waiting for room unless the pipeline is stopping
+
+    Output:
+        put (bool): whether the item was put, False if the pipeline stopped first
+    '''
+    while not stop.is_set():
+        try:
+            pipe.put(item, timeout = 0.1)
+            return True
+        except queue.Full:
+            pass
+    return False
+
+def _get(pipe: queue.Queue, stop: threading.Event):
+    '''
+    Take the next item off a queue, None once the pipeline is stopping
+    '''
+    while not stop.is_set():
+        try:
+            return pipe.get(timeout = 0.1)
+        except queue.Empty:
+            pass
+    return None
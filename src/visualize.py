@@ -1,11 +1,28 @@
 import pandas as pd
+import matplotlib
+matplotlib.use("Agg") # render straight to files, also in worker processes without a display
 from matplotlib import pyplot as plt
 import seaborn as sns
+from concurrent.futures import ProcessPoolExecutor
 import os
 
+from results import bundle_to_output, margin_distribution, pivot_output, expand_symmetric_output
+
+# heatmaps with more cells than this (seq_len 5 and up) are drawn as a raster image without
+# per-cell annotations, which would be unreadable and dominate the rendering time
+ANNOTATE_MAX_CELLS = 256
+
+# raster heatmaps grow with their grid up to this many inches a side, past which (seq_len 8
+# and up) the image would take gigabytes to render and the sequence labels are left out
+RASTER_MAX_INCHES = 20
+
 def visualize_all_games_output(all_games_output: pd.DataFrame, 
                                current_time: str,
-                               title: str = None
+                               title: str = None,
+                               scoring: str = "TRICKS",
+                               value: str = "p1 winner freq",
+                               annot: bool = None,
+                               dpi: int = 300
                                ) -> None:
     '''
     Visualizes and saves show both plots for frequency of player 1 wins and player 2 wins
@@ -17,26 +34,129 @@ def visualize_all_games_output(all_games_output: pd.DataFrame,
                                          the axes of which are the players' sequences,
                                          and data being frequency of that player's wins
         current_time (str): date and time of this run to create distinct filenames for heatmaps
+                            (or an absolute directory to save them in instead of data/heatmaps)
         title (str): the title to give to this visualization (sns heatmap)
+        scoring (str): when all_games_output is a results bundle (see results.new_results_bundle), 
+                       the scoring method whose results to visualize
+        value (str): when all_games_output is a results bundle, the column of 
+                     results.bundle_to_output to visualize, e.g. "p2 winner freq", "tie freq" 
+                     or "p1 mean margin"
+        annot (bool): whether to write each cell's value in it, by default only for heatmaps of 
+                      at most ANNOTATE_MAX_CELLS cells; larger heatmaps without annotations are 
+                      drawn as a single raster image
+        dpi (int): resolution of the saved heatmap
     '''
+    if isinstance(all_games_output, dict):
+        all_games_output = pivot_output(expand_symmetric_output(bundle_to_output(all_games_output, scoring)), value)
+    if annot is None:
+        annot = all_games_output.size <= ANNOTATE_MAX_CELLS
     
     # the directory where to save the heatmap, create if doesn't exist
-    fig_dir = "data/heatmaps"  
-    os.makedirs(fig_dir, exist_ok=True)
-
-    time_dir = os.path.join(fig_dir, current_time)
+    time_dir = os.path.join("data/heatmaps", current_time)
     os.makedirs(time_dir, exist_ok=True)
 
     # generate and save heatmap
-    ax = sns.heatmap(all_games_output, linewidth=0.5, cmap='crest', annot=True)
+    if annot or all_games_output.size <= ANNOTATE_MAX_CELLS:
+        ax = sns.heatmap(all_games_output, linewidth=0.5, cmap='crest', annot=annot)
+    else:
+        ax = _raster_heatmap(all_games_output)
     ax.set_title(title)
 
     fig = ax.get_figure()
     file_path = os.path.join(time_dir, f"{title}.png")
-    fig.savefig(file_path, dpi=300, bbox_inches="tight")  
+    fig.savefig(file_path, dpi=dpi, bbox_inches="tight")  
 
     plt.close(fig)
 
     return
 
+def render_heatmaps(heatmaps: list, n_workers: int = None) -> None:
+    '''
+    Save several heatmaps (see visualize_all_games_output), e.g. both players' heatmaps of a run 
+    or every heatmap of a sweep, rendering them in parallel worker processes
 
+    Arguments:
+        heatmaps (list): the keyword arguments of visualize_all_games_output for each heatmap
+        n_workers (int): number of worker processes (defaults to the number of CPUs, at most 
+                         one per heatmap), 1 renders every heatmap in this process
+    '''
+    n_workers = min(n_workers or os.cpu_count() or 1, len(heatmaps))
+    if(n_workers <= 1):
+        for heatmap in heatmaps:
+            visualize_all_games_output(**heatmap)
+        return
+
+    with ProcessPoolExecutor(max_workers=n_workers) as pool:
+        # surface any worker's exception here
+        list(pool.map(_render_heatmap, heatmaps))
+    return
+
+def _render_heatmap(heatmap: dict) -> None:
+    '''
+    Worker task of render_heatmaps
+    '''
+    visualize_all_games_output(**heatmap)
+    return
+
+def _raster_heatmap(all_games_output: pd.DataFrame) -> plt.Axes:
+    '''
+    Draw a large heatmap as one raster image instead of a patch per cell, labelled like 
+    sns.heatmap, NaN cells (equal sequences) left blank
+
+    Arguments:
+        all_games_output (pd.DataFrame): the pivoted data (see visualize_all_games_output)
+
+    Output:
+        ax (plt.Axes): the axes drawn on
+    '''
+    n_rows, n_cols = all_games_output.shape
+    fig, ax = plt.subplots(figsize=(min(max(6.4, n_cols * 0.15), RASTER_MAX_INCHES), 
+                                    min(max(4.8, n_rows * 0.15), RASTER_MAX_INCHES)))
+    image = ax.imshow(all_games_output.to_numpy(dtype=float), cmap='crest', 
+                      aspect="auto", interpolation="nearest")
+    fig.colorbar(image, ax=ax)
+
+    if(max(n_rows, n_cols) * 0.15 <= RASTER_MAX_INCHES):
+        ax.set_xticks(range(n_cols), all_games_output.columns, rotation=90, fontsize=4)
+        ax.set_yticks(range(n_rows), all_games_output.index, fontsize=4)
+    ax.set_xlabel(all_games_output.columns.name)
+    ax.set_ylabel(all_games_output.index.name)
+    return ax
+
+def visualize_margin_distribution(bundle: dict, 
+                                  current_time: str, 
+                                  p1_combo: str, 
+                                  p2_combo: str, 
+                                  scoring: str = "TRICKS",
+                                  title: str = None
+                                  ) -> None:
+    '''
+    Visualizes and saves the distribution of one sequence combination's P1 minus P2 trick or 
+    card differential from a results bundle
+
+    Arguments:
+        bundle (dict): the results bundle (see results.new_results_bundle)
+        current_time (str): date and time of this run to create distinct filenames for plots
+        p1_combo (str): player one's sequence as a string of 0s and 1s
+        p2_combo (str): player two's sequence as a string of 0s and 1s
+        scoring (str): the scoring method whose differentials to visualize
+        title (str): the title to give to this visualization
+    '''
+    distribution = margin_distribution(bundle, p1_combo, p2_combo, scoring)
+    distribution = distribution[distribution > 0]
+    if title is None:
+        title = f"{scoring.capitalize()} Margin of {p1_combo} vs {p2_combo}".replace('0', 'B').replace('1', 'R')
+
+    time_dir = os.path.join("data/heatmaps", current_time)
+    os.makedirs(time_dir, exist_ok=True)
+
+    fig, ax = plt.subplots()
+    ax.bar(distribution.index, distribution.values)
+    ax.set_xlabel("P1 minus P2")
+    ax.set_ylabel("frequency")
+    ax.set_title(title)
+    fig.savefig(os.path.join(time_dir, f"{title}.png"), dpi=300, bbox_inches="tight")
+
+    plt.close(fig)
+
+    return
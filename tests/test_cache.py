@@ -0,0 +1,90 @@
+import os
+
+import numpy as np
+import pytest
+
+import score
+from cache import ResultCache
+from generate import get_combo_codes
+from score import run_cached_sim_and_score, run_parallel_sim_and_score
+
+CHUNK_SIZE = 50
+
+def cached_run(cache_dir, num_decks: int) -> dict:
+    return run_cached_sim_and_score(12, 3, num_decks, get_combo_codes(3), seed = 7, n_workers = 1,
+                                    chunk_size = CHUNK_SIZE, cache_dir = str(cache_dir), as_tensor = True)
+
+def parallel_run(num_decks: int) -> dict:
+    return run_parallel_sim_and_score(12, 3, num_decks, get_combo_codes(3), seed = 7, n_workers = 1,
+                                      shard_size = CHUNK_SIZE, as_tensor = True)
+
+def count_shards(monkeypatch) -> list:
+    '''
+    Record the number of decks of every shard played from now on
+    '''
+    played = []
+    score_shard = score._score_shard
+    def recording_score_shard(shard):
+        played.append(shard[1])
+        return score_shard(shard)
+    monkeypatch.setattr(score, "_score_shard", recording_score_shard)
+    return played
+
+def test_cached_run_matches_parallel_run(tmp_path):
+    assert np.array_equal(cached_run(tmp_path, 130)["counts"], parallel_run(130)["counts"])
+
+def test_prefix_served_without_playing(tmp_path, monkeypatch):
+    cached_run(tmp_path, 200)
+    played = count_shards(monkeypatch)
+
+    # every chunk boundary of the cached run is answered from the cache
+    for num_decks in (50, 100, 200):
+        tensor = cached_run(tmp_path, num_decks)
+        assert played == []
+        assert np.array_equal(tensor["counts"], parallel_run(num_decks)["counts"])
+        played.clear()
+
+def test_partial_chunk_topped_up(tmp_path, monkeypatch):
+    # chunks of 50, 50 and 25 decks, the last one not reusable by longer runs
+    cached_run(tmp_path, 125)
+    played = count_shards(monkeypatch)
+
+    # the two full chunks are reused, the rest played
+    tensor = cached_run(tmp_path, 230)
+    assert played == [50, 50, 30]
+    assert np.array_equal(tensor["counts"], parallel_run(230)["counts"])
+
+    # the longer run replaced the cached one
+    played.clear()
+    tensor = cached_run(tmp_path, 150)
+    assert played == []
+    assert np.array_equal(tensor["counts"], parallel_run(150)["counts"])
+
+def test_put_leaves_no_temporary_files(tmp_path):
+    cache = ResultCache(str(tmp_path))
+    entry = {"chunk_counts": np.ones((2, 4, 3), dtype=np.int64), "chunk_sizes": np.array([5, 5])}
+    cache.put("a", entry)
+    cache.put("a", entry)
+
+    assert os.listdir(tmp_path) == ["a.npz"]
+    assert np.array_equal(cache.get("a")["chunk_counts"], entry["chunk_counts"])
+
+def test_least_recently_used_evicted(tmp_path):
+    cache = ResultCache(str(tmp_path))
+    entry = {"chunk_counts": np.zeros((1, 100, 3), dtype=np.int64), "chunk_sizes": np.array([1])}
+    for mtime, key in enumerate("abc", start=1):
+        cache.put(key, entry)
+        os.utime(tmp_path / f"{key}.npz", (mtime, mtime))
+
+    # reading an entry makes it the most recently used
+    assert cache.get("a") is not None
+    cache.max_bytes = 2 * os.path.getsize(tmp_path / "a.npz")
+    cache.put("d", entry)
+
+    assert sorted(os.listdir(tmp_path)) == ["a.npz", "d.npz"]
+    assert cache.get("b") is None
+
+def test_entry_larger_than_bound_kept(tmp_path):
+    cache = ResultCache(str(tmp_path), max_bytes = 1)
+    cache.put("a", {"chunk_counts": np.zeros((1, 1, 3), dtype=np.int64), "chunk_sizes": np.array([1])})
+    assert cache.get("a") is not None
@@ -0,0 +1,79 @@
+import os
+
+import numpy as np
+import pytest
+
+import score
+from checkpoint import load_checkpoint, merge_checkpoints
+from generate import get_combo_codes
+from score import run_checkpointed_sim_and_score
+
+CHUNK_SIZE = 40
+COUNT_KEYS = ("winner_ones", "winner_twos", "ties", "num_decks")
+
+def checkpointed_run(path, num_decks: int, seed: int = 3, **kwargs) -> dict:
+    run_checkpointed_sim_and_score(12, 3, num_decks, get_combo_codes(3), seed = seed,
+                                   checkpoint_path = str(path), checkpoint_every = 1,
+                                   chunk_size = CHUNK_SIZE, **kwargs)
+    return load_checkpoint(str(path))
+
+def assert_same_counts(checkpoint: dict, expected: dict) -> None:
+    for key in COUNT_KEYS:
+        assert np.array_equal(checkpoint[key], expected[key])
+
+def test_resume_matches_uninterrupted_run(tmp_path, monkeypatch):
+    uninterrupted = checkpointed_run(tmp_path / "full.npz", 190)
+
+    # stop the run while it scores its fourth chunk, after three checkpoints
+    count_wins = score.count_wins
+    calls = []
+    def interrupted_count_wins(*args, **kwargs):
+        calls.append(1)
+        if(len(calls) == 4):
+            raise KeyboardInterrupt
+        return count_wins(*args, **kwargs)
+    monkeypatch.setattr(score, "count_wins", interrupted_count_wins)
+    with pytest.raises(KeyboardInterrupt):
+        checkpointed_run(tmp_path / "run.npz", 190)
+    monkeypatch.setattr(score, "count_wins", count_wins)
+
+    assert load_checkpoint(str(tmp_path / "run.npz"))["num_decks"] == 3 * CHUNK_SIZE
+    assert [name for name in os.listdir(tmp_path) if name.endswith(".tmp")] == []
+
+    resumed = checkpointed_run(tmp_path / "run.npz", 190, resume = True)
+    assert_same_counts(resumed, uninterrupted)
+    assert resumed["seed_ranges"].tolist() == uninterrupted["seed_ranges"].tolist() == [[3, 0, 5]]
+
+def test_resume_rejects_other_configuration(tmp_path):
+    checkpointed_run(tmp_path / "run.npz", 80)
+    with pytest.raises(Exception, match="Mismatched Simulation Configurations"):
+        checkpointed_run(tmp_path / "run.npz", 160, seed = 4, resume = True)
+
+def test_merged_chunk_ranges_match_one_run(tmp_path):
+    uninterrupted = checkpointed_run(tmp_path / "full.npz", 4 * CHUNK_SIZE)
+    checkpointed_run(tmp_path / "a.npz", 2 * CHUNK_SIZE)
+    checkpointed_run(tmp_path / "b.npz", 2 * CHUNK_SIZE, first_chunk = 2)
+
+    merged = merge_checkpoints([str(tmp_path / "a.npz"), str(tmp_path / "b.npz")])
+    assert_same_counts(merged, uninterrupted)
+    assert merged["seed_ranges"].tolist() == [[3, 0, 2], [3, 2, 4]]
+
+def test_merge_rejects_overlapping_decks(tmp_path):
+    checkpointed_run(tmp_path / "a.npz", 2 * CHUNK_SIZE)
+    checkpointed_run(tmp_path / "b.npz", 2 * CHUNK_SIZE, first_chunk = 1)
+    checkpointed_run(tmp_path / "c.npz", 2 * CHUNK_SIZE, seed = 4, first_chunk = 1)
+
+    with pytest.raises(Exception, match="Overlapping Seed Ranges"):
+        merge_checkpoints([str(tmp_path / "a.npz"), str(tmp_path / "b.npz")])
+
+    # the same chunks of another seed are other decks
+    merged = merge_checkpoints([str(tmp_path / "a.npz"), str(tmp_path / "c.npz")])
+    assert merged["num_decks"] == 4 * CHUNK_SIZE
+
+def test_merge_rejects_mismatched_configurations(tmp_path):
+    checkpointed_run(tmp_path / "a.npz", CHUNK_SIZE)
+    run_checkpointed_sim_and_score(12, 3, CHUNK_SIZE, get_combo_codes(3), scoring = "CARDS", seed = 4,
+                                   checkpoint_path = str(tmp_path / "b.npz"), chunk_size = CHUNK_SIZE)
+
+    with pytest.raises(Exception, match="Mismatched Simulation Configurations"):
+        merge_checkpoints([str(tmp_path / "a.npz"), str(tmp_path / "b.npz")])
@@ -0,0 +1,76 @@
+import numpy as np
+import pytest
+
+from deckstore import (open_deck_store, write_deck_store, tee_deck_store, HEADER_SIZE,
+                       SEED_SCHEME_SPAWN, SEED_SCHEME_UNKNOWN)
+from generate import iter_deck_chunks
+
+def random_decks(n_decks: int, deck_size: int, seed: int = 0) -> np.ndarray:
+    '''
+    Shuffled decks with deck_size/2 0s and deck_size/2 1s
+    '''
+    rng = np.random.default_rng(seed)
+    init_deck = np.array([0, 1] * (deck_size // 2), dtype=np.int8)
+    return np.array([rng.permutation(init_deck) for _ in range(n_decks)])
+
+# deck sizes packing into whole bytes and into a partly used last byte
+@pytest.mark.parametrize("deck_size", [8, 12, 52])
+def test_round_trip(tmp_path, deck_size):
+    decks = random_decks(35, deck_size)
+    path = str(tmp_path / "decks.bin")
+    assert write_deck_store(path, [decks[:20], decks[20:]], deck_size, seed = 5, chunk_size = 20) == 35
+
+    store = open_deck_store(path)
+    assert (len(store), store.deck_size, store.seed, store.chunk_size) == (35, deck_size, 5, 20)
+    assert store.seed_scheme == SEED_SCHEME_UNKNOWN
+    assert (tmp_path / "decks.bin").stat().st_size == HEADER_SIZE + 35 * ((deck_size + 7) // 8)
+
+    assert np.array_equal(store.read(), decks)
+    assert np.array_equal(store.read(7, 19), decks[7:19])
+    chunks = list(store.iter_chunks(chunk_size = 10, start = 3, stop = 30))
+    assert [len(chunk) for chunk in chunks] == [10, 10, 7]
+    assert np.array_equal(np.concatenate(chunks), decks[3:30])
+
+def test_empty_store(tmp_path):
+    path = str(tmp_path / "decks.bin")
+    assert write_deck_store(path, [], 52) == 0
+
+    store = open_deck_store(path)
+    assert len(store) == 0
+    assert store.read().shape == (0, 52)
+    assert list(store.iter_chunks()) == []
+
+def test_tee_passes_decks_through(tmp_path):
+    chunks = [random_decks(10, 52, seed) for seed in range(3)]
+    path = str(tmp_path / "decks.bin")
+
+    passed = list(tee_deck_store(path, iter(chunks), 52))
+    assert all(passed_chunk is chunk for passed_chunk, chunk in zip(passed, chunks))
+    assert np.array_equal(open_deck_store(path).read(), np.concatenate(chunks))
+
+def test_tee_closed_early_keeps_decks_played(tmp_path):
+    chunks = [random_decks(10, 52, seed) for seed in range(3)]
+    path = str(tmp_path / "decks.bin")
+
+    stream = tee_deck_store(path, iter(chunks), 52)
+    next(stream)
+    next(stream)
+    stream.close()
+    assert np.array_equal(open_deck_store(path).read(), np.concatenate(chunks[:2]))
+
+def test_generated_decks_replayed(tmp_path):
+    path = str(tmp_path / "decks.bin")
+    generated = list(iter_deck_chunks(45, 26, chunk_size = 20, seed = 9, store_path = path))
+
+    store = open_deck_store(path)
+    assert (store.seed_scheme, store.seed, store.chunk_size) == (SEED_SCHEME_SPAWN, 9, 20)
+    assert all(np.array_equal(replayed, chunk)
+               for replayed, chunk in zip(store.iter_chunks(chunk_size = 20), generated))
+
+def test_invalid_stores_rejected(tmp_path):
+    with pytest.raises(Exception, match="Invalid Deck Size"):
+        write_deck_store(str(tmp_path / "decks.bin"), random_decks(5, 12), 52)
+
+    (tmp_path / "other.bin").write_bytes(b"not a deck store")
+    with pytest.raises(Exception, match="Invalid Deck Store"):
+        open_deck_store(str(tmp_path / "other.bin"))
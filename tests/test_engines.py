@@ -0,0 +1,123 @@
+import itertools
+from fractions import Fraction
+from math import comb
+
+import numpy as np
+import pytest
+
+from engine import score_deck_batch, iter_score_batches
+from exact import exact_matchup_probabilities
+from game import Game
+from generate import create_game_combos
+
+def reference_win_stats(two_player_seqs: tuple, master_seq: list, seq_len: int) -> dict:
+    '''
+    The original recursive Game._recurse scoring, unrolled into a loop: the last seq_len cards
+    on the table are compared against both players' sequences after every card, and the table
+    is cleared whenever either player takes a trick. Every engine is checked against it.
+
+    Arguments:
+        two_player_seqs (tuple): the two players' chosen sequences of 0s and 1s
+        master_seq (list): the shuffled deck
+        seq_len (int): the number of elements in each player's chosen sequence
+
+    Output:
+        win_stats (dict): same as Game.play_this_game_deck
+    '''
+    memory = []
+    tricks = [0, 0]
+    p1_cards = [0]
+    p2_cards = [0]
+    num_cards = 0
+
+    for card in master_seq:
+        memory.append(card)
+        num_cards += 1
+        if(tuple(memory) == tuple(two_player_seqs[0])):
+            tricks[0] += 1
+            p1_cards[0] += num_cards
+            num_cards = 0
+            memory.clear()
+        elif(tuple(memory) == tuple(two_player_seqs[1])):
+            tricks[1] += 1
+            p2_cards[0] += num_cards
+            num_cards = 0
+            memory.clear()
+        elif(len(memory) >= seq_len):
+            memory.pop(0)
+
+    return {"tricks": tricks, "p1_cards": p1_cards, "p2_cards": p2_cards, "extra cards": [num_cards]}
+
+def all_decks(deck_size: int) -> list:
+    '''
+    Every distinct shuffle of a deck with deck_size/2 0s and deck_size/2 1s
+    '''
+    n_cards = 2 * (deck_size // 2)
+    decks = []
+    for ones in itertools.combinations(range(n_cards), deck_size // 2):
+        deck = [0] * n_cards
+        for idx in ones:
+            deck[idx] = 1
+        decks.append(deck)
+    return decks
+
+def random_decks(n_decks: int, deck_size: int, seed: int = 0) -> np.ndarray:
+    '''
+    Shuffled decks with deck_size/2 0s and deck_size/2 1s
+    '''
+    rng = np.random.default_rng(seed)
+    init_deck = np.array([0, 1] * (deck_size // 2))
+    return np.array([rng.permutation(init_deck) for _ in range(n_decks)])
+
+@pytest.mark.parametrize("seq_len", [1, 2, 3, 4])
+@pytest.mark.parametrize("deck_size", [8, 17, 52])
+def test_automaton_matches_reference(deck_size, seq_len):
+    for deck in random_decks(20, deck_size).tolist():
+        for combo in create_game_combos(seq_len):
+            game = Game(combo, deck, deck_size, seq_len)
+            assert game.play_this_game_deck() == reference_win_stats(combo, deck, seq_len)
+
+@pytest.mark.parametrize("seq_len", [1, 2, 3, 4])
+@pytest.mark.parametrize("deck_size", [8, 17, 52])
+def test_vectorized_matches_reference(deck_size, seq_len):
+    decks = random_decks(20, deck_size)
+    all_combos = create_game_combos(seq_len)
+    tricks, cards = score_deck_batch(decks, all_combos, seq_len)
+
+    for deck_idx, deck in enumerate(decks.tolist()):
+        for combo_idx, combo in enumerate(all_combos):
+            win_stats = reference_win_stats(combo, deck, seq_len)
+            assert tricks[deck_idx, combo_idx].tolist() == win_stats["tricks"]
+            assert cards[deck_idx, combo_idx].tolist() == win_stats["p1_cards"] + win_stats["p2_cards"]
+
+def test_score_batches_match_one_batch():
+    decks = random_decks(30, 52)
+    all_combos = create_game_combos(3)
+    tricks, cards = score_deck_batch(decks, all_combos, 3)
+
+    # slices of 7 combinations, the last one shorter
+    for combos, batch_tricks, batch_cards in iter_score_batches(decks, all_combos, 3, max_games = 7 * 30):
+        assert np.array_equal(batch_tricks, tricks[:, combos])
+        assert np.array_equal(batch_cards, cards[:, combos])
+
+@pytest.mark.parametrize("scoring", ["TRICKS", "CARDS"])
+@pytest.mark.parametrize("deck_size", [8, 9, 10, 11, 12])
+def test_exact_matches_enumeration(deck_size, scoring):
+    # odd deck sizes play decks of deck_size - 1 cards, like the sampled decks
+    decks = all_decks(deck_size)
+    assert len(decks) == comb(2 * (deck_size // 2), deck_size // 2)
+
+    for seq_len in (2, 3):
+        for combo in create_game_combos(seq_len):
+            outcomes = [0, 0, 0]
+            for deck in decks:
+                win_stats = reference_win_stats(combo, deck, seq_len)
+                if scoring == "TRICKS":
+                    diff = win_stats["tricks"][0] - win_stats["tricks"][1]
+                else:
+                    diff = win_stats["p1_cards"][0] - win_stats["p2_cards"][0]
+                outcomes[0 if diff > 0 else 1 if diff < 0 else 2] += 1
+            expected = tuple(Fraction(count, len(decks)) for count in outcomes)
+
+            assert exact_matchup_probabilities(combo, deck_size, scoring, rational = True) == expected
+            assert exact_matchup_probabilities(combo, deck_size, scoring) == pytest.approx(expected)
@@ -0,0 +1,68 @@
+import numpy as np
+import pytest
+
+from generate import get_combo_codes, iter_deck_chunks
+from score import run_full_sim_and_score, run_bundle_sim_and_score, run_antithetic_sim_and_score
+from stream import run_streaming_sim_and_score
+
+CHUNK_SIZE = 40
+
+@pytest.mark.parametrize("n_scorers", [1, 3])
+@pytest.mark.parametrize("scoring", ["TRICKS", "CARDS"])
+def test_stream_matches_full_run(scoring, n_scorers):
+    all_combos = get_combo_codes(3)
+    full = run_full_sim_and_score(iter_deck_chunks(250, 26, chunk_size = CHUNK_SIZE, seed = 2), 52, 3, 250,
+                                  all_combos, scoring, as_tensor = True)
+    streamed = run_streaming_sim_and_score(52, 3, 250, all_combos, scoring, seed = 2, chunk_size = CHUNK_SIZE,
+                                           n_scorers = n_scorers, as_tensor = True)
+    assert np.array_equal(streamed["counts"], full["counts"])
+
+def test_stream_histograms_match_bundle_run():
+    all_combos = get_combo_codes(2)
+    bundle = run_bundle_sim_and_score(iter_deck_chunks(150, 6, chunk_size = CHUNK_SIZE, seed = 2), 12, 2, 150,
+                                      all_combos)
+    streamed = run_streaming_sim_and_score(12, 2, 150, all_combos, seed = 2, chunk_size = CHUNK_SIZE,
+                                           n_scorers = 2, histograms = True)
+
+    assert streamed["num_decks"] == bundle["num_decks"] == 150
+    for key in ("tricks_outcomes", "tricks_margins", "cards_outcomes", "cards_margins"):
+        assert np.array_equal(streamed[key], bundle[key])
+
+def test_stream_raises_source_errors():
+    def failing_chunks():
+        yield next(iter_deck_chunks(CHUNK_SIZE, 26, chunk_size = CHUNK_SIZE))
+        raise ValueError("unreadable decks")
+
+    with pytest.raises(ValueError, match="unreadable decks"):
+        run_streaming_sim_and_score(52, 3, 2 * CHUNK_SIZE, get_combo_codes(3), deck_chunks = failing_chunks(),
+                                    n_scorers = 2)
+
+@pytest.mark.parametrize("pairing", ["reverse", "complement", "both"])
+def test_antithetic_reproducible(pairing):
+    all_combos = get_combo_codes(3).reduce()
+    first = run_antithetic_sim_and_score(52, 3, 400, all_combos, pairing = pairing, seed = 6, batch_size = 30)
+    second = run_antithetic_sim_and_score(52, 3, 400, all_combos, pairing = pairing, seed = 6, batch_size = 30)
+    assert first.equals(second)
+
+    other_seed = run_antithetic_sim_and_score(52, 3, 400, all_combos, pairing = pairing, seed = 7, batch_size = 30)
+    assert not first["p1 winner freq"].equals(other_seed["p1 winner freq"])
+
+@pytest.mark.parametrize("pairing", ["reverse", "complement", "both"])
+def test_antithetic_plays_each_deck_with_its_pairs(pairing):
+    all_combos = get_combo_codes(3)
+    group_size = 4 if pairing == "both" else 2
+    # 101 decks are 50 complement or reverse pairs, or 25 groups of four
+    decks = np.concatenate(list(iter_deck_chunks(101 // group_size, 26, chunk_size = 30, seed = 6)))
+    if(pairing == "reverse"):
+        played = [decks, decks[:, ::-1]]
+    elif(pairing == "complement"):
+        played = [decks, 1 - decks]
+    else:
+        played = [decks, decks[:, ::-1], 1 - decks, 1 - decks[:, ::-1]]
+    played = np.concatenate(played)
+
+    antithetic = run_antithetic_sim_and_score(52, 3, 101, all_combos, pairing = pairing, seed = 6, batch_size = 30)
+    full = run_full_sim_and_score(played, 52, 3, len(played), all_combos)
+    for column in ("p1 winner freq", "p2 winner freq", "tie freq"):
+        assert np.allclose(antithetic[column], full[column])
+    assert (antithetic["p1 se"] >= 0).all()
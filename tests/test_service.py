@@ -0,0 +1,29 @@
+import asyncio
+
+import numpy as np
+import pytest
+
+from service import MatchupIndex, _answer
+
+def test_odd_deck_size_is_indexed_as_even(tmp_path):
+    index = MatchupIndex(str(tmp_path))
+    odd_rates = index.get_rates(9, 2)
+    assert np.allclose(np.nansum(odd_rates, axis=-1)[~np.eye(4, dtype=bool)], 1)
+    assert np.array_equal(odd_rates, index.get_rates(8, 2), equal_nan=True)
+    assert [path.name for path in tmp_path.iterdir()] == ["deck8_seq2_TRICKS.npz"]
+
+@pytest.mark.parametrize("url", ["/row?p1=BXR", "/pairwise?p1=BR&p2=BRR", "/row?p1=BRRBRRBRR",
+                                 "/row?p1=BR&deck_size=1", "/row?p1=BR&scoring=POINTS"])
+def test_bad_query_computes_nothing(tmp_path, url):
+    index = MatchupIndex(str(tmp_path))
+    with pytest.raises(Exception):
+        asyncio.run(_answer(index, ["GET", url]))
+    assert index.rates == {}
+    assert list(tmp_path.iterdir()) == []
+
+def test_query_answers_from_index(tmp_path):
+    index = MatchupIndex(str(tmp_path))
+    status, body = asyncio.run(_answer(index, ["GET", "/pairwise?p1=BRR&p2=BBR&deck_size=13"]))
+    assert status == 200
+    assert body == index.pairwise("BRR", "BBR", 12)
+    assert body["p1 win rate"] + body["p2 win rate"] + body["tie rate"] == pytest.approx(1)
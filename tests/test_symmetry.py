@@ -0,0 +1,69 @@
+import itertools
+
+import numpy as np
+import pytest
+
+from exact import solve_exact
+from generate import create_game_combos, reduce_game_combos, get_combo_codes
+from results import expand_symmetric_output, expand_result_tensor, tensor_to_output
+from score import run_full_sim_and_score
+
+def every_deck(deck_size: int) -> np.ndarray:
+    '''
+    Every distinct shuffle of a deck with deck_size/2 0s and deck_size/2 1s, which is closed
+    under swapping colors, so each combination's outcome counts over it are exactly symmetric
+    '''
+    decks = []
+    for ones in itertools.combinations(range(deck_size), deck_size // 2):
+        deck = np.zeros(deck_size, dtype=np.int8)
+        deck[list(ones)] = 1
+        decks.append(deck)
+    return np.array(decks)
+
+def sort_output(all_games_output):
+    return all_games_output.sort_values(["p1 combo", "p2 combo"]).reset_index(drop=True)
+
+@pytest.mark.parametrize("seq_len", [2, 3, 4])
+def test_reduced_codes_match_reduced_combos(seq_len):
+    assert list(get_combo_codes(seq_len).reduce()) == reduce_game_combos(create_game_combos(seq_len))
+
+@pytest.mark.parametrize("scoring", ["TRICKS", "CARDS"])
+@pytest.mark.parametrize("seq_len", [2, 3])
+def test_expanded_exact_matches_full_solve(seq_len, scoring):
+    all_combos = create_game_combos(seq_len)
+    full = solve_exact(10, all_combos, scoring, rational = True)
+    reduced = solve_exact(10, reduce_game_combos(all_combos), scoring, rational = True)
+
+    expanded = expand_symmetric_output(reduced)
+    assert len(expanded) == len(full)
+    assert sort_output(expanded).equals(sort_output(full))
+
+@pytest.mark.parametrize("scoring", ["TRICKS", "CARDS"])
+@pytest.mark.parametrize("seq_len", [2, 3])
+def test_expanded_tensor_matches_full_run(seq_len, scoring):
+    decks = every_deck(10)
+    all_combos = get_combo_codes(seq_len)
+    full = run_full_sim_and_score(decks, 10, seq_len, len(decks), all_combos, scoring, as_tensor = True)
+    reduced = run_full_sim_and_score(decks, 10, seq_len, len(decks), all_combos.reduce(), scoring,
+                                     as_tensor = True)
+
+    # by default every combination is filled in, in create_game_combos' order
+    expanded = expand_result_tensor(reduced)
+    assert np.array_equal(expanded["p1_codes"], full["p1_codes"])
+    assert np.array_equal(expanded["p2_codes"], full["p2_codes"])
+    assert np.array_equal(expanded["counts"], full["counts"])
+
+    # the dataframe expansion fills in the same frequencies
+    assert sort_output(expand_symmetric_output(tensor_to_output(reduced))).equals(
+        sort_output(tensor_to_output(full)))
+
+def test_expansion_only_fills_in_selected_combos():
+    decks = every_deck(8)
+    selected = get_combo_codes(3, p1_seqs = ["BRR", "RBB"])
+    reduced = run_full_sim_and_score(decks, 8, 3, len(decks), selected.reduce(), as_tensor = True)
+    full = run_full_sim_and_score(decks, 8, 3, len(decks), selected, as_tensor = True)
+
+    expanded = expand_result_tensor(reduced, selected)
+    assert np.array_equal(expanded["p1_codes"], selected.p1_codes)
+    assert np.array_equal(expanded["p2_codes"], selected.p2_codes)
+    assert np.array_equal(expanded["counts"], full["counts"])